@@ -1,19 +1,40 @@
 import os
 import re
-import ollama
+import asyncio
 import traceback
 import json
 import time
+import hashlib
+import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from .utility.config import get_setting, get_log_file, get_status_file
+from .utility.config import get_setting, get_int_setting, get_bool_setting, get_status_file
 from .mail.gmail_connector import GmailConnector
 from .mail.outlook_connector import OutlookConnector
 from .filemanager.file_connector import FileConnector
 from .filemanager.file_tools import read_file_content
 from .utility.semantic_connector import SemanticConnector
+from .mail.sync_worker import start_sync_workers, stop_sync_workers
+from .mail.imap_pool import close_pools
+from .mail.mime_parse import shutdown_parse_pool
+from .utility.executors import run_blocking, stage_timeout, shutdown_executors
+from .utility.summary_cache import summary_key, get_summaries, put_summary
+from .utility.intent_cache import intent_cache, model_version, normalize_query
+from .utility.single_flight import SingleFlight
+from .utility.context_packer import prompt_budget, estimate_tokens, prepare_items, fits, pack, split_groups, truncate_to_tokens
+from .utility.intent_schema import INTENT_SCHEMA, INTENT_OUTPUTS, intent_num_predict, parse_intent_output
+from .utility.federated import federated_search
+from .utility.event_log import log_event, stop_logging
+from .utility.metrics import render_metrics, REQUEST_SECONDS, ERRORS
+from .utility.tracing import span, current_span, shutdown_tracing
+from .utility.model_warmup import start_warmup, snapshot as model_snapshot
+from .utility.llm_scheduler import snapshot as scheduler_snapshot
+from .utility import llm_client
+from .utility.intent_router import route, shadow_sample, CONFIDENT, stats as router_stats
 
 # Connector Registry
 connectors = {
@@ -23,7 +44,26 @@ connectors = {
     "semantic": SemanticConnector()
 }
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Optional background IMAP IDLE sync (MAIL_SYNC_ENABLED) keeps the mail cache hot
+    started = start_sync_workers()
+    if started:
+        print(f"DEBUG: Mail sync workers started for {', '.join(started)}")
+    # Pre-load the Ollama models in the background so the first query does not pay for it
+    warmup_task = start_warmup()
+    yield
+    if warmup_task:
+        warmup_task.cancel()
+    await llm_client.close_client()
+    stop_sync_workers()
+    close_pools()
+    shutdown_parse_pool()
+    shutdown_executors()
+    stop_logging()
+    shutdown_tracing()
+
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files
 static_path = os.path.join(os.path.dirname(__file__), "static")
@@ -33,12 +73,17 @@ app.mount("/static", StaticFiles(directory=static_path), name="static")
 
 MODEL_NAME = "jasper"
 
+# How often /query checks whether the client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
 def get_provider():
     return get_setting("PROVIDER", "GMAIL").upper()
 
-def summarize_text(text):
-    if not text or len(text.strip()) < 10:
-        return "No content to summarize."
+# Bump when the per-item summary prompt changes, so cached summaries are regenerated
+SUMMARY_PROMPT_VERSION = 1
+
+async def generate_summary(text):
+    """One-sentence summary from the model; None if the call failed, timed out or the answer rambled."""
     try:
         # Clinical completion prompt for the 270M model (or Jasper)
         prompt = (
@@ -46,107 +91,358 @@ def summarize_text(text):
             "TEXT: " + text[:800] + "\n"
             "SUMMARY: "
         )
-        response = ollama.generate(
-            model=MODEL_NAME, # Use Jasper
-            prompt=prompt,
+        response = await llm_client.generate(
+            MODEL_NAME, # Use Jasper
+            prompt,
+            stage="summary",
             system="You are a helpful assistant. Summarize the text in one short sentence.", # OVERRIDE JSON INSTRUCTION
             options={ "temperature": 0, "stop": ["\n", "TEXT:", "USER:"] }
         )
         summary = response.get("response", "").strip()
-        if not summary or len(summary) > 150: return text[:500] + "..."
+        if not summary or len(summary) > 150: return None
         return summary
-    except:
-        return text[:500] + "..."
+    except Exception:
+        return None
+
+async def summarize_text(text):
+    if not text or len(text.strip()) < 10:
+        return "No content to summarize."
+    return await generate_summary(text) or text[:500] + "..."
 
-def summarize_results_with_gemma(results, original_query):
+SUMMARY_INSTRUCTIONS = (
+    "Group information logically and maintain chronological order if relevant. "
+    "IMPORTANT: Do not output any JSON, and do not suggest using google_search or other tools. "
+    "Just provide the text summary response.\n\n"
+)
+
+async def summarize_results_with_gemma(results, original_query):
     """
     Summarizes a list of search results using Gemma3 4B for a professional, 
     cohesive overview.
+    The results are packed into a token budget (SUMMARY_PROMPT_TOKENS) by relevance and recency;
+    when they do not fit even at the minimum share each, groups are summarized first and combined.
     """
     if not results:
         return "I found no results to summarize."
 
-    # Aggregate content
-    context = ""
-    for i, item in enumerate(results):
-        source_type = "Email" if item.get("sender") else "File"
-        content = item.get("body") or item.get("content") or item.get("summary") or "No content available."
-        date = item.get("received") or item.get("date") or "Unknown date"
-        
-        context += f"ITEM {i+1} ({source_type}):\n"
-        if source_type == "Email":
-            context += f"From: {item.get('sender')}\nSubject: {item.get('subject')}\n"
-        else:
-            context += f"Name: {item.get('name')}\nPath: {item.get('path')}\n"
-        context += f"Date: {date}\n"
-        context += f"Content: {content[:1000]}\n\n"
-
-    prompt = (
-        f"The user asked: '{original_query}'.\n"
-        f"Based on the following {len(results)} search results, provide a clear, professional summary. "
-        "Group information logically and maintain chronological order if relevant. "
-        "IMPORTANT: Do not output any JSON, and do not suggest using google_search or other tools. "
-        "Just provide the text summary response.\n\n"
-        f"RESULTS:\n{context}\n"
-        "SUMMARY:"
-    )
+    from . import chat
+    budget = prompt_budget() - estimate_tokens(original_query) - estimate_tokens(SUMMARY_INSTRUCTIONS) - 64
+    entries = prepare_items(results)
 
     try:
-        from . import chat
+        if fits(entries, budget):
+            context = pack(entries, budget)
+            print(f"DEBUG: Summary context ~{estimate_tokens(context)} tokens for {len(results)} results")
+        else:
+            # Hierarchical: summarize groups that fit (concurrently), then combine the group summaries
+            groups = split_groups(entries, budget)
+            print(f"DEBUG: {len(results)} results exceed the summary budget, summarizing {len(groups)} groups first")
+            partials = await asyncio.gather(*(
+                chat.chat_with_gemma(
+                    f"The user asked: '{original_query}'.\n"
+                    f"Summarize the key facts of these {len(group)} search results (part {i + 1} of {len(groups)}) "
+                    "in a few sentences, keeping sender/file names and dates. "
+                    + SUMMARY_INSTRUCTIONS
+                    + f"RESULTS:\n{pack(group, budget)}\nSUMMARY:",
+                    allow_fallback=False,
+                    stage="summary"
+                )
+                for i, group in enumerate(groups)
+            ))
+            share = budget // len(partials)
+            context = "\n".join(
+                f"PART {i + 1} (items {group[0]['number']}-{group[-1]['number']}):\n{truncate_to_tokens(partial, share)}\n"
+                for i, (group, partial) in enumerate(zip(groups, partials))
+            )
+
+        prompt = (
+            f"The user asked: '{original_query}'.\n"
+            f"Based on the following {len(results)} search results, provide a clear, professional summary. "
+            + SUMMARY_INSTRUCTIONS
+            + f"RESULTS:\n{context}\n"
+            "SUMMARY:"
+        )
         # Use gemma3 (Jasper) for high-quality reasoning, but disable cloud fallback
-        return chat.chat_with_gemma(prompt, allow_fallback=False)
+        return await chat.chat_with_gemma(prompt, allow_fallback=False, stage="summary")
+    except asyncio.TimeoutError:
+        raise
     except Exception as e:
         return f"I performed the search but failed to generate a summary: {str(e)}"
 
-def summarize_files_iteratively(files, original_query):
+# Bump when the file summary prompts change, so cached file summaries are regenerated
+FILE_SUMMARY_PROMPT_VERSION = 1
+FILE_SUMMARY_MODEL = "gemma3"
+
+def read_file_for_summary(path):
     """
-    Summarizes a list of files by reading their content and 
-    summarizing them one by one.
+    Returns (content, sha256 of content, truncated) or (None, None, False) if unreadable.
+    Files are read in full up to FILE_SUMMARY_MAX_CHARS instead of a fixed 8000 characters.
     """
-    if not files:
-        return "I found no files to summarize."
+    max_chars = get_int_setting("FILE_SUMMARY_MAX_CHARS", 200000)
+    content = read_file_content(path, max_chars=max_chars + 1)
+    if not content:
+        return None, None, False
+    truncated = len(content) > max_chars
+    content = content[:max_chars]
+    return content, hashlib.sha256(content.encode("utf-8", "replace")).hexdigest(), truncated
 
-    summaries = []
-    actual_file_count = 0
-    
-    for item in files:
-        if item.get("kind") == "folder":
-            continue
-            
-        actual_file_count += 1
-        path = item.get("path")
-        name = item.get("name")
-        
-        content = read_file_content(path, max_chars=8000)
-        if not content:
-            summaries.append(f"**FILE: {name}**\nPath: `{path}`\nStatus: *Could not read file content (binary or inaccessible).*")
-            continue
+def split_for_summary(text, size):
+    """Splits text into chunks of at most size characters, preferring line and word breaks."""
+    chunks = []
+    while len(text) > size:
+        cut = text.rfind("\n", size // 2, size)
+        if cut == -1:
+            cut = text.rfind(" ", size // 2, size)
+        if cut == -1:
+            cut = size
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip()
+    if text.strip():
+        chunks.append(text)
+    return chunks
 
-        prompt = (
-            f"The user is searching for: '{original_query}'.\n"
-            f"Please summarize the following content from the file '{name}':\n\n"
-            f"FILE CONTENT:\n{content}\n\n"
-            "INSTRUCTION: Provide a concise, professional summary of what this file is about. "
+async def gemma_complete(prompt):
+    # Unlike chat.chat_with_gemma this raises on failure, so errors are never cached as summaries
+    response = await llm_client.chat(FILE_SUMMARY_MODEL, [{"role": "user", "content": prompt}], stage="summary")
+    return response["message"]["content"].strip()
+
+async def summarize_long_text(name, content):
+    """
+    Map-reduce summary: each chunk is summarized on its own (concurrently, bounded by LLM_CONCURRENCY),
+    then the partial summaries are combined, in groups if they do not fit one prompt.
+    """
+    chunk_size = get_int_setting("FILE_SUMMARY_CHUNK_CHARS", 6000)
+    chunks = split_for_summary(content, chunk_size)
+    instruction = (
+        "INSTRUCTION: Provide a concise, professional summary of what this file is about. "
+        "Do not output JSON or trigger external searches."
+    )
+    if len(chunks) <= 1:
+        prompt = f"Please summarize the following content from the file '{name}':\n\nFILE CONTENT:\n{content}\n\n{instruction}"
+        return await gemma_complete(prompt)
+
+    print(f"DEBUG: Summarizing '{name}' in {len(chunks)} chunks")
+    partials = await asyncio.gather(*(
+        gemma_complete(
+            f"This is part {i + 1} of {len(chunks)} of the file '{name}':\n\nFILE CONTENT:\n{chunk}\n\n"
+            "INSTRUCTION: Summarize the key facts of this part in a few sentences. "
             "Do not output JSON or trigger external searches."
         )
+        for i, chunk in enumerate(chunks)
+    ))
 
-        try:
-            from . import chat
-            file_summary = chat.chat_with_gemma(prompt, allow_fallback=False)
-            summaries.append(f"**FILE: {name}**\nPath: `{path}`\nSummary: {file_summary}")
-        except Exception as e:
-            summaries.append(f"**FILE: {name}**\nPath: `{path}`\nError: *Failed to summarize: {str(e)}*")
+    while len(partials) > 1:
+        groups, group = [], []
+        for partial in partials:
+            # At least two per group, so every round shrinks the list
+            if len(group) >= 2 and sum(len(p) for p in group) + len(partial) > chunk_size:
+                groups.append(group)
+                group = []
+            group.append(partial)
+        groups.append(group)
+        partials = await asyncio.gather(*(
+            gemma_complete(
+                f"Below are summaries of consecutive parts of the file '{name}':\n\n"
+                + "\n\n".join(f"PART {i + 1}:\n{p}" for i, p in enumerate(group))
+                + f"\n\n{instruction}"
+            )
+            for group in groups
+        ))
+    return partials[0]
+
+async def summarize_files_iteratively(files, original_query):
+    """
+    Summarizes a list of files by their full content. Reads run in parallel, long files
+    are summarized map-reduce style, and per-file summaries are cached by path, content
+    hash and model, so the same folder is summarized instantly the second time.
+    """
+    if not files:
+        return "I found no files to summarize."
 
-    if actual_file_count == 0:
+    documents = [item for item in files if item.get("kind") != "folder"]
+    if not documents:
         return "I found only folders, which cannot be summarized by content. Please specify a file name."
 
+    reads = await asyncio.gather(
+        *(run_blocking("files", "search", read_file_for_summary, item.get("path")) for item in documents),
+        return_exceptions=True
+    )
+    version = await run_blocking("llm", "summary", model_version, FILE_SUMMARY_MODEL)
+    keys = [
+        summary_key("file", f"{item.get('path')}#{read[1]}", version, FILE_SUMMARY_PROMPT_VERSION)
+        if isinstance(read, tuple) and read[1] else None
+        for item, read in zip(documents, reads)
+    ]
+    cached = await run_blocking("cache", "summary", get_summaries, keys)
+    print(f"DEBUG: {len(cached)} of {len(documents)} file summaries cached")
+
+    async def summarize_one(item, read, key):
+        path = item.get("path")
+        name = item.get("name")
+        if not isinstance(read, tuple) or not read[0]:
+            return f"**FILE: {name}**\nPath: `{path}`\nStatus: *Could not read file content (binary or inaccessible).*"
+        content, _, truncated = read
+        try:
+            file_summary = cached.get(key)
+            if file_summary is None:
+                file_summary = await summarize_long_text(name, content)
+                await run_blocking("cache", "summary", put_summary, key, file_summary)
+        except asyncio.TimeoutError:
+            return f"**FILE: {name}**\nPath: `{path}`\nError: *Summarizing took too long.*"
+        except Exception as e:
+            return f"**FILE: {name}**\nPath: `{path}`\nError: *Failed to summarize: {str(e)}*"
+        if truncated:
+            file_summary += f"\n*Only the first {len(content)} characters were summarized.*"
+        return f"**FILE: {name}**\nPath: `{path}`\nSummary: {file_summary}"
+
+    summaries = await asyncio.gather(*(summarize_one(item, read, key) for item, read, key in zip(documents, reads, keys)))
     return "\n\n---\n\n".join(summaries)
 
+async def parse_intent_with_model(user_input, use_cache=True, stage="intent"):
+    """
+    Asks the intent model for the JSON intent ("" on timeout, which triggers the chat fallback).
+    Output is schema-constrained and parsed tolerantly; an unusable answer is retried once on the
+    same model with a larger budget before the caller falls back to chat. Valid parses are cached
+    per normalised input and model version; post-processing (and date resolution) still runs on
+    every request. stage="shadow" runs the parse at the lowest scheduler priority.
+    """
+    # All blocking work runs on bounded pools (jasper/utility/executors.py) with per-stage timeouts
+    try:
+        version = await run_blocking("llm", stage, model_version, MODEL_NAME)
+        if use_cache:
+            cached = intent_cache.get(user_input, version)
+            if cached is not None:
+                print(f"DEBUG: Intent cache hit for '{user_input}'")
+                return cached
+            
+        budget = intent_num_predict()
+        for attempt in range(2):
+            response = await llm_client.generate(
+                MODEL_NAME,
+                f"User: \"{user_input}\"", 
+                stage=stage,
+                format=INTENT_SCHEMA,
+                options={ "temperature": 0.0, "num_predict": budget * (attempt + 1), "stop": ["User:"] }
+            )
+            raw_content = response.get("response", "").strip()
+            data, repaired = parse_intent_output(raw_content)
+            if data is not None:
+                break
+            if attempt == 0:
+                print(f"DEBUG: Unusable intent output, retrying once: {raw_content!r}")
+                INTENT_OUTPUTS.inc(result="retried")
+        if data is None:
+            INTENT_OUTPUTS.inc(result="invalid")
+            return raw_content # Never cache unparseable output
+        INTENT_OUTPUTS.inc(result="repaired" if repaired else "valid")
+        raw_content = json.dumps(data)
+        intent_cache.put(user_input, version, raw_content)
+        return raw_content
+    except asyncio.TimeoutError:
+        print(f"[{datetime.now()}] AI Timeout for input: {user_input}")
+        log_event("intent_timeout", level=logging.WARNING, input=user_input)
+        return ""
+
+# Keeps fire-and-forget tasks referenced until they finish
+background_tasks = set()
+
+async def shadow_compare(user_input, routed_data):
+    # Lowest priority: live intent parses and summaries always go first
+    raw_content = await parse_intent_with_model(user_input, use_cache=False, stage="shadow")
+    if not raw_content:
+        return # Timed out waiting behind live work; not a disagreement
+    try:
+        model_data = json.loads(raw_content)
+    except ValueError:
+        model_data = None
+    if not router_stats.record_comparison(routed_data, model_data):
+        print(f"DEBUG: Intent router disagreed with model for '{user_input}': rules={routed_data} model={raw_content}")
+
+async def summarize_items(results, on_summary=None):
+    """
+    Per-item summaries for mail results. Cached summaries (by Message-ID, model and prompt
+    version) return instantly; the rest run concurrently, bounded by LLM_CONCURRENCY.
+    on_summary(index, summary) is awaited as each one completes (used by /query/stream).
+    """
+    version = await run_blocking("llm", "summary", model_version, MODEL_NAME)
+    keys = [
+        summary_key("mail", item["message_id"], version, SUMMARY_PROMPT_VERSION) if item.get("message_id") else None
+        for item in results
+    ]
+    cached = await run_blocking("cache", "summary", get_summaries, keys)
+    print(f"DEBUG: {len(cached)} of {len(results)} item summaries cached")
+
+    async def summarize_one(item, key):
+        if key in cached:
+            return cached[key]
+        text = item.get("body", "")
+        if not text or len(text.strip()) < 10:
+            return "No content to summarize."
+        summary = await generate_summary(text)
+        if not summary:
+            return text[:500] + "..."
+        await run_blocking("cache", "summary", put_summary, key, summary)
+        return summary
+
+    async def summarize_and_emit(index, item, key):
+        summary = await summarize_one(item, key)
+        if on_summary:
+            await on_summary(index, summary)
+        return summary
+
+    return await asyncio.gather(*(summarize_and_emit(i, item, key) for i, (item, key) in enumerate(zip(results, keys))))
+
+async def summarize_with_timeout(summarizer, results, original_query):
+    """Awaits an aggregate summarizer within the summary timeout."""
+    try:
+        return await asyncio.wait_for(summarizer(results, original_query), timeout=stage_timeout("summary"))
+    except asyncio.TimeoutError:
+        return "I performed the search but generating the summary took too long."
+
 @app.get("/", response_class=HTMLResponse)
 async def read_index():
     with open(os.path.join(static_path, "index.html"), "r") as f:
         return f.read()
 
+def observe_request(endpoint, result, start):
+    result_type = result.get("type", "text") if isinstance(result, dict) else "error"
+    REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, type=result_type)
+
+async def emit_event(emit, event):
+    if emit:
+        await emit(event)
+
+query_flights = SingleFlight()
+
+async def coalesced_query(user_input, emit=None):
+    """
+    run_query, shared between concurrent identical queries (same normalised input): a
+    double-submit or a second tab attaches to the running pipeline and gets the same events
+    and result (QUERY_COALESCING).
+    """
+    if not get_bool_setting("QUERY_COALESCING", True):
+        return await run_query(user_input, emit=emit)
+    return await query_flights.run(normalize_query(user_input), lambda flight_emit: run_query(user_input, emit=flight_emit), emit)
+
+async def cancel_on_disconnect(request, coro):
+    """
+    Awaits coro, cancelling it if the client disconnects first, so its queued
+    Ollama requests are dropped from the scheduler instead of running for nobody.
+    """
+    task = asyncio.create_task(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                print("DEBUG: Client disconnected, cancelling query")
+                task.cancel()
+                return {"response": "Client disconnected.", "type": "cancelled"}
+    finally:
+        if not task.done():
+            task.cancel()
+
 @app.post("/query")
 async def process_query(request: Request):
     body = await request.json()
@@ -155,62 +451,116 @@ async def process_query(request: Request):
     if not user_input:
         return JSONResponse(content={"response": "Please enter a query."})
 
+    start = time.perf_counter()
+    with span("query", endpoint="/query", input_chars=len(user_input)):
+        result = await cancel_on_disconnect(request, coalesced_query(user_input))
+    observe_request("/query", result, start)
+    return result
+
+@app.post("/query/stream")
+async def process_query_stream(request: Request):
+    """
+    Streaming variant of /query (NDJSON, one event per line):
+    intent -> results (as soon as the connector returns) -> summary per item -> done.
+    The "done" event carries the same payload /query would have returned.
+    """
+    body = await request.json()
+    user_input = body.get("query", "")
+    queue = asyncio.Queue()
+
+    async def emit(event):
+        await queue.put(event)
+
+    async def produce():
+        try:
+            if not user_input:
+                result = {"response": "Please enter a query."}
+            else:
+                start = time.perf_counter()
+                with span("query", endpoint="/query/stream", input_chars=len(user_input)):
+                    result = await coalesced_query(user_input, emit=emit)
+                observe_request("/query/stream", result, start)
+            if isinstance(result, JSONResponse):
+                result = json.loads(result.body)
+            await queue.put({"event": "done", **result})
+        finally:
+            await queue.put(None)
+
+    async def events():
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield json.dumps(jsonable_encoder(event)) + "\n"
+        finally:
+            # Client went away: stop the remaining connector/LLM work
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+async def run_query(user_input, emit=None):
+    """
+    Parses and executes one query. emit, if given, is awaited with progress events
+    (intent, results, summary) before the final response is returned.
+    """
     try:
-        # LOGGING
-        with open(get_log_file(), "a") as f:
-            f.write(f"[{datetime.now()}] Input: {user_input}\n")
+        # LOGGING (queued, written by a background thread)
+        log_event("query_input", input=user_input)
         
-        # OLLAMA CALL (Using Jasper - built-in system prompt)
-        try:
-            import asyncio
-            loop = asyncio.get_event_loop()
-            response = await asyncio.wait_for(
-                loop.run_in_executor(None, lambda: ollama.generate(
-                    model=MODEL_NAME,
-                    prompt=f"User: \"{user_input}\"", 
-                    format="json",
-                    options={ "temperature": 0.0, "stop": ["\n", "User:"] }
-                )),
-                timeout=20.0 # 20 seconds timeout for AI
-            )
-            raw_content = response.get("response", "").strip()
-        except asyncio.TimeoutError:
-            print(f"[{datetime.now()}] AI Timeout for input: {user_input}")
-            raw_content = "" # Will trigger fallback
+        # FAST PATH: compiled rules answer unambiguous queries without the model
+        with span("intent.router") as current:
+            routed_data, confidence = route(user_input)
+            current.set_attribute("confidence", confidence)
+        routed = confidence >= CONFIDENT
+        router_stats.record_route(routed)
+        if routed:
+            raw_content = json.dumps(routed_data)
+            print(f"DEBUG: Intent router fast path -> {raw_content}")
+            if shadow_sample():
+                # Re-check a sample against the model in the background to track agreement
+                task = asyncio.create_task(shadow_compare(user_input, routed_data))
+                background_tasks.add(task)
+                task.add_done_callback(background_tasks.discard)
+        else:
+            # OLLAMA CALL (Using Jasper - built-in system prompt)
+            raw_content = await parse_intent_with_model(user_input)
             
-        with open(get_log_file(), "a") as f:
-            f.write(f"[{datetime.now()}] AI Response: {raw_content}\n")
+        log_event("intent_response", response=raw_content, routed=routed)
         print(f"Jasper Logic -> {raw_content}")
 
         try:
-             # CLEANUP JSON
-            if raw_content.startswith("```"):
-                match = re.search(r"```(?:\w+)?\s*(.*?)```", raw_content, re.DOTALL)
-                if match: raw_content = match.group(1).strip()
-            
-            raw_content = raw_content.replace("\\_", "_")
-            
             # FALLBACK HELPER
             async def fallback_to_chat():
                  print(f"[{datetime.now()}] DEBUG: Fallback to Gemma3 triggered.")
+                 await emit_event(emit, {"event": "intent", "intent": "chat", "params": {}})
                  from . import chat
-                 # Run in executor to avoid blocking
-                 loop = asyncio.get_event_loop()
-                 resp = await loop.run_in_executor(None, lambda: chat.chat_with_gemma(user_input))
+                 # Async call on the shared Ollama client
+                 try:
+                     resp = await chat.chat_with_gemma(user_input)
+                 except asyncio.TimeoutError:
+                     resp = "Sorry, the assistant took too long to answer. Please try again."
                  return {"type": "chat", "content": resp}
 
             if not raw_content:
                 # Fallback if AI timed out or returned empty
                 return await fallback_to_chat()
             
-            try:
-                data = json.loads(raw_content)
-            except:
+            # Tolerant parse (fences, "\\_" escapes, truncated answers); the model path already retried once
+            data, _ = parse_intent_output(raw_content)
+            if data is None:
                 # If it's not JSON, it might be a valid chat response (or garbage)
                 # But since FunctionGemma sucks at chat, we retry with Gemma3
                 print("DEBUG: Invalid JSON, retrying with Gemma3")
+                ERRORS.inc(stage="intent", type="InvalidJSON")
                 return await fallback_to_chat()
             
+            # The rules had a low-confidence guess: score it against the model
+            if not routed and routed_data:
+                router_stats.record_comparison(routed_data, data)
+            
             # PARSE INTENT
             intent = data.get("intent")
             params = data.get("params", {})
@@ -259,7 +609,9 @@ async def process_query(request: Request):
                     print(f"DEBUG: Keyword Guard triggered. Forcing intent 'chat' due to keyword match.")
                     intent = "chat"
                     
-            if "file" in low_input or "folder" in low_input or "path" in low_input:
+            if intent == "all":
+                pass # Explicit "search everything": the keyword overrides below do not apply
+            elif "file" in low_input or "folder" in low_input or "path" in low_input:
                 # If it mentions "in the files" or "content", it should be semantic, not filename-based
                 if any(k in low_input for k in ["content", "in the", "inside", "about", "contain"]):
                     if intent != "semantic":
@@ -323,14 +675,19 @@ async def process_query(request: Request):
                 function_name = "semantic_search"
                 args = params
                 
+            elif intent == "all":
+                function_name = "search_everything"
+                args = params
+                
             elif intent == "chat":
                 # Utilize Gemma3 for chat responses instead of echoing
                 return await fallback_to_chat()
             
             # Fallback/Safety: If intent is missing or invalid
+            # Rather than guessing one connector, ask all of them
             if not function_name:
-                print("DEBUG: No valid intent found. Defaulting to Semantic Search.")
-                function_name = "semantic_search"
+                print("DEBUG: No valid intent found. Defaulting to federated search.")
+                function_name = "search_everything"
                 args = {"query": user_input}
 
         except Exception as e:
@@ -613,41 +970,68 @@ async def process_query(request: Request):
             # For now, we trust the model's extraction of 'body' vs 'subject'.
             
             # LOGGING PARAMETERS
-            with open(get_log_file(), "a") as f:
-                f.write(f"[{datetime.now()}] Final Params: provider={final_provider}, sender={sender}, subject={subject}, body={body_text}, date_filter={date_filter}, has_attachment={has_attachment}, from={date_from}, to={date_to}\n")
+            log_event(
+                "mail_params", provider=final_provider, sender=sender, subject=subject, body=body_text,
+                date_filter=date_filter, has_attachment=has_attachment, date_from=date_from, date_to=date_to
+            )
                 
             print(f"DEBUG: Executing find_items(provider='{final_provider}', sender='{sender}', subject='{subject}', body='{body_text}', limit={limit}, from='{date_from}', to='{date_to}')")
                 
+        current_span().set_attribute("intent", function_name)
+        await emit_event(emit, {"event": "intent", "intent": function_name, "params": args})
+
         # ROUTE TO CONNECTOR
         if function_name == "fetch_items":
             provider = final_provider or get_provider()
             connector_key = f"mail_{provider.lower()}"
             connector = connectors.get(connector_key, connectors["mail_gmail"])
             
-            # Use clarified params
-            results = connector.search(
+            # "Any new mail from Anja?" only searches past the last run of the same query;
+            # content queries ("the email about ...") go to the local semantic mail index first
+            mail_mode = None
+            if (sender or subject or has_attachment) and re.search(r"\b(any new|anything new|new since|since last)\b", user_input, re.IGNORECASE):
+                mail_mode = "incremental"
+            elif body_text and not (sender or subject):
+                mail_mode = "semantic"
+            
+            # Use clarified params (each connector type has its own pool)
+            results = await run_blocking(
+                connector_key if connector_key in connectors else "mail_gmail", "search", connector.search,
                 sender=sender, 
                 subject=subject, 
                 body=body_text, 
                 limit=limit, 
                 date_from=date_from, 
                 date_to=date_to,
-                has_attachment=has_attachment
+                has_attachment=has_attachment,
+                mode=mail_mode
             )
             
             if isinstance(results, list):
                 if not results:
                     return {"type": "results", "content": "No items found.", "data": []}
                 else:
+                    for item in results:
+                        item["provider"] = provider
+                    content = f"Found {len(results)} items."
+                    if mail_mode == "incremental":
+                        content = f"Found {len(results)} items ({sum(1 for item in results if item.get('is_new'))} new since last time)."
+                    # Show the raw results while the summaries are generated
+                    await emit_event(emit, {"event": "results", "type": "results", "content": content, "data": results, "pending_summaries": not should_summarize})
+
                     if should_summarize:
-                        summary_res = summarize_results_with_gemma(results, user_input)
+                        summary_res = await summarize_with_timeout(summarize_results_with_gemma, results, user_input)
                         return {"type": "chat", "content": summary_res}
                     
-                    for item in results:
-                        item["summary"] = summarize_text(item.get("body", ""))
-                        item["provider"] = provider
-                    return {"type": "results", "content": f"Found {len(results)} items.", "data": results}
+                    async def on_summary(index, summary):
+                        await emit_event(emit, {"event": "summary", "index": index, "summary": summary})
+
+                    summaries = await summarize_items(results, on_summary=on_summary if emit else None)
+                    for item, summary in zip(results, summaries):
+                        item["summary"] = summary
+                    return {"type": "results", "content": content, "data": results}
             else:
+                ERRORS.inc(stage="search", type="ConnectorError")
                 return {"type": "error", "content": str(results)}
 
         elif function_name == "search_files":
@@ -660,7 +1044,8 @@ async def process_query(request: Request):
             from .utility.date_utils import extract_date_range
             date_from, date_to = extract_date_range(args.get("date_filter") or user_input)
             
-            results = connectors["files"].search(
+            results = await run_blocking(
+                "files", "search", connectors["files"].search,
                 query=query, 
                 limit=args.get("limit", 10), 
                 kind=args.get("kind"), 
@@ -673,10 +1058,12 @@ async def process_query(request: Request):
                     return {"type": "results", "content": "No files found.", "data": [], "category": "files"}
                 else:
                     if should_summarize:
-                        summary_res = summarize_files_iteratively(results, user_input)
+                        await emit_event(emit, {"event": "results", "type": "results", "content": f"Found {len(results)} files.", "data": results, "category": "files"})
+                        summary_res = await summarize_with_timeout(summarize_files_iteratively, results, user_input)
                         return {"type": "chat", "content": summary_res}
                     return {"type": "results", "content": f"Found {len(results)} files.", "data": results, "category": "files"}
             else:
+                ERRORS.inc(stage="search", type="ConnectorError")
                 return {"type": "error", "content": str(results)}
 
         elif function_name == "semantic_search":
@@ -688,7 +1075,8 @@ async def process_query(request: Request):
                 if f_test.lower() not in ["the", "my"]:
                     folder = f_test
 
-            results = connectors["semantic"].search(
+            results = await run_blocking(
+                "semantic", "search", connectors["semantic"].search,
                 query=args.get("query"), 
                 limit=args.get("limit", 10), 
                 folder=folder
@@ -698,26 +1086,54 @@ async def process_query(request: Request):
                 if not results:
                      return {"type": "results", "content": f"No matches found for '{args.get('query')}'.", "data": [], "category": "files"}
                 
+                msg = f"Found {len(results)} relevant semantic matches in your files."
                 if should_summarize:
-                    summary_res = summarize_results_with_gemma(results, user_input)
+                    await emit_event(emit, {"event": "results", "type": "results", "content": msg, "data": results, "category": "files"})
+                    summary_res = await summarize_with_timeout(summarize_results_with_gemma, results, user_input)
                     return {"type": "chat", "content": summary_res}
 
-                msg = f"Found {len(results)} relevant semantic matches in your files."
                 return {"type": "results", "content": msg, "data": results, "category": "files"}
             else:
+                ERRORS.inc(stage="search", type="ConnectorError")
                 return {"type": "error", "content": str(results)}
 
+        elif function_name == "search_everything":
+            query = args.get("query") or user_input
+            
+            # Streamed clients see each source's results as they arrive
+            async def on_update(results, status):
+                await emit_event(emit, {"event": "results", "type": "results", "content": f"Found {len(results)} items so far...", "data": results, "sources": status})
+            
+            results, status = await federated_search(connectors, query, limit=args.get("limit", 10), on_update=on_update if emit else None)
+            answered = [source for source, state in status.items() if state == "ok"]
+            
+            if not results:
+                return {"type": "results", "content": f"No matches found for '{query}' in any source.", "data": [], "sources": status}
+            
+            if should_summarize:
+                summary_res = await summarize_with_timeout(summarize_results_with_gemma, results, user_input)
+                return {"type": "chat", "content": summary_res}
+            
+            content = f"Found {len(results)} items across {len(answered)} sources."
+            missed = [source for source in status if source not in answered]
+            if missed:
+                content += f" ({', '.join(missed)} did not answer in time.)"
+            return {"type": "results", "content": content, "data": results, "sources": status}
+
         else:
             # Fallback for chat or unknown intents
             return await fallback_to_chat()
                 
     except json.JSONDecodeError:
         return {"type": "text", "content": raw_content}
+    except asyncio.TimeoutError:
+        print(f"[{datetime.now()}] Search timed out for input: {user_input}")
+        return {"type": "error", "content": "The search took too long to respond. Please try again."}
     except Exception as e:
         error_trace = traceback.format_exc()
         print(f"Backend Error: {error_trace}")
-        with open(get_log_file(), "a") as f:
-            f.write(f"[{datetime.now()}] Backend Error: {error_trace}\n")
+        log_event("backend_error", level=logging.ERROR, error=str(e), trace=error_trace)
+        ERRORS.inc(stage="query", type=type(e).__name__)
         return JSONResponse(content={"type": "error", "content": f"Backend Error: {str(e)}", "trace": error_trace}, status_code=500)
 
 @app.post("/open")
@@ -766,6 +1182,17 @@ async def restart_service():
     except Exception as e:
         return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
 
+@app.get("/stats")
+async def get_stats():
+    """Fast-path router hit rate, agreement with the intent model, intent cache counters, model warm state, the LLM queue and in-flight queries."""
+    return {"intent_router": router_stats.snapshot(), "intent_cache": intent_cache.snapshot(), "models": model_snapshot(),
+            "llm_scheduler": scheduler_snapshot(), "queries_in_flight": query_flights.in_flight()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text format: stage latencies, executor queues, cache hit ratios and errors."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/index-status")
 async def get_index_status():
     """Provides the current indexing percentage for the UI."""
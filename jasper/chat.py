@@ -1,17 +1,21 @@
-import ollama
+import asyncio
 import traceback
 from .utility.config import get_setting
+from .utility import llm_client
+from .utility.executors import run_blocking
 
-def chat_with_gemma(prompt, allow_fallback=True):
+async def chat_with_gemma(prompt, allow_fallback=True, stage="chat"):
     """
     Sends the user prompt to gemma3:4b (or compatible model) 
     and returns the text response.
+    stage sets the scheduler priority and timeout (aggregate summaries pass "summary").
+    Raises asyncio.TimeoutError if the model does not answer within the stage timeout.
     """
     try:
         print(f"DEBUG: asking gemma3 (Jasper) -> '{prompt}'")
-        response = ollama.chat(model='gemma3', messages=[
+        response = await llm_client.chat('gemma3', [
             {'role': 'user', 'content': prompt},
-        ])
+        ], stage=stage)
         raw_content = response['message']['content']
         
         # Check for Fallback Signal FIRST (on raw content)
@@ -33,7 +37,7 @@ def chat_with_gemma(prompt, allow_fallback=True):
                 if isinstance(data, dict) and data.get("action") == "google_search":
                     query = data.get("query")
                     print(f"DEBUG: Cloud Fallback Triggered -> Query: {query}")
-                    return call_gemini_cloud(query)
+                    return await run_blocking("llm", "chat", call_gemini_cloud, query)
             except Exception as e:
                 print(f"DEBUG: JSON parse failed (likely just normal text): {e}")
 
@@ -43,6 +47,8 @@ def chat_with_gemma(prompt, allow_fallback=True):
         clean_content = re.sub(r'\s*\{.*"action":\s*".*"\s*\}\s*$', '', raw_content, flags=re.DOTALL).strip()
             
         return clean_content
+    except asyncio.TimeoutError:
+        raise
     except Exception as e:
         print(f"Chat Error: {e}")
         traceback.print_exc()
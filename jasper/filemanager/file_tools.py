@@ -1,7 +1,9 @@
 import os
+import logging
 import win32com.client
 from datetime import datetime
-from ..utility.config import get_setting, get_log_file
+from ..utility.config import get_setting
+from ..utility.event_log import log_event
 
 # Detect system user
 USER_NAME = get_setting("USER_NAME", os.environ.get("USERNAME", "Unknown"))
@@ -12,9 +14,8 @@ def find_files(query=None, name=None, date_from=None, date_to=None, limit=10, ki
     Returns a list of dictionaries with file metadata.
     """
     try:
-        # LOGGING TO FILE FOR DEBUGGING
-        with open(get_log_file(), "a") as f:
-             f.write(f"[{datetime.now()}] find_files EXECUTION -> kind='{kind}', content_mode={content_mode}\n")
+        # LOGGING (queued, written by a background thread)
+        log_event("find_files", level=logging.DEBUG, query=query, kind=kind, content_mode=content_mode)
 
         conn = win32com.client.Dispatch("ADODB.Connection")
         conn.Open("Provider=Search.CollatorDSO;Extended Properties='Application=Windows';")
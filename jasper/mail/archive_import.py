@@ -0,0 +1,190 @@
+import os
+import time
+import zlib
+import argparse
+from pathlib import Path
+from .mime_parse import iter_parsed_batches
+from .header_index import reset_header_index
+from .contact_directory import note_senders
+from . import mail_cache, mail_semantic
+
+# Imports local mail archives (mbox files or Maildir folders) into the mail cache and
+# (optionally) the semantic mail index used by the IMAP path.
+# Messages are streamed one at a time and committed in batches, so memory stays flat
+# for archives of any size and an interrupted import resumes where it stopped. The header
+# index is not touched: it warms from the cache when the provider is first searched.
+#
+# /query searches archives imported under ARCHIVE_PROVIDER together with the live
+# accounts (merge_archive in the mail connectors, and the semantic mail index).
+#
+# Each message gets its position in the archive as UID. The archive fingerprint is
+# stored as UIDVALIDITY: appending to an mbox keeps it, rewriting the archive resets the import.
+
+ARCHIVE_PROVIDER = mail_cache.ARCHIVE_PROVIDER
+BATCH_SIZE = 500
+FINGERPRINT_BYTES = 64 * 1024
+
+def is_maildir(path):
+    path = Path(path)
+    return path.is_dir() and (path / "cur").is_dir() and (path / "new").is_dir()
+
+def _maildir_files(path):
+    # Maildir file names start with the delivery time, so sorting keeps new mail at the end
+    names = []
+    for sub in ("cur", "new"):
+        with os.scandir(Path(path) / sub) as entries:
+            names.extend((entry.name, entry.path) for entry in entries if entry.is_file() and not entry.name.startswith("."))
+    names.sort()
+    return names
+
+def iter_mbox(path):
+    """Yields the raw bytes of each message of an mbox file, one message in memory at a time."""
+    lines = []
+    prev_blank = True
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b"From ") and prev_blank:
+                if lines:
+                    yield b"".join(lines)
+                lines = []
+                prev_blank = False
+                continue
+            # mboxrd quoting: ">From " (and ">>From ", ...) lose one ">"
+            if line.startswith(b">") and line.lstrip(b">").startswith(b"From "):
+                line = line[1:]
+            prev_blank = line in (b"\n", b"\r\n")
+            lines.append(line)
+    if lines:
+        yield b"".join(lines)
+
+def iter_maildir(path):
+    for _, file_path in _maildir_files(path):
+        with open(file_path, "rb") as f:
+            yield f.read()
+
+def archive_fingerprint(path):
+    """Stable id of an archive: changes if it is rewritten, not when new mail is appended."""
+    if is_maildir(path):
+        files = _maildir_files(path)
+        seed = files[0][0].split(":")[0].encode() if files else b""
+    else:
+        with open(path, "rb") as f:
+            seed = f.read(FINGERPRINT_BYTES)
+    return zlib.crc32(seed)
+
+def default_mailbox(path):
+    return Path(path).stem or "INBOX"
+
+def _flush(provider, mailbox, batch, semantic):
+    parts = [(f"{uid} (UID {uid})".encode(), raw) for uid, raw in batch]
+    for records in iter_parsed_batches(parts, headers_only=False, use_uid=True):
+        mail_cache.store_records(provider, mailbox, records, with_bodies=True)
+        note_senders(provider, records)
+        if semantic:
+            mail_semantic.index_records(provider, mailbox, records)
+    mail_cache.set_sync_state(provider, mailbox, highest_uid=batch[-1][0])
+
+def import_archive(path, provider=ARCHIVE_PROVIDER, mailbox=None, semantic=False, batch_size=BATCH_SIZE, restart=False):
+    """
+    Streams an mbox file or Maildir folder into the mail cache.
+    Returns (imported, skipped) message counts; skipped were already imported earlier.
+    """
+    mailbox = mailbox or default_mailbox(path)
+    fingerprint = archive_fingerprint(path)
+    state = mail_cache.get_sync_state(provider, mailbox)
+    if restart or (state.get("uidvalidity") and state["uidvalidity"] != fingerprint):
+        print(f"DEBUG: Archive '{path}' changed or restart requested, re-importing {provider}/{mailbox}")
+        mail_cache.purge_mailbox(provider, mailbox)
+        reset_header_index(provider)
+        mail_semantic.remove_mailbox(provider, mailbox)
+        state = {}
+    mail_cache.set_sync_state(provider, mailbox, uidvalidity=fingerprint)
+    done = state.get("highest_uid") or 0
+
+    messages = iter_maildir(path) if is_maildir(path) else iter_mbox(path)
+    imported = skipped = 0
+    batch = []
+    start = time.time()
+    for uid, raw in enumerate(messages, start=1):
+        if uid <= done:
+            skipped += 1
+            continue
+        batch.append((uid, raw))
+        if len(batch) >= batch_size:
+            _flush(provider, mailbox, batch, semantic)
+            imported += len(batch)
+            batch = []
+            print(f"Imported {imported} messages ({imported / (time.time() - start):.0f}/s)...")
+    if batch:
+        _flush(provider, mailbox, batch, semantic)
+        imported += len(batch)
+    return imported, skipped
+
+def search_archive(sender=None, subject=None, limit=5, provider=ARCHIVE_PROVIDER, has_attachment=False, date_from=None, date_to=None):
+    """Runs the local (synced) mail search path against imported archives."""
+    from .email_tools import find_emails_local
+    mailboxes = mail_cache.synced_mailboxes(provider)
+    if not mailboxes:
+        return []
+    return find_emails_local(
+        sender, subject, limit=limit, date_from=date_from, date_to=date_to, provider=provider,
+        has_attachment=has_attachment, mailboxes=mailboxes, fetch_missing=False
+    )
+
+def merge_archive(results, sender=None, subject=None, body=None, limit=5, date_from=None, date_to=None, has_attachment=False):
+    """
+    Adds imported-archive matches to a live account search: newest first, at most limit,
+    a message present in both (same Message-ID) listed once. Error strings pass through.
+    Body searches are left alone: archive bodies are reached through the semantic mail index.
+    """
+    if isinstance(results, str) or body or not (sender or subject or has_attachment):
+        return results
+    try:
+        archived = search_archive(sender, subject, limit=limit, has_attachment=has_attachment, date_from=date_from, date_to=date_to)
+    except Exception as e:
+        print(f"DEBUG: Archive search failed: {e}")
+        return results
+    if not archived:
+        return results
+    seen = {r.get("message_id") for r in results if r.get("message_id")}
+    merged = list(results) + [r for r in archived if not r.get("message_id") or r["message_id"] not in seen]
+    merged.sort(key=lambda r: mail_cache.parse_date_ts(r.get("received")) or 0, reverse=True)
+    return merged[:limit]
+
+def main():
+    parser = argparse.ArgumentParser(description="Jasper Mail Archive Importer (mbox / Maildir)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="Import an mbox file or Maildir folder")
+    imp.add_argument("path", help="Path to the mbox file or Maildir folder")
+    imp.add_argument("--provider", default=ARCHIVE_PROVIDER, help="Cache provider name (default: ARCHIVE)")
+    imp.add_argument("--mailbox", help="Mailbox name in the cache (default: archive file name)")
+    imp.add_argument("--semantic", action="store_true", help="Also embed bodies into the semantic mail index")
+    imp.add_argument("--batch", type=int, default=BATCH_SIZE, help="Messages per commit")
+    imp.add_argument("--restart", action="store_true", help="Drop earlier progress and import from scratch")
+
+    find = sub.add_parser("search", help="Search imported archives by sender/subject")
+    find.add_argument("--sender")
+    find.add_argument("--subject")
+    find.add_argument("--limit", type=int, default=5)
+    find.add_argument("--provider", default=ARCHIVE_PROVIDER)
+    find.add_argument("--has-attachment", action="store_true")
+
+    args = parser.parse_args()
+
+    if args.command == "import":
+        start = time.time()
+        imported, skipped = import_archive(
+            args.path, provider=args.provider, mailbox=args.mailbox,
+            semantic=args.semantic, batch_size=args.batch, restart=args.restart
+        )
+        print(f"Done: {imported} imported, {skipped} already present ({time.time() - start:.1f}s)")
+    elif args.command == "search":
+        start = time.time()
+        results = search_archive(args.sender, args.subject, limit=args.limit, provider=args.provider, has_attachment=args.has_attachment)
+        for r in results:
+            print(f"[{r['mailbox']}/{r['id']}] {r['received']} | {r['sender']} | {r['subject']}")
+        print(f"{len(results)} result(s) in {(time.time() - start) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import re
+import threading
+from bisect import bisect_left
+from email.utils import parseaddr
+from .header_index import normalize_header
+from . import mail_cache
+
+# Contact directory built from cached mail headers.
+# Resolves the free-text sender terms of a query ("sumandl", "sonja", "Šumandel")
+# to concrete addresses locally, so the server can be searched with exact FROM criteria
+# instead of a header sweep per guess.
+
+MATCH_EXACT = 1.0
+MATCH_PREFIX = 0.9
+MATCH_ADDRESS = 0.8
+MATCH_FUZZY = 0.6
+MAX_ADDRESSES = 5
+MIN_RESOLVE_LENGTH = 3
+# Address substrings are found through trigram postings; typo candidates through bigram postings
+ADDRESS_GRAM = 3
+TOKEN_GRAM = 2
+
+def _tokens(text):
+    return [t for t in re.split(r"[^a-z0-9]+", text) if t]
+
+def edit_distance(a, b, limit=2):
+    """Levenshtein distance, short-circuiting once every path exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+def _max_typos(word):
+    return 2 if len(word) >= 7 else 1 if len(word) >= 4 else 0
+
+def _grams(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+class ContactDirectory:
+    """
+    Senders seen in the mail cache: display name, address, message count and last seen.
+    Names and addresses are normalised once (unidecode + lowercase) and split into tokens
+    for prefix (bisect over the sorted token list) and edit-distance lookups. Address
+    substrings and typo candidates come from n-gram postings, so a lookup never scans
+    every contact or token.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._contacts = {}  # address -> {"address", "name", "count", "last_ts", "tokens"}
+        self._token_map = {}  # token -> {address}
+        self._sorted_tokens = None
+        self._token_grams = {}  # bigram -> {token}
+        self._address_grams = {}  # trigram -> {address}
+        self._seen = set()  # Message-IDs already counted (records are cached more than once)
+
+    def __len__(self):
+        return len(self._contacts)
+
+    def add(self, records):
+        """Counts the senders of search_emails-style records."""
+        with self._lock:
+            for record in records:
+                seen_key = record.get("message_id") or (record.get("sender"), record.get("received"))
+                if seen_key in self._seen:
+                    continue
+                self._seen.add(seen_key)
+                name, address = parseaddr(record.get("sender") or "")
+                address = address.lower()
+                if "@" not in address:
+                    continue
+                ts = mail_cache.parse_date_ts(record.get("received")) or 0
+                contact = self._contacts.get(address)
+                if contact is None:
+                    contact = {"address": address, "name": name, "count": 0, "last_ts": 0, "tokens": set()}
+                    self._contacts[address] = contact
+                    for gram in _grams(address, ADDRESS_GRAM):
+                        self._address_grams.setdefault(gram, set()).add(address)
+                contact["count"] += 1
+                if ts >= contact["last_ts"]:
+                    contact["last_ts"] = ts
+                    if name:
+                        contact["name"] = name
+                local_part = address.split("@")[0]
+                new_tokens = set(_tokens(normalize_header(name))) | set(_tokens(local_part)) | {local_part}
+                for token in new_tokens - contact["tokens"]:
+                    if token not in self._token_map:
+                        self._sorted_tokens = None
+                        for gram in _grams(token, TOKEN_GRAM):
+                            self._token_grams.setdefault(gram, set()).add(token)
+                    self._token_map.setdefault(token, set()).add(address)
+                contact["tokens"] |= new_tokens
+
+    def _address_matches(self, word):
+        """Addresses containing word (intersect the trigram postings, then confirm the substring)."""
+        candidates = None
+        for gram in _grams(word, ADDRESS_GRAM):
+            addresses = self._address_grams.get(gram)
+            if not addresses:
+                return []
+            candidates = addresses.copy() if candidates is None else candidates & addresses
+            if not candidates:
+                return []
+        return [a for a in candidates or () if word in a]
+
+    def _typo_candidates(self, word, typos):
+        """
+        Tokens that can be within `typos` edits of word. Each edit destroys at most TOKEN_GRAM
+        of the word's bigrams, so a candidate must share all but TOKEN_GRAM * typos of them.
+        """
+        grams = _grams(word, TOKEN_GRAM)
+        needed = len(grams) - TOKEN_GRAM * typos
+        if needed <= 0:
+            return [t for t in self._token_map if abs(len(t) - len(word)) <= typos]
+        shared = {}
+        for gram in grams:
+            for token in self._token_grams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        return [t for t, count in shared.items() if count >= needed and abs(len(t) - len(word)) <= typos]
+
+    def _word_scores(self, word, fuzzy=True):
+        """
+        Returns {address: best score} for one normalised query word.
+        Without fuzzy only exact token and address-substring matches count.
+        """
+        scores = {}
+
+        def bump(addresses, score):
+            for address in addresses:
+                if scores.get(address, 0) < score:
+                    scores[address] = score
+
+        bump(self._token_map.get(word, ()), MATCH_EXACT)
+
+        if fuzzy:
+            if self._sorted_tokens is None:
+                self._sorted_tokens = sorted(self._token_map)
+            i = bisect_left(self._sorted_tokens, word)
+            while i < len(self._sorted_tokens) and self._sorted_tokens[i].startswith(word):
+                bump(self._token_map[self._sorted_tokens[i]], MATCH_PREFIX)
+                i += 1
+
+        if len(word) >= ADDRESS_GRAM:
+            bump(self._address_matches(word), MATCH_ADDRESS)
+
+        typos = _max_typos(word) if fuzzy else 0
+        if typos:
+            for token in self._typo_candidates(word, typos):
+                if edit_distance(word, token, typos) <= typos:
+                    bump(self._token_map[token], MATCH_FUZZY)
+        return scores
+
+    def lookup(self, term, limit=5, fuzzy=True):
+        """
+        Fuzzy contact search (accent-insensitive, prefix, edit distance).
+        Every word of term must match the contact; ties go to frequent, then recent senders.
+        fuzzy=False keeps exact token and address matches only.
+        Returns [{"address", "name", "count", "score"}], best first.
+        """
+        words = _tokens(normalize_header(term))
+        if not words:
+            return []
+        with self._lock:
+            combined = None
+            for word in words:
+                scores = self._word_scores(word, fuzzy)
+                if combined is None:
+                    combined = scores
+                else:
+                    combined = {a: min(s, scores[a]) for a, s in combined.items() if a in scores}
+                if not combined:
+                    return []
+            ranked = sorted(
+                combined.items(),
+                key=lambda item: (item[1], self._contacts[item[0]]["count"], self._contacts[item[0]]["last_ts"]),
+                reverse=True
+            )
+            return [
+                {"address": a, "name": self._contacts[a]["name"], "count": self._contacts[a]["count"], "score": s}
+                for a, s in ranked[:limit]
+            ]
+
+    def resolve(self, term):
+        """
+        Addresses a sender term confidently refers to: every contact sharing the best score,
+        or [] if nothing matches or the term is too ambiguous to turn into FROM criteria.
+        Only exact name tokens and address substrings count; prefix and typo matches are
+        suggestions (lookup), never search criteria.
+        """
+        # One or two letters prefix-match half the address book
+        if all(len(w) < MIN_RESOLVE_LENGTH for w in _tokens(normalize_header(term))):
+            return []
+        matches = self.lookup(term, limit=MAX_ADDRESSES + 1, fuzzy=False)
+        if not matches:
+            return []
+        best = matches[0]["score"]
+        addresses = [m["address"] for m in matches if m["score"] == best]
+        if len(addresses) > MAX_ADDRESSES:
+            return []
+        return addresses
+
+# One directory per provider, built lazily from the mail cache
+_directories = {}
+_directories_lock = threading.Lock()
+
+def get_contact_directory(provider="GMAIL"):
+    with _directories_lock:
+        directory = _directories.get(provider)
+        if directory is None:
+            directory = ContactDirectory()
+            try:
+                directory.add(mail_cache.iter_headers(provider))
+            except Exception as e:
+                print(f"DEBUG: Contact directory build failed: {e}")
+            print(f"DEBUG: Contact directory ({provider}) built with {len(directory)} contacts")
+            _directories[provider] = directory
+        return directory
+
+def note_senders(provider, records):
+    """Feeds freshly cached records to the directory (a no-op until it has been built)."""
+    with _directories_lock:
+        directory = _directories.get(provider)
+    if directory is not None:
+        directory.add(records)
+
+def resolve_sender(sender_name, provider="GMAIL"):
+    """Concrete addresses for a free-text sender term ([] if unknown or ambiguous)."""
+    if not sender_name:
+        return []
+    if "@" in sender_name:
+        return [sender_name.strip().lower()]
+    addresses = get_contact_directory(provider).resolve(sender_name)
+    if addresses:
+        print(f"DEBUG: Contact directory resolved '{sender_name}' -> {addresses}")
+    return addresses
@@ -1,12 +1,14 @@
 import imaplib
 import email
-from email.header import decode_header
 import os
-from ..utility.config import get_credentials
+from ..utility.config import get_credentials, get_setting, get_int_setting
 import shlex
 import sys
 import re
 import datetime
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
 
 # Windows Console Encoding Fix
 if sys.platform == "win32":
@@ -14,6 +16,13 @@ if sys.platform == "win32":
 
 # IMAP Settings
 from unidecode import unidecode
+from .header_index import get_header_index
+from .contact_directory import note_senders, resolve_sender
+from . import mail_cache
+from .imap_pool import get_pool
+from .mime_parse import decode_mime_header, iter_fetch_batches
+from ..utility.metrics import IMAP_SECONDS, IMAP_FETCHED_BYTES
+from ..utility.tracing import span
 
 IMAP_SERVERS = {
     "GMAIL": "imap.gmail.com",
@@ -21,6 +30,9 @@ IMAP_SERVERS = {
 }
 IMAP_PORT = 993
 
+# Shared by multi-mailbox searches; each task holds one pooled connection
+_mailbox_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="imap-mailbox")
+
 def normalize_text(text):
     """
     Replaces special characters with ASCII equivalents using unidecode.
@@ -36,8 +48,10 @@ def connect_imap(email_user, email_pass, provider="GMAIL"):
     try:
         server = IMAP_SERVERS.get(provider, "imap.gmail.com")
         print(f"DEBUG: Connecting to IMAP {server} for {provider}...")
-        mail = imaplib.IMAP4_SSL(server, IMAP_PORT)
-        mail.login(email_user, email_pass)
+        with IMAP_SECONDS.time(provider=provider, op="connect"), span("imap.connect", provider=provider, server=server):
+            mail = imaplib.IMAP4_SSL(server, IMAP_PORT)
+            mail.login(email_user, email_pass)
+        mail.provider_name = provider
         return mail
     except Exception as e:
         return f"Error connecting to IMAP ({provider}): {str(e)}"
@@ -45,77 +59,102 @@ def connect_imap(email_user, email_pass, provider="GMAIL"):
 # Credentials are now managed by utility.config
 pass
 
-def decode_mime_header(raw_header):
-    if not raw_header:
-        return "No Subject"
-    try:
-        decoded = decode_header(raw_header)
-        parts = []
-        for text, encoding in decoded:
-            if isinstance(text, bytes):
-                try:
-                    parts.append(text.decode(encoding if encoding else "utf-8", errors="ignore"))
-                except LookupError:
-                    parts.append(text.decode("utf-8", errors="ignore"))
-            else:
-                parts.append(str(text))
-        return " ".join(parts)
-    except Exception:
-        return str(raw_header)
+def fetched_bytes(msg_data):
+    """Size of a FETCH response (message literals plus response lines)."""
+    total = 0
+    for part in msg_data or []:
+        if isinstance(part, tuple):
+            total += sum(len(p) for p in part if isinstance(p, bytes))
+        elif isinstance(part, bytes):
+            total += len(part)
+    return total
+
+def quote_mailbox(mailbox):
+    """Quotes mailbox names with spaces or brackets (e.g. "[Gmail]/All Mail") for SELECT."""
+    if mailbox.startswith('"'):
+        return mailbox
+    if any(c in mailbox for c in ' []()'):
+        return f'"{mailbox}"'
+    return mailbox
+
+def get_mailboxes(provider="GMAIL"):
+    """
+    Mailboxes searched for a provider, from <PROVIDER>_MAILBOXES
+    (a list in constants.json or a comma separated string). Defaults to INBOX only.
+    """
+    value = get_setting(f"{provider}_MAILBOXES")
+    if isinstance(value, str):
+        value = [v.strip() for v in value.split(",")]
+    mailboxes = [m for m in (value or []) if m]
+    return mailboxes or ["INBOX"]
 
-def search_emails(criteria_parts, limit=5, provider="GMAIL", headers_only=False, use_uid=False, fetch_specific_ids=None):
+def search_emails(criteria_parts, limit=5, provider="GMAIL", headers_only=False, use_uid=False, fetch_specific_ids=None, mailbox="INBOX", oldest_first=False):
     """
     Search emails with standard IMAP.
     criteria_parts: List of strings like ['FROM', 'Anja'] or ['X-GM-RAW', '"query"']
     use_uid: If True, uses mail.uid('search', ...) and mail.uid('fetch', ...) (Recommended for consistency)
     fetch_specific_ids: list of IDs (UIDs if use_uid=True) to fetch directly, bypassing search.
+    mailbox: folder to search; every result is tagged with it.
+    oldest_first: keep the oldest `limit` matches instead of the newest (incremental polling).
     """
     # Debug info
     if fetch_specific_ids:
-         print(f"DEBUG: IMAP MATCH FETCH ({provider}) -> IDs: {len(fetch_specific_ids)} items (UID={use_uid}, headers_only={headers_only})")
+         print(f"DEBUG: IMAP MATCH FETCH ({provider}/{mailbox}) -> IDs: {len(fetch_specific_ids)} items (UID={use_uid}, headers_only={headers_only})")
     else:
-         print(f"DEBUG: IMAP SEARCH CRITERIA ({provider}) -> {criteria_parts} (UID={use_uid}, headers_only={headers_only})")
+         print(f"DEBUG: IMAP SEARCH CRITERIA ({provider}/{mailbox}) -> {criteria_parts} (UID={use_uid}, headers_only={headers_only})")
          
     email_user, email_pass = get_credentials(provider=provider)
     
     if not email_user or not email_pass or "your-email" in email_user:
         return f"Error: Please set {provider}_USER and {provider}_PASS in constants.json."
         
-    mail = connect_imap(email_user, email_pass, provider=provider)
-    if isinstance(mail, str):
-        return mail
-        
     try:
-        mail.select("inbox")
-        
-        # 1. IDENTIFY IDs TO MEANINGFULLY FETCH
-        mail_ids = []
+        with get_pool(provider).connection() as mail:
+            return _search_mailbox(mail, criteria_parts, limit, headers_only, use_uid, fetch_specific_ids, mailbox, oldest_first)
+    except ConnectionError as e:
+        return str(e)
+    except Exception as e:
+        return f"Error during IMAP search: {str(e)}"
+
+def _search_mailbox(mail, criteria_parts, limit, headers_only, use_uid, fetch_specific_ids, mailbox, oldest_first=False):
+    """Runs one search/fetch on a pooled connection (see search_emails)."""
+    provider = getattr(mail, "provider_name", "unknown")
+    if getattr(mail, "selected_mailbox", None) != mailbox:
+        with IMAP_SECONDS.time(provider=provider, op="select"), span("imap.select", provider=provider, mailbox=mailbox):
+            status, _ = mail.select(quote_mailbox(mailbox))
+        if status != "OK":
+            return f"Error: Could not open mailbox '{mailbox}'."
+        mail.selected_mailbox = mailbox
+    
+    # 1. IDENTIFY IDs TO MEANINGFULLY FETCH
+    mail_ids = []
+    
+    if fetch_specific_ids:
+        # We already have the IDs we want to fetch
+        mail_ids = fetch_specific_ids
+    else:
+        # We need to searching first
         
-        if fetch_specific_ids:
-            # We already have the IDs we want to fetch
-            mail_ids = fetch_specific_ids
-        else:
-            # We need to searching first
-            
-            # Helper to quote strings with spaces
-            def quote_if_needed(s):
-                keywords = ["FROM", "SUBJECT", "SINCE", "BEFORE", "OR", "UID", "X-GM-RAW"]
-                if s.upper() in keywords:
-                    return s
-                if " " in s and not s.startswith('"') and not s.endswith('"'):
-                    return f'"{s}"'
+        # Helper to quote strings with spaces
+        def quote_if_needed(s):
+            keywords = ["FROM", "SUBJECT", "BODY", "SINCE", "BEFORE", "OR", "UID", "X-GM-RAW"]
+            if s.upper() in keywords:
                 return s
-                
-            # Determine if we need UTF-8 and apply quoting
-            needs_utf8 = False
-            for i, p in enumerate(criteria_parts):
-                criteria_parts[i] = quote_if_needed(p)
-                try:
-                    criteria_parts[i].encode('ascii')
-                except UnicodeEncodeError:
-                    needs_utf8 = True
+            if " " in s and not s.startswith('"') and not s.endswith('"'):
+                return f'"{s}"'
+            return s
             
-            # SEARCH EXECUTION
+        # Determine if we need UTF-8 and apply quoting
+        needs_utf8 = False
+        for i, p in enumerate(criteria_parts):
+            criteria_parts[i] = quote_if_needed(p)
+            try:
+                criteria_parts[i].encode('ascii')
+            except UnicodeEncodeError:
+                needs_utf8 = True
+        
+        # SEARCH EXECUTION
+        with IMAP_SECONDS.time(provider=provider, op="search"), span("imap.search", provider=provider, mailbox=mailbox) as current:
             if use_uid:
                 # UID SEARCH
                 if needs_utf8:
@@ -130,129 +169,263 @@ def search_emails(criteria_parts, limit=5, provider="GMAIL", headers_only=False,
                     status, messages = mail.search("UTF-8", *encoded_parts)
                 else:
                     status, messages = mail.search(None, *criteria_parts)
-            
-            if status != "OK":
-                return f"Search failed: {status} {messages}"
-                
-            mail_ids = [m for m in messages[0].split() if m]
-            # Apply limit - latest emails first
-            mail_ids = mail_ids[::-1][:limit]
-        
-        if not mail_ids:
-            mail.logout()
-            return []
-            
-        # 2. FETCH DATA FOR THESE IDs
-        # OPTIMIZATION: Batch fetch
-        # Ensure ids are bytes
-        encoded_ids = []
-        for mid in mail_ids:
-            if isinstance(mid, str):
-                encoded_ids.append(mid.encode('ascii'))
-            else:
-                encoded_ids.append(mid)
-                
-        batch_ids = b",".join(encoded_ids)
         
-        # Determine Fetch Command and Criteria
-        # Ensure we request UID if we are using UIDs, so we can map results back accurately
-        base_criteria = "RFC822.HEADER" if headers_only else "RFC822"
-        fetch_criteria = f"(UID {base_criteria})"
+            if status == "OK":
+                current.set_attribute("match_count", len(messages[0].split()))
         
-        print(f"DEBUG: Batch fetching {len(mail_ids)} items using {'UID ' if use_uid else ''}FETCH...")
+        if status != "OK":
+            return f"Search failed: {status} {messages}"
+            
+        mail_ids = [m for m in messages[0].split() if m]
+        # Apply limit - latest emails first (or the oldest, so nothing is skipped when polling ranges)
+        mail_ids = mail_ids[:limit] if oldest_first else mail_ids[::-1][:limit]
+    
+    if not mail_ids:
+        return []
         
+    # 2. FETCH DATA FOR THESE IDs
+    # OPTIMIZATION: Batch fetch
+    # Ensure ids are bytes
+    encoded_ids = []
+    for mid in mail_ids:
+        if isinstance(mid, str):
+            encoded_ids.append(mid.encode('ascii'))
+        else:
+            encoded_ids.append(mid)
+            
+    batch_ids = b",".join(encoded_ids)
+    
+    # Determine Fetch Command and Criteria
+    # Ensure we request UID if we are using UIDs, so we can map results back accurately
+    # BODYSTRUCTURE is tiny and gives attachment names/types/sizes without downloading them
+    base_criteria = "RFC822.HEADER" if headers_only else "RFC822"
+    fetch_criteria = f"(UID BODYSTRUCTURE {base_criteria})"
+    
+    print(f"DEBUG: Batch fetching {len(mail_ids)} items using {'UID ' if use_uid else ''}FETCH...")
+    
+    with IMAP_SECONDS.time(provider=provider, op="fetch"), span("imap.fetch", provider=provider, mailbox=mailbox, message_count=len(mail_ids), headers_only=headers_only) as current:
         if use_uid:
              status, msg_data = mail.uid("fetch", batch_ids, fetch_criteria)
         else:
              status, msg_data = mail.fetch(batch_ids, fetch_criteria)
+        size = fetched_bytes(msg_data)
+        current.set_attribute("bytes", size)
+    IMAP_FETCHED_BYTES.inc(size, provider=provider)
+    
+    if status != "OK":
+        # If fetch failed, it might be due to valid UIDs disappearing (deleted logic). Return empty.
+        print(f"DEBUG: Fetch failed (status {status}), possibly due to invalid IDs.")
+        return []
         
-        if status != "OK":
-            mail.logout()
-            # If fetch failed, it might be due to valid UIDs disappearing (deleted logic). Return empty.
-            print(f"DEBUG: Fetch failed (status {status}), possibly due to invalid IDs.")
-            return []
-            
-        results = []
-        # msg_data is a list of (metadata, content) tuples followed by a closing string
-        # Parsing is trickier with UID included in response
-        for response_part in msg_data:
-            if isinstance(response_part, tuple):
-                # response_part[0] is metadata e.g. b'1234 (UID 9999 RFC822.HEADER {size})'
-                # response_part[1] is content
-                
-                meta = response_part[0].decode(errors="ignore")
-                msg = email.message_from_bytes(response_part[1])
-                
-                # Extract ID (UID or Seq)
-                s_id = "?"
-                if use_uid:
-                    # Parse proper UID from metadata: "123 (UID 5678 ...)"
-                    uid_match = re.search(r"UID\s+(\d+)", meta)
-                    if uid_match:
-                        s_id = uid_match.group(1)
-                    else:
-                        print(f"DEBUG: Warning - Could not parse UID from '{meta}'")
-                else:
-                    # Sequence number is at the start
-                    s_id = meta.split()[0]
+    # Records are stamped as each parsed chunk streams back; the caller still needs the whole
+    # list to merge folders by date, so it is collected here rather than yielded further
+    results = []
+    for records in iter_fetch_batches(msg_data, headers_only=headers_only, use_uid=use_uid):
+        for item in records:
+            item["mailbox"] = mailbox
+        results.extend(records)
+    
+    # Sort results based on original id order (latest first)
+    # Note: mail_ids are bytes, s_id is string
+    if fetch_specific_ids:
+         # Convert fetch_specific_ids to strings for comparison
+         target_order = [x.decode() if isinstance(x, bytes) else str(x) for x in fetch_specific_ids]
+         id_map = {uid: i for i, uid in enumerate(target_order)}
+         results.sort(key=lambda x: id_map.get(x['id'], 999))
+    else:
+         # Just reverse if not specific (implicit date order)
+         pass 
                 
-                # Safe Header Decoding
-                subject = decode_mime_header(msg.get("Subject"))
-                sender = decode_mime_header(msg.get("From"))
-                msg_id = msg.get("Message-ID", "").strip("<>")
-                    
-                # Extract body snippet (only if not headers_only)
-                body_snippet = ""
-                if not headers_only:
-                    body_content = ""
-                    if msg.is_multipart():
-                        for part in msg.walk():
-                            if part.get_content_type() == "text/plain":
-                                try:
-                                    body_content = part.get_payload(decode=True).decode(errors="ignore")
-                                    break
-                                except: pass
-                    else:
-                        try:
-                            body_content = msg.get_payload(decode=True).decode(errors="ignore")
-                        except: pass
-                    
-                    # Clean up body snippet
-                    body_snippet = " ".join(body_content.split())[:1000]
-                    
-                results.append({
-                    "id": s_id, # This is now consistently the UID if use_uid=True
-                    "subject": subject,
-                    "sender": sender,
-                    "received": str(msg.get("Date", "Unknown date")),
-                    "message_id": msg_id,
-                    "body": body_snippet
-                })
+    return results
+
+def merge_mailbox_results(results_by_mailbox, mailboxes):
+    """
+    Merges per-mailbox results newest first, de-duplicated by Message-ID.
+    When a message sits in several folders (e.g. INBOX and All Mail) the copy from the
+    earlier configured mailbox wins.
+    """
+    merged = []
+    seen = set()
+    for mailbox in mailboxes:
+        for item in results_by_mailbox.get(mailbox, []):
+            key = item.get("message_id") or (mailbox, item.get("id"))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(item)
+    merged.sort(key=lambda x: mail_cache.parse_date_ts(x.get("received")) or 0, reverse=True)
+    return merged
+
+def _run_per_mailbox(jobs, provider):
+    """
+    Runs {mailbox: callable} concurrently on pooled connections.
+    Each folder gets MAIL_FOLDER_TIMEOUT seconds; a slow folder is skipped, not waited for.
+    Returns ({mailbox: list}, first error string or None).
+    """
+    timeout = get_int_setting("MAIL_FOLDER_TIMEOUT", 20)
+    # Each job runs in a copy of the caller's context so its spans stay in the request trace
+    futures = {_mailbox_executor.submit(contextvars.copy_context().run, job): mailbox for mailbox, job in jobs.items()}
+    done, not_done = wait(futures, timeout=timeout)
+    
+    results, error = {}, None
+    for future in not_done:
+        print(f"DEBUG: Mailbox '{futures[future]}' ({provider}) timed out after {timeout}s, skipping.")
+    for future in done:
+        mailbox = futures[future]
+        try:
+            res = future.result()
+        except Exception as e:
+            res = f"Error during IMAP search: {str(e)}"
+        if isinstance(res, str):
+            print(f"DEBUG: Mailbox '{mailbox}' ({provider}) failed: {res}")
+            error = error or res
+            continue
+        results[mailbox] = res
+    return results, error
+
+def search_mailboxes(criteria_parts, mailboxes=None, limit=5, provider="GMAIL", headers_only=False, use_uid=False):
+    """
+    Runs the same search in several mailboxes at once (one pooled connection each)
+    and merges the results by date, de-duplicated by Message-ID.
+    """
+    mailboxes = mailboxes or get_mailboxes(provider)
+    jobs = {
+        mb: partial(search_emails, list(criteria_parts), limit=limit, provider=provider,
+                    headers_only=headers_only, use_uid=use_uid, mailbox=mb)
+        for mb in mailboxes
+    }
+    results, error = _run_per_mailbox(jobs, provider)
+    if not results and error:
+        return error
+    return merge_mailbox_results(results, mailboxes)
+
+def fetch_mailbox_uids(keys, provider="GMAIL"):
+    """Fetches full messages for (mailbox, uid) keys, folders in parallel; keeps the order of keys."""
+    by_mailbox = {}
+    for mailbox, uid in keys:
+        by_mailbox.setdefault(mailbox, []).append(uid)
+    jobs = {
+        mb: partial(search_emails, [], limit=len(uids), provider=provider, headers_only=False,
+                    use_uid=True, fetch_specific_ids=uids, mailbox=mb)
+        for mb, uids in by_mailbox.items()
+    }
+    results, error = _run_per_mailbox(jobs, provider)
+    if not results and error:
+        return error
+    found = {(item["mailbox"], item["id"]): item for items in results.values() for item in items}
+    return [found[k] for k in keys if k in found]
+
+def cache_records(provider, records, mailbox="INBOX", with_bodies=False):
+    """Mirrors fetched records into the local mail cache; cache failures never break a search."""
+    try:
+        mail_cache.store_records(provider, mailbox, records, with_bodies=with_bodies)
+    except Exception as e:
+        print(f"DEBUG: Mail cache write failed: {e}")
+    note_senders(provider, records)
+
+def load_cached_keys(provider, keys, fetch_missing=True):
+    """
+    Returns records for (mailbox, uid) keys from the local cache, in key order.
+    Bodies that are not cached yet are fetched from the server (by UID, folders in parallel).
+    """
+    by_mailbox = {}
+    for mailbox, uid in keys:
+        by_mailbox.setdefault(mailbox, []).append(uid)
         
-        # Sort results based on original id order (latest first)
-        # Note: mail_ids are bytes, s_id is string
-        if fetch_specific_ids:
-             # Convert fetch_specific_ids to strings for comparison
-             target_order = [x.decode() if isinstance(x, bytes) else str(x) for x in fetch_specific_ids]
-             id_map = {uid: i for i, uid in enumerate(target_order)}
-             results.sort(key=lambda x: id_map.get(x['id'], 999))
-        else:
-             # Just reverse if not specific (implicit date order)
-             pass 
+    if fetch_missing:
+        missing = [(mb, uid) for mb, uids in by_mailbox.items() for uid in mail_cache.missing_bodies(provider, mb, uids)]
+        if missing:
+            fetched = fetch_mailbox_uids(missing, provider=provider)
+            if isinstance(fetched, list):
+                for mb in by_mailbox:
+                    cache_records(provider, [r for r in fetched if r["mailbox"] == mb], mailbox=mb, with_bodies=True)
                     
-        mail.logout()
-        return results
-    except Exception as e:
-        return f"Error during IMAP search: {str(e)}"
+    cached = {}
+    for mb, uids in by_mailbox.items():
+        for uid, record in mail_cache.get_records(provider, mb, uids).items():
+            cached[(mb, uid)] = record
+    return [cached[k] for k in keys if k in cached]
+
+def match_keys(provider, keys, sender_name=None, subject_text=None, has_attachment=False, sender_addresses=None):
+    """
+    Filters (mailbox, uid) keys through the header index, keeping their order.
+    A sender matches by its free-text term or any address the contact directory resolved it to.
+    """
+    index = get_header_index(provider)
+    senders = [sender_name] + list(sender_addresses or []) if sender_name else [None]
+    hits = set()
+    for sender in senders:
+        hits.update(index.match(sender=sender, subject=subject_text, keys=keys, has_attachment=has_attachment))
+    return [k for k in keys if k in hits]
+
+def sender_criteria(sender_name, sender_addresses):
+    """
+    IMAP FROM criteria for a sender: any resolved address, or every word of the free-text term
+    (the same alternatives match_keys accepts).
+    """
+    words = [c for part in sender_name.split() for c in ("FROM", part)]
+    if not sender_addresses:
+        return words
+    if len(words) > 2:
+        # Several words form one parenthesised key: (FROM sonja FROM sumandl)
+        words[0] = "(" + words[0]
+        words[-1] = words[-1] + ")"
+    # IMAP OR is binary and prefix: OR FROM a OR FROM b <term>
+    criteria = []
+    for address in sender_addresses:
+        criteria.extend(["OR", "FROM", address])
+    return criteria + words
 
-def find_emails(sender_name=None, subject_text=None, limit=5, date_from=None, date_to=None, provider="GMAIL"):
+def find_emails_local(sender_name=None, subject_text=None, limit=5, date_from=None, date_to=None, provider="GMAIL", has_attachment=False, mailboxes=None, fetch_missing=True, sender_addresses=None):
+    """
+    Answers a sender/subject query from the local header cache and index.
+    Only bodies that are not cached yet are fetched from the server (by UID),
+    unless fetch_missing is off (e.g. for imported archives, which have no server).
     """
-    Search emails by sender or subject.
+    keys = mail_cache.find_keys(provider, date_from=date_from, date_to=date_to, mailboxes=mailboxes or get_mailboxes(provider))
+    # Rows cached since the index was warmed by someone else (e.g. an archive import in another process)
+    index = get_header_index(provider)
+    unindexed = {}
+    for mb, uid in keys:
+        if (mb, uid) not in index:
+            unindexed.setdefault(mb, []).append(uid)
+    for mb, uids in unindexed.items():
+        for i in range(0, len(uids), 500):
+            index.add(mail_cache.get_records(provider, mb, uids[i:i + 500], with_bodies=False).values(), mailbox=mb)
+    matched = match_keys(provider, keys, sender_name, subject_text, has_attachment, sender_addresses)
+    print(f"DEBUG: Local mail search ({provider}) -> {len(matched)} of {len(keys)} cached candidates")
+    if not matched:
+        return []
+    
+    # The same message can be cached in several folders; keep the first (newest-ordered) copy
+    headers = {}
+    for mb in {mb for mb, _ in matched}:
+        for uid, record in mail_cache.get_records(provider, mb, [u for m, u in matched if m == mb]).items():
+            headers[(mb, uid)] = record
+    final_keys, seen = [], set()
+    for key in matched:
+        msg_id = headers.get(key, {}).get("message_id") or key
+        if msg_id in seen:
+            continue
+        seen.add(msg_id)
+        final_keys.append(key)
+        if len(final_keys) >= limit:
+            break
+            
+    return load_cached_keys(provider, final_keys, fetch_missing=fetch_missing)
+
+def find_emails(sender_name=None, subject_text=None, limit=5, date_from=None, date_to=None, provider="GMAIL", has_attachment=False, body_text=None):
+    """
+    Search emails by sender, subject or body text.
     Uses X-GM-RAW for Gmail to handle robust queries (unicode/phrases).
+    has_attachment is evaluated locally from BODYSTRUCTURE metadata (no downloads).
+    body_text is matched by the server (Gmail full-text search, IMAP BODY), e.g. when the
+    semantic mail index has nothing for a content query.
     """
     # Normalize special characters to ASCII
     sender_name_norm = normalize_text(sender_name).lower() if sender_name else None
     subject_text_norm = normalize_text(subject_text).lower() if subject_text else None
+    body_text_norm = " ".join(normalize_text(body_text).replace('"', " ").split()) if body_text else None
     
     # Strip quotes for clean local keyword matching
     if subject_text_norm:
@@ -260,8 +433,17 @@ def find_emails(sender_name=None, subject_text=None, limit=5, date_from=None, da
     
     is_gmail = (provider == "GMAIL")
     
+    # Resolve the sender term to known addresses (accent-insensitive, prefix, typos) from cached headers
+    sender_addresses = resolve_sender(sender_name_norm, provider) if sender_name_norm else []
+    
+    # LOCAL FAST PATH: the background sync worker already mirrors this window
+    from .sync_worker import is_synced
+    # (the local cache holds snippets only, so body searches always go to the server)
+    if (sender_name or subject_text or has_attachment) and not body_text_norm and is_synced(provider, date_from, get_mailboxes(provider)):
+        return find_emails_local(sender_name_norm, subject_text_norm, limit=limit, date_from=date_from, date_to=date_to, provider=provider, has_attachment=has_attachment, sender_addresses=sender_addresses)
+    
     # GMAIL OPTIMIZATION (Option C): Use broad date search + UID fetch + local filtering
-    if is_gmail and (sender_name or subject_text):
+    if is_gmail and (sender_name or subject_text or has_attachment or body_text_norm):
         xq = []
         from datetime import timedelta
         if date_from:
@@ -270,7 +452,17 @@ def find_emails(sender_name=None, subject_text=None, limit=5, date_from=None, da
             inclusive_end = date_to + timedelta(days=1)
             xq.append(f'before:{inclusive_end.strftime("%Y/%m/%d")}')
         
-        # Construct query - strictly date range
+        # Known sender: let the server narrow the sweep to its addresses, or the term itself
+        # (the same alternatives match_keys accepts); {} is Gmail's OR group
+        if sender_addresses:
+            terms = [f"from:{a}" for a in sender_addresses] + [f"from:({sender_name_norm})"]
+            xq.append("{" + " ".join(terms) + "}")
+        
+        # Body text: Gmail's own full-text search narrows the sweep
+        if body_text_norm:
+            xq.append(body_text_norm)
+        
+        # Construct query - date range (plus resolved sender addresses)
         full_query = " ".join(xq)
         quoted_query = f'"{full_query}"' if full_query else '""'
         
@@ -281,51 +473,38 @@ def find_emails(sender_name=None, subject_text=None, limit=5, date_from=None, da
         fetch_limit = 3000
         
         # CRITICAL CHANGE: use_uid=True
-        raw_results = search_emails(["X-GM-RAW", quoted_query], limit=fetch_limit, provider=provider, headers_only=True, use_uid=True)
+        # All configured mailboxes (INBOX, Sent, All Mail...) are swept concurrently
+        raw_results = search_mailboxes(["X-GM-RAW", quoted_query], limit=fetch_limit, provider=provider, headers_only=True, use_uid=True)
         
         if isinstance(raw_results, str): # Error string
             return raw_results
             
         print(f"DEBUG: Processing {len(raw_results)} candidates for filtering...")
         
-        # STEP 3: Local Python Filtering
-        matched_uids = []
-        for item in raw_results:
-            match = True
-            
-            # Local Debug
-            s_norm_debug = normalize_text(item['subject']).lower()
-            if "ljeto" in s_norm_debug or "zavala" in s_norm_debug:
-                 print(f"DEBUG: Candidate found: {item['subject']} (UID: {item['id']})")
-            
-            if sender_name_norm:
-                sender_val = normalize_text(item['sender']).lower()
-                for word in sender_name_norm.split():
-                    if word not in sender_val:
-                        match = False
-                        break
-            
-            if subject_text_norm and match:
-                subj_val = normalize_text(item['subject']).lower()
-                for word in subject_text_norm.split():
-                    if word not in subj_val:
-                        match = False
-                        break
-                    
-            if match:
-                print(f"DEBUG: MATCHED UID {item['id']}")
-                matched_uids.append(item['id'])
+        # STEP 3: Local Filtering via the normalised header index
+        # Headers are normalised once when indexed; repeated queries only intersect postings.
+        index = get_header_index(provider)
+        for mb in {item["mailbox"] for item in raw_results}:
+            mb_results = [item for item in raw_results if item["mailbox"] == mb]
+            cache_records(provider, mb_results, mailbox=mb)
+            index.add(mb_results, mailbox=mb)
+        window = [(item["mailbox"], item['id']) for item in raw_results]
+        matched_keys = match_keys(provider, window, sender_name_norm, subject_text_norm, has_attachment, sender_addresses)
+        for mb, uid in matched_keys:
+            print(f"DEBUG: MATCHED UID {uid} ({mb})")
         
-        if not matched_uids:
+        if not matched_keys:
             return []
             
         # STEP 4: Fetch bodies ONLY for the actual matched UIDs through explicit UID fetch
-        print(f"DEBUG: Gmail Match! Fetching full bodies for {len(matched_uids)} items via UID...")
-        real_limit = limit if len(matched_uids) > limit else len(matched_uids)
-        final_uids = matched_uids[:real_limit]
+        print(f"DEBUG: Gmail Match! Fetching full bodies for {len(matched_keys)} items via UID...")
+        final_keys = matched_keys[:limit]
         
-        # Call search_emails with explicit fetch_specific_ids (UIDs)
-        return search_emails([], limit=limit, provider=provider, headers_only=False, use_uid=True, fetch_specific_ids=final_uids)
+        results = fetch_mailbox_uids(final_keys, provider=provider)
+        if isinstance(results, list):
+            for mb in {mb for mb, _ in final_keys}:
+                cache_records(provider, [r for r in results if r["mailbox"] == mb], mailbox=mb, with_bodies=True)
+        return results
 
 
     # STANDARD IMAP FALLBACK (Outlook, etc.)
@@ -335,13 +514,16 @@ def find_emails(sender_name=None, subject_text=None, limit=5, date_from=None, da
     
     criteria = []
     if sender_name:
-        for part in sender_name.split():
-             criteria.extend(["FROM", part])
+        criteria.extend(sender_criteria(sender_name, sender_addresses))
     
     if subject_text:
         clean_subj = subject_text.strip('"').strip("'")
         for part in clean_subj.split():
              criteria.extend(["SUBJECT", part])
+    
+    if body_text_norm:
+        for part in body_text_norm.split():
+            criteria.extend(["BODY", part])
         
     if date_from:
         imap_date_from = date_from.strftime("%d-%b-%Y")
@@ -353,10 +535,120 @@ def find_emails(sender_name=None, subject_text=None, limit=5, date_from=None, da
         imap_date_to = inclusive_to.strftime("%d-%b-%Y")
         criteria.extend(["BEFORE", imap_date_to])
         
-    if not criteria:
+    if not criteria and not has_attachment:
+        return "Error: No search criteria provided."
+        
+    if has_attachment:
+        # IMAP SEARCH has no attachment criterion: sweep headers + BODYSTRUCTURE,
+        # filter locally, then download only the messages we return.
+        candidates = search_mailboxes(criteria or ["ALL"], limit=3000, provider=provider, headers_only=True, use_uid=True)
+        if isinstance(candidates, str):
+            return candidates
+        for mb in {item["mailbox"] for item in candidates}:
+            cache_records(provider, [r for r in candidates if r["mailbox"] == mb], mailbox=mb)
+        final_keys = [(item["mailbox"], item["id"]) for item in candidates if item.get("has_attachment")][:limit]
+        print(f"DEBUG: Attachment filter kept {len(final_keys)} of {len(candidates)} candidates")
+        if not final_keys:
+            return []
+        results = fetch_mailbox_uids(final_keys, provider=provider)
+        if isinstance(results, list):
+            for mb in {k[0] for k in final_keys}:
+                cache_records(provider, [r for r in results if r["mailbox"] == mb], mailbox=mb, with_bodies=True)
+        return results
+    
+    results = search_mailboxes(criteria, limit=limit, provider=provider)
+    return results[:limit] if isinstance(results, list) else results
+
+def incremental_query_key(sender_name=None, subject_text=None, has_attachment=False):
+    """Normalised identity of a query, so "Anja" and "anja " share one watermark."""
+    sender = " ".join(normalize_text(sender_name).lower().split()) if sender_name else ""
+    subject = " ".join(normalize_text(subject_text).lower().strip("'\"").split()) if subject_text else ""
+    return f"from={sender}|subject={subject}|attachment={int(bool(has_attachment))}"
+
+def find_emails_incremental(sender_name=None, subject_text=None, limit=5, provider="GMAIL", has_attachment=False):
+    """
+    "Any new mail from Anja?": returns matches newer than the per-query UID high-water mark,
+    merged with the results cached for the same query earlier (new items carry is_new=True).
+    A repeat poll costs one UID-range SEARCH per mailbox plus a FETCH of the new matches only.
+
+    The first run of a query only searches the last MAIL_INCREMENTAL_SEED_DAYS and sets the
+    mark at the newest match. Later runs take the oldest `limit` matches above the mark and
+    advance it over those only, so matches beyond the limit are returned by the next poll.
+    """
+    if not (sender_name or subject_text or has_attachment):
         return "Error: No search criteria provided."
+        
+    key = incremental_query_key(sender_name, subject_text, has_attachment)
+    state = mail_cache.get_query_state(provider, key)
     
-    return search_emails(criteria, limit=limit, provider=provider)
+    if provider == "GMAIL":
+        xq = []
+        if sender_name:
+            xq.append(f"from:({normalize_text(sender_name).strip()})")
+        if subject_text:
+            xq.append(f"subject:({normalize_text(subject_text).strip().strip(chr(39)).strip(chr(34))})")
+        if has_attachment:
+            xq.append("has:attachment")
+        criteria = ["X-GM-RAW", f'"{" ".join(xq)}"']
+    else:
+        criteria = []
+        for part in normalize_text(sender_name).split() if sender_name else []:
+            criteria.extend(["FROM", part])
+        for part in normalize_text(subject_text).strip('"').strip("'").split() if subject_text else []:
+            criteria.extend(["SUBJECT", part])
+            
+    mailboxes = get_mailboxes(provider)
+    watermarks = {mb: state.get(mb, {}).get("highest_uid", 0) for mb in mailboxes}
+    print(f"DEBUG: Incremental mail query '{key}' ({provider}) since UIDs {watermarks}")
+    seed_since = (datetime.datetime.now() - datetime.timedelta(days=get_int_setting("MAIL_INCREMENTAL_SEED_DAYS", 30))).strftime("%d-%b-%Y")
+    jobs = {}
+    for mb in mailboxes:
+        if watermarks[mb]:
+            jobs[mb] = partial(search_emails, (criteria or ["ALL"]) + ["UID", f"{watermarks[mb] + 1}:*"], limit=limit,
+                               provider=provider, use_uid=True, mailbox=mb, oldest_first=True)
+        else:
+            # First run: a bounded window instead of the whole mailbox; newest matches first
+            jobs[mb] = partial(search_emails, criteria + ["SINCE", seed_since], limit=limit,
+                               provider=provider, use_uid=True, mailbox=mb)
+    results, error = _run_per_mailbox(jobs, provider)
+    if not results and error:
+        return error
+        
+    index = get_header_index(provider)
+    merged = []
+    for mb in mailboxes:
+        # A folder that timed out or failed keeps its watermark and serves what we had.
+        # "n:*" always matches the newest message, even if its UID is below n
+        delivered = [r for r in results.get(mb, []) if int(r["id"]) > watermarks[mb]]
+        new = [r for r in delivered if r.get("has_attachment")] if has_attachment else delivered
+        cache_records(provider, new, mailbox=mb, with_bodies=True)
+        index.add(new, mailbox=mb)
+        for r in new:
+            r["is_new"] = True
+            
+        previous_uids = state.get(mb, {}).get("result_uids", [])
+        previous = load_cached_keys(provider, [(mb, uid) for uid in previous_uids], fetch_missing=False)
+        for r in previous:
+            r["is_new"] = False
+        merged.extend(new + previous)
+        
+        if mb in results:
+            # Only UIDs the server handed back are passed (non-attachment ones were checked too)
+            highest = max([watermarks[mb]] + [int(r["id"]) for r in delivered])
+            result_uids = [r["id"] for r in new] + [u for u in previous_uids if u not in {r["id"] for r in new}]
+            mail_cache.set_query_state(provider, key, mb, highest, result_uids[:limit])
+            
+    # Newest first, one copy per Message-ID
+    merged.sort(key=lambda r: mail_cache.parse_date_ts(r.get("received")) or 0, reverse=True)
+    final, seen = [], set()
+    for r in merged:
+        msg_id = r.get("message_id") or (r["mailbox"], r["id"])
+        if msg_id in seen:
+            continue
+        seen.add(msg_id)
+        final.append(r)
+    print(f"DEBUG: Incremental mail query -> {sum(1 for r in final if r['is_new'])} new, {len(final)} total")
+    return final[:limit]
 
 def find_emails_from_sender(sender_name):
     return find_emails(sender_name=sender_name)
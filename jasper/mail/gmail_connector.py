@@ -1,5 +1,7 @@
 from ..utility.base_connector import SearchConnector
-from .email_tools import find_emails
+from .email_tools import find_emails, find_emails_incremental
+from .mail_semantic import search_mail_semantic
+from .archive_import import merge_archive
 
 class GmailConnector(SearchConnector):
     """Connector for Gmail via IMAP."""
@@ -8,16 +10,29 @@ class GmailConnector(SearchConnector):
     def name(self):
         return "Gmail"
 
-    def search(self, query=None, sender=None, subject=None, limit=5, date_from=None, date_to=None, **kwargs):
+    def search(self, query=None, sender=None, subject=None, limit=5, date_from=None, date_to=None, has_attachment=False, mode=None, body=None, **kwargs):
+        # Semantic mode: fuzzy "email about ..." queries answered from the local vector index
+        if mode == "semantic":
+            results = search_mail_semantic(body or query or subject, provider="GMAIL", limit=limit, date_from=date_from, date_to=date_to)
+            if results:
+                return results
+            print("DEBUG: [GmailConnector] Semantic mail index empty, falling back to keyword search")
+        # Incremental mode: only mail newer than the last run of the same query is searched
+        elif mode == "incremental" and (sender or subject or query or has_attachment):
+            return find_emails_incremental(sender_name=sender, subject_text=subject or query, limit=limit, provider="GMAIL", has_attachment=has_attachment)
         # Gmail optimization: email_tools.find_emails already handles X-GM-RAW and robust filtering
-        return find_emails(
+        results = find_emails(
             sender_name=sender,
             subject_text=subject or query,
             limit=limit,
             date_from=date_from,
             date_to=date_to,
-            provider="GMAIL"
+            provider="GMAIL",
+            has_attachment=has_attachment,
+            body_text=body
         )
+        # Imported mbox/Maildir archives are searched with every account
+        return merge_archive(results, sender=sender, subject=subject or query, body=body, limit=limit, date_from=date_from, date_to=date_to, has_attachment=has_attachment)
 
     def open(self, item_id):
         # Gmail results usually contain a link or we just display them in UI
@@ -0,0 +1,169 @@
+import threading
+from unidecode import unidecode
+
+# Length of the character n-grams used for the postings lists.
+# Trigrams keep substring semantics ("sumandl" still matches "sonja.sumandl123@gmail.com")
+# while letting most query words resolve through set intersection.
+NGRAM_SIZE = 3
+
+FIELDS = ("sender", "subject")
+
+def normalize_header(text):
+    """Normalises a header value once for indexing: unidecode + lowercase."""
+    if not text:
+        return ""
+    return unidecode(text).lower()
+
+def _ngrams(word):
+    return {word[i:i + NGRAM_SIZE] for i in range(len(word) - NGRAM_SIZE + 1)}
+
+class HeaderIndex:
+    """
+    Inverted n-gram index over mail headers (sender, subject).
+    Headers are normalised exactly once when they are added, so repeated
+    queries resolve by postings intersection instead of re-running unidecode
+    over every candidate.
+    Entries are keyed by (mailbox, uid).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._records = {}
+        self._normalized = {}
+        self._postings = {field: {} for field in FIELDS}
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, key):
+        return key in self._records
+
+    def add(self, records, mailbox="INBOX"):
+        """
+        Adds header records (dicts with 'id', 'sender', 'subject', ...).
+        Already indexed keys are skipped, so re-fetched headers are never re-normalised.
+        Bodies are not kept: the index only answers header queries, bodies stay in the mail cache.
+        Returns the number of newly indexed records.
+        """
+        added = 0
+        with self._lock:
+            for record in records:
+                key = (mailbox, str(record.get("id")))
+                if "body" in record:
+                    record = {k: v for k, v in record.items() if k != "body"}
+                if key in self._records:
+                    # Headers never change for a UID, but attachment info may arrive later
+                    if self._records[key].get("has_attachment") is None and record.get("has_attachment") is not None:
+                        self._records[key] = record
+                    continue
+                normalized = {field: normalize_header(record.get(field)) for field in FIELDS}
+                self._records[key] = record
+                self._normalized[key] = normalized
+                for field, value in normalized.items():
+                    postings = self._postings[field]
+                    for gram in _ngrams(value):
+                        postings.setdefault(gram, set()).add(key)
+                added += 1
+        return added
+
+    def remove(self, key):
+        with self._lock:
+            normalized = self._normalized.pop(key, None)
+            self._records.pop(key, None)
+            if not normalized:
+                return
+            for field, value in normalized.items():
+                postings = self._postings[field]
+                for gram in _ngrams(value):
+                    keys = postings.get(gram)
+                    if keys:
+                        keys.discard(key)
+                        if not keys:
+                            del postings[gram]
+
+    def remove_mailbox(self, mailbox):
+        with self._lock:
+            for key in [k for k in self._records if k[0] == mailbox]:
+                self.remove(key)
+
+    def get(self, key):
+        return self._records.get(key)
+
+    def _match_field(self, field, text, candidates):
+        """Narrows candidates to keys whose field contains every word of text."""
+        words = sorted(set(normalize_header(text).split()), key=len, reverse=True)
+        postings = self._postings[field]
+        for word in words:
+            if len(word) >= NGRAM_SIZE:
+                for gram in _ngrams(word):
+                    keys = postings.get(gram)
+                    if not keys:
+                        return set()
+                    candidates = keys.copy() if candidates is None else candidates & keys
+                    if not candidates:
+                        return candidates
+            if candidates is None:
+                candidates = set(self._records)
+            # Postings only prove the grams exist; confirm the full word is a substring
+            candidates = {k for k in candidates if word in self._normalized[k][field]}
+            if not candidates:
+                return candidates
+        return candidates
+
+    def match(self, sender=None, subject=None, keys=None, has_attachment=False):
+        """
+        Returns the keys whose sender and subject contain every query word
+        (accent-insensitive, order independent).
+        has_attachment keeps only messages whose BODYSTRUCTURE listed an attachment.
+        If keys is given, the search is restricted to them and their order is kept.
+        """
+        with self._lock:
+            candidates = None
+            if keys is not None:
+                candidates = {k for k in keys if k in self._records}
+            if sender:
+                candidates = self._match_field("sender", sender, candidates)
+            if subject and (candidates is None or candidates):
+                candidates = self._match_field("subject", subject, candidates)
+            if candidates is None:
+                candidates = set(self._records)
+            if has_attachment:
+                candidates = {k for k in candidates if self._records[k].get("has_attachment")}
+
+            if keys is not None:
+                return [k for k in keys if k in candidates]
+            return list(candidates)
+
+# One index per provider, shared by every search on that provider
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def warm_header_index(index, provider):
+    """Loads every cached header of a provider into its index; returns the number added."""
+    from . import mail_cache
+    count = 0
+    try:
+        for record in mail_cache.iter_headers(provider):
+            count += index.add([record], mailbox=record["mailbox"])
+    except Exception as e:
+        print(f"DEBUG: Header index warm-up ({provider}) failed: {e}")
+    return count
+
+def get_header_index(provider="GMAIL"):
+    """
+    The provider's index. It is filled from the local mail cache on first use, whether or
+    not the sync worker runs, so headers cached by earlier sessions are searchable too.
+    """
+    with _indexes_lock:
+        if provider not in _indexes:
+            index = HeaderIndex()
+            warmed = warm_header_index(index, provider)
+            if warmed:
+                print(f"DEBUG: Header index ({provider}) warmed with {warmed} cached messages")
+            _indexes[provider] = index
+        return _indexes[provider]
+
+def reset_header_index(provider):
+    """Drops a provider's index if it was loaded; the next search warms it again from the cache."""
+    with _indexes_lock:
+        _indexes.pop(provider, None)
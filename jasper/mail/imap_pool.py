@@ -0,0 +1,107 @@
+import threading
+import time
+from contextlib import contextmanager
+from ..utility.config import get_credentials, get_int_setting
+
+# Pooled, logged-in IMAP connections per provider.
+# Logging in costs several round trips, so connections are reused across searches
+# and let several mailboxes be searched at the same time.
+
+IDLE_CHECK_AFTER = 30  # Seconds a pooled connection may sit unused before it is NOOP-checked
+
+class ImapConnectionPool:
+    """Bounded pool of IMAP connections for one provider."""
+
+    def __init__(self, provider, max_size=4):
+        self.provider = provider
+        self.max_size = max_size
+        self._idle = []  # [(connection, last_used)]
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        from .email_tools import connect_imap
+        email_user, email_pass = get_credentials(provider=self.provider)
+        mail = connect_imap(email_user, email_pass, provider=self.provider)
+        if isinstance(mail, str):
+            raise ConnectionError(mail)
+        mail.selected_mailbox = None
+        return mail
+
+    def _checkout(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    mail, last_used = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.max_size:
+                    self._in_use += 1
+                    mail, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No free IMAP connection for {self.provider}")
+                self._cond.wait(remaining)
+
+        try:
+            if mail is not None and time.monotonic() - last_used > IDLE_CHECK_AFTER:
+                try:
+                    mail.noop()
+                except Exception:
+                    self._close(mail)
+                    mail = None
+            if mail is None:
+                mail = self._connect()
+            return mail
+        except Exception:
+            self._release(None)
+            raise
+
+    def _release(self, mail):
+        with self._cond:
+            self._in_use -= 1
+            if mail is not None:
+                self._idle.append((mail, time.monotonic()))
+            self._cond.notify()
+
+    def _close(self, mail):
+        try:
+            mail.logout()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self, timeout=30):
+        """Yields a logged-in connection; broken connections are discarded instead of returned."""
+        mail = self._checkout(timeout)
+        try:
+            yield mail
+        except Exception:
+            self._close(mail)
+            self._release(None)
+            raise
+        else:
+            self._release(mail)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for mail, _ in idle:
+            self._close(mail)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(provider="GMAIL"):
+    with _pools_lock:
+        if provider not in _pools:
+            _pools[provider] = ImapConnectionPool(provider, max_size=get_int_setting("IMAP_POOL_SIZE", 4))
+        return _pools[provider]
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
@@ -0,0 +1,337 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from ..utility.config import get_mail_cache_file
+
+# Local header cache + snippet store shared by the IMAP search path and the background sync worker.
+# A message row without a body (NULL) has only had its headers fetched so far.
+
+# Provider name for mail imported from local archives (mbox / Maildir); searched alongside every account
+ARCHIVE_PROVIDER = "ARCHIVE"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    provider TEXT NOT NULL,
+    mailbox TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    message_id TEXT,
+    subject TEXT,
+    sender TEXT,
+    received TEXT,
+    date_ts REAL,
+    body TEXT,
+    attachments TEXT,
+    PRIMARY KEY (provider, mailbox, uid)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_date ON messages (provider, date_ts);
+CREATE TABLE IF NOT EXISTS sync_state (
+    provider TEXT NOT NULL,
+    mailbox TEXT NOT NULL,
+    uidvalidity INTEGER,
+    synced_since REAL,
+    highest_uid INTEGER,
+    updated_at REAL,
+    PRIMARY KEY (provider, mailbox)
+);
+CREATE TABLE IF NOT EXISTS query_state (
+    provider TEXT NOT NULL,
+    query_key TEXT NOT NULL,
+    mailbox TEXT NOT NULL,
+    highest_uid INTEGER,
+    result_uids TEXT,
+    updated_at REAL,
+    PRIMARY KEY (provider, query_key, mailbox)
+);
+"""
+
+# Everything _row_to_record needs except the body
+HEADER_COLUMNS = "mailbox, uid, message_id, subject, sender, received, NULL AS body, attachments"
+
+_write_lock = threading.RLock()
+_schema_ready = False
+
+def _connect():
+    global _schema_ready
+    conn = sqlite3.connect(get_mail_cache_file(), timeout=30)
+    conn.row_factory = sqlite3.Row
+    if not _schema_ready:
+        with _write_lock:
+            # Another thread may have migrated while this one waited on the lock
+            if not _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                # Columns added after the first release of the cache
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(messages)")}
+                if "attachments" not in columns:
+                    conn.execute("ALTER TABLE messages ADD COLUMN attachments TEXT")
+                _schema_ready = True
+    return conn
+
+def parse_date_ts(received):
+    """
+    Parses a record date into a POSIX timestamp (None if unparseable): the RFC 2822 Date
+    header of IMAP records, or the ISO timestamp Outlook COM records carry.
+    """
+    if not received:
+        return None
+    try:
+        return parsedate_to_datetime(received).timestamp()
+    except Exception:
+        pass
+    try:
+        return datetime.fromisoformat(str(received).strip()).timestamp()
+    except ValueError:
+        return None
+
+def _to_uid(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _row_to_record(row):
+    # attachments: JSON list from BODYSTRUCTURE, NULL when not known yet
+    attachments = json.loads(row["attachments"]) if row["attachments"] is not None else None
+    return {
+        "id": str(row["uid"]),
+        "subject": row["subject"],
+        "sender": row["sender"],
+        "received": row["received"],
+        "message_id": row["message_id"],
+        "body": row["body"] or "",
+        "mailbox": row["mailbox"],
+        "attachments": attachments,
+        "has_attachment": None if attachments is None else bool(attachments),
+    }
+
+def store_records(provider, mailbox, records, with_bodies=False):
+    """
+    Upserts search_emails-style records. Bodies are only written when with_bodies is set,
+    so a later header-only sweep never wipes a cached snippet.
+    """
+    rows = []
+    for r in records:
+        uid = _to_uid(r.get("id"))
+        if uid is None:
+            continue
+        rows.append((
+            provider, mailbox, uid, r.get("message_id"), r.get("subject"), r.get("sender"),
+            r.get("received"), parse_date_ts(r.get("received")),
+            r.get("body", "") if with_bodies else None,
+            json.dumps(r["attachments"]) if r.get("attachments") is not None else None
+        ))
+    if not rows:
+        return 0
+    with _write_lock:
+        conn = _connect()
+        try:
+            conn.executemany(
+                """INSERT INTO messages (provider, mailbox, uid, message_id, subject, sender, received, date_ts, body, attachments)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (provider, mailbox, uid) DO UPDATE SET
+                       message_id = excluded.message_id,
+                       subject = excluded.subject,
+                       sender = excluded.sender,
+                       received = excluded.received,
+                       date_ts = excluded.date_ts,
+                       body = COALESCE(excluded.body, messages.body),
+                       attachments = COALESCE(excluded.attachments, messages.attachments)""",
+                rows
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    return len(rows)
+
+def get_records(provider, mailbox, uids, with_bodies=True):
+    """Returns {uid (str): record} for the cached uids of one mailbox (bodies left empty unless with_bodies)."""
+    columns = "*" if with_bodies else HEADER_COLUMNS
+    uid_list = [u for u in (_to_uid(x) for x in uids) if u is not None]
+    found = {}
+    conn = _connect()
+    try:
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(uid_list), 500):
+            chunk = uid_list[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                f"SELECT {columns} FROM messages WHERE provider = ? AND mailbox = ? AND uid IN ({marks})",
+                [provider, mailbox] + chunk
+            ):
+                found[str(row["uid"])] = _row_to_record(row)
+    finally:
+        conn.close()
+    return found
+
+def missing_bodies(provider, mailbox, uids):
+    """Returns the uids (as given) whose body snippet is not cached yet."""
+    with_body = set()
+    uid_list = [u for u in (_to_uid(x) for x in uids) if u is not None]
+    conn = _connect()
+    try:
+        for i in range(0, len(uid_list), 500):
+            chunk = uid_list[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                f"SELECT uid FROM messages WHERE provider = ? AND mailbox = ? AND uid IN ({marks}) AND body IS NOT NULL",
+                [provider, mailbox] + chunk
+            ):
+                with_body.add(row[0])
+    finally:
+        conn.close()
+    return [u for u in uids if _to_uid(u) not in with_body]
+
+def find_keys(provider, date_from=None, date_to=None, mailboxes=None):
+    """
+    Returns (mailbox, uid) keys of cached messages inside the date window, newest first.
+    date_to is inclusive of the whole day, matching the IMAP search paths.
+    """
+    sql = "SELECT mailbox, uid FROM messages WHERE provider = ?"
+    params = [provider]
+    if date_from:
+        sql += " AND date_ts >= ?"
+        params.append(date_from.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+    if date_to:
+        sql += " AND date_ts < ?"
+        params.append(date_to.replace(hour=23, minute=59, second=59, microsecond=999999).timestamp())
+    if mailboxes:
+        sql += f" AND mailbox IN ({','.join('?' * len(mailboxes))})"
+        params.extend(mailboxes)
+    sql += " ORDER BY date_ts DESC"
+    conn = _connect()
+    try:
+        return [(row["mailbox"], str(row["uid"])) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+def iter_records(provider):
+    """Yields every cached record of a provider, bodies included."""
+    conn = _connect()
+    try:
+        for row in conn.execute("SELECT * FROM messages WHERE provider = ?", (provider,)):
+            yield _row_to_record(row)
+    finally:
+        conn.close()
+
+def iter_headers(provider):
+    """Like iter_records, without reading bodies (used to warm the in-memory header index)."""
+    conn = _connect()
+    try:
+        for row in conn.execute(
+            f"SELECT {HEADER_COLUMNS} FROM messages WHERE provider = ?",
+            (provider,)
+        ):
+            yield _row_to_record(row)
+    finally:
+        conn.close()
+
+def list_mailboxes(provider):
+    conn = _connect()
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT DISTINCT mailbox FROM messages WHERE provider = ? ORDER BY mailbox", (provider,)
+        )]
+    finally:
+        conn.close()
+
+def cached_uids(provider, mailbox):
+    conn = _connect()
+    try:
+        return {row[0] for row in conn.execute(
+            "SELECT uid FROM messages WHERE provider = ? AND mailbox = ?", (provider, mailbox)
+        )}
+    finally:
+        conn.close()
+
+def delete_uids(provider, mailbox, uids):
+    rows = [(provider, mailbox, u) for u in (_to_uid(x) for x in uids) if u is not None]
+    if not rows:
+        return
+    with _write_lock:
+        conn = _connect()
+        try:
+            conn.executemany("DELETE FROM messages WHERE provider = ? AND mailbox = ? AND uid = ?", rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+def purge_mailbox(provider, mailbox):
+    """Drops all cached messages and sync state of a mailbox (e.g. after a UIDVALIDITY change)."""
+    with _write_lock:
+        conn = _connect()
+        try:
+            conn.execute("DELETE FROM messages WHERE provider = ? AND mailbox = ?", (provider, mailbox))
+            conn.execute("DELETE FROM sync_state WHERE provider = ? AND mailbox = ?", (provider, mailbox))
+            # UIDs are meaningless after a purge, so are the query watermarks
+            conn.execute("DELETE FROM query_state WHERE provider = ? AND mailbox = ?", (provider, mailbox))
+            conn.commit()
+        finally:
+            conn.close()
+
+def get_sync_state(provider, mailbox):
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT * FROM sync_state WHERE provider = ? AND mailbox = ?", (provider, mailbox)
+        ).fetchone()
+        return dict(row) if row else {}
+    finally:
+        conn.close()
+
+def synced_mailboxes(provider):
+    """Mailboxes with a sync state row (cheaper than scanning messages for a provider's mailboxes)."""
+    conn = _connect()
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT mailbox FROM sync_state WHERE provider = ? ORDER BY mailbox", (provider,)
+        )]
+    finally:
+        conn.close()
+
+def set_sync_state(provider, mailbox, **fields):
+    state = get_sync_state(provider, mailbox)
+    state.update(fields)
+    with _write_lock:
+        conn = _connect()
+        try:
+            conn.execute(
+                """INSERT OR REPLACE INTO sync_state (provider, mailbox, uidvalidity, synced_since, highest_uid, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (provider, mailbox, state.get("uidvalidity"), state.get("synced_since"),
+                 state.get("highest_uid"), time.time())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+def get_query_state(provider, query_key):
+    """Returns {mailbox: {"highest_uid": int, "result_uids": [str]}} for an incremental query."""
+    conn = _connect()
+    try:
+        return {
+            row["mailbox"]: {
+                "highest_uid": row["highest_uid"] or 0,
+                "result_uids": json.loads(row["result_uids"] or "[]"),
+            }
+            for row in conn.execute(
+                "SELECT * FROM query_state WHERE provider = ? AND query_key = ?", (provider, query_key)
+            )
+        }
+    finally:
+        conn.close()
+
+def set_query_state(provider, query_key, mailbox, highest_uid, result_uids):
+    with _write_lock:
+        conn = _connect()
+        try:
+            conn.execute(
+                """INSERT OR REPLACE INTO query_state (provider, query_key, mailbox, highest_uid, result_uids, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (provider, query_key, mailbox, highest_uid, json.dumps([str(u) for u in result_uids]), time.time())
+            )
+            conn.commit()
+        finally:
+            conn.close()
@@ -0,0 +1,184 @@
+import threading
+from ..utility.config import get_db_path, get_bool_setting
+from ..utility.metrics import CHROMA_SECONDS, EMBEDDING_SECONDS
+from ..utility.tracing import span
+from . import mail_cache
+
+# Semantic (vector) index over cached email bodies, kept next to the "jasper_docs" collection.
+# Fed incrementally by UID from the mail sync path; answers fuzzy mail queries
+# ("the email about the boat rental deposit") without any IMAP round trips.
+
+COLLECTION_NAME = "jasper_mail"
+
+_collection = None
+_embedding_function = None
+_collection_lock = threading.Lock()
+
+def is_enabled():
+    return get_bool_setting("MAIL_SEMANTIC_INDEX", True)
+
+def get_collection():
+    """Opens the mail collection lazily so mail searches never pay for Chroma start-up."""
+    global _collection, _embedding_function
+    with _collection_lock:
+        if _collection is None:
+            import chromadb
+            from chromadb.utils import embedding_functions
+            # EMBEDDING MODEL (Must match indexer.py)
+            _embedding_function = embedding_functions.DefaultEmbeddingFunction()
+            client = chromadb.PersistentClient(path=get_db_path())
+            _collection = client.get_or_create_collection(
+                name=COLLECTION_NAME,
+                embedding_function=_embedding_function
+            )
+        return _collection
+
+def _chunk_id(provider, mailbox, uid, i):
+    return f"{provider}:{mailbox}:{uid}:{i}"
+
+def indexed_uids(provider, mailbox, uids):
+    """Returns the subset of uids (as str) that already have chunks in the collection."""
+    uids = [str(u) for u in uids]
+    found = set()
+    for i in range(0, len(uids), 500):
+        chunk = uids[i:i + 500]
+        res = get_collection().get(ids=[_chunk_id(provider, mailbox, u, 0) for u in chunk], include=[])
+        found.update(cid.rsplit(":", 2)[1] for cid in res["ids"])
+    return found
+
+def index_records(provider, mailbox, records):
+    """
+    Embeds the body of every record that is not indexed yet (one entry per chunk).
+    Records without a body are skipped; they are picked up once their snippet is fetched.
+    Returns the number of newly indexed messages.
+    """
+    if not is_enabled():
+        return 0
+    records = [r for r in records if r.get("body") and mail_cache._to_uid(r.get("id")) is not None]
+    if not records:
+        return 0
+    try:
+        # indexer opens the docs collection on import, so it is only loaded once there is work
+        from ..utility.indexer import chunk_text
+        done = indexed_uids(provider, mailbox, [r["id"] for r in records])
+        ids, documents, metadatas = [], [], []
+        count = 0
+        for r in records:
+            uid = str(r["id"])
+            if uid in done:
+                continue
+            # Subject and sender carry much of the meaning of short mails, so they are embedded with the body
+            text = f"{r.get('subject', '')}\nFrom: {r.get('sender', '')}\n{r['body']}"
+            date_ts = mail_cache.parse_date_ts(r.get("received"))
+            for i, chunk in enumerate(chunk_text(text)):
+                ids.append(_chunk_id(provider, mailbox, uid, i))
+                documents.append(chunk)
+                metadatas.append({
+                    "provider": provider,
+                    "mailbox": mailbox,
+                    "uid": uid,
+                    "message_id": r.get("message_id") or "",
+                    "subject": r.get("subject") or "",
+                    "sender": r.get("sender") or "",
+                    "received": r.get("received") or "",
+                    "date_ts": date_ts or 0.0,
+                })
+            count += 1
+        if ids:
+            collection = get_collection()
+            # Embedded up front so /metrics can tell embedding time from Chroma write time
+            with EMBEDDING_SECONDS.time(collection=COLLECTION_NAME), span("embedding", collection=COLLECTION_NAME, documents=len(documents)):
+                embeddings = _embedding_function(documents)
+            with CHROMA_SECONDS.time(collection=COLLECTION_NAME, op="upsert"), span("chroma.upsert", collection=COLLECTION_NAME, documents=len(documents)):
+                collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+        return count
+    except Exception as e:
+        print(f"DEBUG: Mail semantic index update failed: {e}")
+        return 0
+
+def index_cached(provider):
+    """Indexes every cached body that is missing from the collection (start-up catch-up)."""
+    if not is_enabled():
+        return 0
+    by_mailbox = {}
+    for record in mail_cache.iter_records(provider):
+        if record["body"]:
+            by_mailbox.setdefault(record["mailbox"], []).append(record)
+    return sum(index_records(provider, mb, records) for mb, records in by_mailbox.items())
+
+def remove_uids(provider, mailbox, uids):
+    if not is_enabled():
+        return
+    try:
+        uids = [str(u) for u in uids]
+        if uids:
+            get_collection().delete(where={"$and": [
+                {"provider": provider}, {"mailbox": mailbox}, {"uid": {"$in": uids}}
+            ]})
+    except Exception as e:
+        print(f"DEBUG: Mail semantic index delete failed: {e}")
+
+def remove_mailbox(provider, mailbox):
+    if not is_enabled():
+        return
+    try:
+        get_collection().delete(where={"$and": [{"provider": provider}, {"mailbox": mailbox}]})
+    except Exception as e:
+        print(f"DEBUG: Mail semantic index delete failed: {e}")
+
+def search_mail_semantic(query, provider="GMAIL", limit=5, date_from=None, date_to=None):
+    """
+    Returns the messages whose bodies best match query, in the same record format as
+    email_tools.find_emails plus a similarity "score". Empty list if nothing is indexed.
+    Mail imported from local archives (mail_cache.ARCHIVE_PROVIDER) is searched too.
+    """
+    if not query or not is_enabled():
+        return []
+    try:
+        conditions = [{"provider": {"$in": [provider, mail_cache.ARCHIVE_PROVIDER]}}]
+        if date_from:
+            conditions.append({"date_ts": {"$gte": date_from.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()}})
+        if date_to:
+            conditions.append({"date_ts": {"$lte": date_to.replace(hour=23, minute=59, second=59, microsecond=999999).timestamp()}})
+        where = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+        collection = get_collection()
+        if collection.count() == 0:
+            return []
+        with CHROMA_SECONDS.time(collection=COLLECTION_NAME, op="query"), span("chroma.query", collection=COLLECTION_NAME, n_results=limit * 4) as current:
+            results = collection.query(
+                query_texts=[query],
+                n_results=limit * 4, # Several chunks may belong to the same message
+                where=where
+            )
+            current.set_attribute("result_count", len(results["ids"][0]) if results.get("ids") else 0)
+    except Exception as e:
+        print(f"Error in mail semantic search: {e}")
+        return []
+
+    # Best chunk per message, in ranking order (a message both synced and archived counts once)
+    hits = []
+    seen = set()
+    if results["ids"]:
+        for i, meta in enumerate(results["metadatas"][0]):
+            key = (meta.get("provider", provider), meta["mailbox"], meta["uid"])
+            if key in seen or (meta.get("message_id") and meta["message_id"] in seen):
+                continue
+            seen.add(key)
+            if meta.get("message_id"):
+                seen.add(meta["message_id"])
+            dist = results["distances"][0][i] if results.get("distances") else 0
+            hits.append((key, meta, round(1 - dist, 4)))
+            if len(hits) >= limit:
+                break
+
+    formatted = []
+    for (record_provider, mailbox, uid), meta, score in hits:
+        record = mail_cache.get_records(record_provider, mailbox, [uid]).get(uid)
+        if record is None:
+            # Expunged from the cache since it was embedded
+            continue
+        record["score"] = score
+        formatted.append(record)
+    print(f"DEBUG: Mail semantic search '{query}' -> {len(formatted)} hit(s)")
+    return formatted
@@ -0,0 +1,320 @@
+import email
+import os
+import re
+import threading
+from itertools import islice
+from urllib.parse import unquote
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from email.header import decode_header
+from ..utility.config import get_int_setting
+
+# MIME parsing for IMAP FETCH responses.
+# Kept free of heavy imports so process-pool workers (spawned on Windows) start quickly.
+
+# Messages per task handed to a worker process; large enough to amortise pickling
+CHUNK_SIZE = 250
+
+def decode_mime_header(raw_header):
+    if not raw_header:
+        return "No Subject"
+    try:
+        decoded = decode_header(raw_header)
+        parts = []
+        for text, encoding in decoded:
+            if isinstance(text, bytes):
+                try:
+                    parts.append(text.decode(encoding if encoding else "utf-8", errors="ignore"))
+                except LookupError:
+                    parts.append(text.decode("utf-8", errors="ignore"))
+            else:
+                parts.append(str(text))
+        return " ".join(parts)
+    except Exception:
+        return str(raw_header)
+
+_SEXP_TOKEN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+_SEXP_CLOSE = re.compile(r'\s*\)')
+
+def _parse_sexp(text, pos=0):
+    """Parses one IMAP parenthesised value at pos. Returns (value, next_pos); NIL becomes None."""
+    m = _SEXP_TOKEN.match(text, pos)
+    if not m:
+        raise ValueError("Unexpected end of BODYSTRUCTURE")
+    if m.group(1):
+        items = []
+        pos = m.end()
+        while True:
+            close = _SEXP_CLOSE.match(text, pos)
+            if close:
+                return items, close.end()
+            value, pos = _parse_sexp(text, pos)
+            items.append(value)
+    if m.group(2):
+        raise ValueError("Unbalanced ')' in BODYSTRUCTURE")
+    if m.group(3) is not None:
+        return re.sub(r'\\(.)', r'\1', m.group(3)), m.end()
+    atom = m.group(4)
+    return (None if atom.upper() == "NIL" else atom), m.end()
+
+def _param_dict(params):
+    if not isinstance(params, list):
+        return {}
+    return {str(params[i]).lower(): params[i + 1] for i in range(0, len(params) - 1, 2)}
+
+def _decode_filename(params):
+    if params.get("filename*") or params.get("name*"):
+        # RFC 2231: charset'language'percent-encoded
+        value = params.get("filename*") or params.get("name*")
+        charset, _, rest = value.partition("'")
+        _, _, encoded = rest.partition("'")
+        try:
+            return unquote(encoded or value, encoding=charset or "utf-8", errors="replace")
+        except LookupError:
+            return unquote(encoded or value)
+    name = params.get("filename") or params.get("name")
+    if name and "=?" in name:
+        return decode_mime_header(name)
+    return name
+
+def _collect_attachments(node, out):
+    if not isinstance(node, list) or not node:
+        return
+    if isinstance(node[0], list):
+        # Multipart: child parts first, then the subtype string
+        for child in node:
+            if not isinstance(child, list):
+                break
+            _collect_attachments(child, out)
+        return
+
+    mime_type = f"{node[0]}/{node[1]}".lower()
+    params = _param_dict(node[2] if len(node) > 2 else None)
+    size = int(node[6]) if len(node) > 6 and str(node[6]).isdigit() else None
+    # Extension data (md5, disposition, ...) follows the type specific fields
+    if mime_type.startswith("text/"):
+        ext = 8
+    elif mime_type == "message/rfc822":
+        ext = 10
+    else:
+        ext = 7
+    disposition = node[ext + 1] if len(node) > ext + 1 else None
+    disp_type = disposition[0].lower() if isinstance(disposition, list) and disposition and disposition[0] else None
+    disp_params = _param_dict(disposition[1] if isinstance(disposition, list) and len(disposition) > 1 else None)
+
+    name = _decode_filename(disp_params) or _decode_filename(params)
+    if disp_type == "attachment":
+        is_attachment = True
+    elif disp_type == "inline":
+        is_attachment = False
+    else:
+        is_attachment = (bool(name) and not mime_type.startswith("text/")) or mime_type == "message/rfc822"
+    if is_attachment:
+        out.append({"name": name or "Attached message", "mime_type": mime_type, "size": size})
+
+def parse_bodystructure(meta):
+    """
+    Derives attachment metadata (name, mime_type, size) from the BODYSTRUCTURE item of
+    a FETCH response. Returns None if the response carries no (parseable) BODYSTRUCTURE.
+    """
+    pos = meta.upper().find("BODYSTRUCTURE")
+    if pos < 0:
+        return None
+    try:
+        structure, _ = _parse_sexp(meta, pos + len("BODYSTRUCTURE"))
+    except (ValueError, IndexError):
+        return None
+    attachments = []
+    _collect_attachments(structure, attachments)
+    return attachments
+
+def _attachments_from_message(msg):
+    attachments = []
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+        disposition = part.get_content_disposition()
+        name = part.get_filename()
+        if disposition == "attachment" or (disposition is None and name and part.get_content_maintype() != "text"):
+            payload = part.get_payload(decode=True) or b""
+            attachments.append({
+                "name": decode_mime_header(name) if name else "Attachment",
+                "mime_type": part.get_content_type(),
+                "size": len(payload)
+            })
+    return attachments
+
+def parse_message(meta, raw, headers_only=False, use_uid=False):
+    """
+    Parses one FETCH response part into a result record.
+    meta: the response text around the message literal,
+          e.g. b'1234 (UID 9999 BODYSTRUCTURE (...) RFC822.HEADER {size}'; raw: the message (or header) bytes.
+    """
+    meta = meta.decode(errors="ignore")
+    msg = email.message_from_bytes(raw)
+    
+    # Attachment metadata: BODYSTRUCTURE when fetched, else the full message if we have it
+    attachments = parse_bodystructure(meta)
+    if attachments is None and not headers_only:
+        attachments = _attachments_from_message(msg)
+
+    # Extract ID (UID or Seq)
+    s_id = "?"
+    if use_uid:
+        # Parse proper UID from metadata: "123 (UID 5678 ...)"
+        uid_match = re.search(r"UID\s+(\d+)", meta)
+        if uid_match:
+            s_id = uid_match.group(1)
+        else:
+            print(f"DEBUG: Warning - Could not parse UID from '{meta}'")
+    else:
+        # Sequence number is at the start
+        s_id = meta.split()[0]
+
+    # Safe Header Decoding
+    subject = decode_mime_header(msg.get("Subject"))
+    sender = decode_mime_header(msg.get("From"))
+    msg_id = msg.get("Message-ID", "").strip("<>")
+
+    # Extract body snippet (only if not headers_only)
+    body_snippet = ""
+    if not headers_only:
+        body_content = ""
+        if msg.is_multipart():
+            for part in msg.walk():
+                if part.get_content_type() == "text/plain":
+                    try:
+                        body_content = part.get_payload(decode=True).decode(errors="ignore")
+                        break
+                    except: pass
+        else:
+            try:
+                body_content = msg.get_payload(decode=True).decode(errors="ignore")
+            except: pass
+
+        # Clean up body snippet
+        body_snippet = " ".join(body_content.split())[:1000]
+
+    return {
+        "id": s_id, # This is now consistently the UID if use_uid=True
+        "subject": subject,
+        "sender": sender,
+        "received": str(msg.get("Date", "Unknown date")),
+        "message_id": msg_id,
+        "body": body_snippet,
+        "attachments": attachments,
+        "has_attachment": None if attachments is None else bool(attachments)
+    }
+
+def _parse_chunk(parts, headers_only, use_uid):
+    return [parse_message(meta, raw, headers_only, use_uid) for meta, raw in parts]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _pool_workers():
+    return get_int_setting("MIME_PARSE_WORKERS", max(1, (os.cpu_count() or 1) - 1))
+
+def get_parse_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers())
+        return _pool
+
+def shutdown_parse_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def use_parse_pool(count):
+    """
+    True if a batch of count messages is worth sending to worker processes.
+    Below MIME_PARSE_POOL_THRESHOLD the IPC overhead outweighs the parallel parse
+    (see tests/bench_mime_parse.py); 0 disables the pool.
+    """
+    threshold = get_int_setting("MIME_PARSE_POOL_THRESHOLD", 1000)
+    return threshold > 0 and count >= threshold and _pool_workers() > 1
+
+def iter_parsed(parts, headers_only=False, use_uid=False):
+    """
+    Yields parsed records for (meta, raw) pairs in order.
+    Large batches are parsed in worker processes chunk by chunk and streamed back
+    as each chunk completes; small ones stay in-process, one message at a time.
+    """
+    if not use_parse_pool(len(parts)):
+        for meta, raw in parts:
+            yield parse_message(meta, raw, headers_only, use_uid)
+        return
+
+    chunks = [parts[i:i + CHUNK_SIZE] for i in range(0, len(parts), CHUNK_SIZE)]
+    done = 0
+    try:
+        pool = get_parse_pool()
+        futures = [pool.submit(_parse_chunk, chunk, headers_only, use_uid) for chunk in chunks]
+        for future in futures:
+            yield from future.result()
+            done += 1
+    except BrokenProcessPool as e:
+        print(f"DEBUG: MIME parse pool failed ({e}), parsing in-process.")
+        shutdown_parse_pool()
+        for chunk in chunks[done:]:
+            yield from _parse_chunk(chunk, headers_only, use_uid)
+
+def iter_parsed_batches(parts, headers_only=False, use_uid=False, size=CHUNK_SIZE):
+    """
+    iter_parsed in lists of up to size records, so a caller can store one batch while the
+    worker processes are still parsing the next.
+    """
+    records = iter_parsed(parts, headers_only=headers_only, use_uid=use_uid)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+def iter_fetch_batches(msg_data, headers_only=False, use_uid=False, size=CHUNK_SIZE):
+    """Parsed records of a raw IMAP FETCH response, batch by batch (see iter_parsed_batches)."""
+    return iter_parsed_batches(group_fetch_response(msg_data), headers_only=headers_only, use_uid=use_uid, size=size)
+
+def parse_fetch_response(msg_data, headers_only=False, use_uid=False):
+    """
+    Turns a raw IMAP FETCH response into result records
+    (id, subject, sender, received, message_id, body), all at once.
+    """
+    return list(iter_parsed(group_fetch_response(msg_data), headers_only=headers_only, use_uid=use_uid))
+
+# The literal that holds the message itself (as opposed to e.g. a filename inside BODYSTRUCTURE)
+_MESSAGE_LITERAL = re.compile(rb'(?:RFC822(?:\.HEADER)?|BODY(?:\.PEEK)?\[[^\]]*\](?:<\d+>)?) \{\d+\}$', re.I)
+
+def group_fetch_response(msg_data):
+    """
+    Regroups imaplib's flattened FETCH response into one (meta, raw) pair per message.
+    imaplib splits a response at every literal, so items the server sends after the
+    message (or literals inside BODYSTRUCTURE) arrive as extra tuples/bytes.
+    meta is the full response text with the message literal left out.
+    """
+    groups = []
+    for part in msg_data:
+        if isinstance(part, tuple):
+            head, literal = part
+            if re.match(rb'\d+ \(', head) and (not groups or groups[-1]["closed"]):
+                groups.append({"meta": b"", "raw": b"", "closed": False})
+            if not groups:
+                continue
+            group = groups[-1]
+            if _MESSAGE_LITERAL.search(head):
+                group["meta"] += _MESSAGE_LITERAL.sub(b"", head)
+                group["raw"] = literal
+            else:
+                # Inline other literals as quoted strings so the structure stays parseable
+                quoted = literal.replace(b"\\", b"\\\\").replace(b'"', b'\\"')
+                group["meta"] += re.sub(rb'\{\d+\}$', b"", head) + b'"' + quoted + b'"'
+        elif isinstance(part, bytes) and groups and not groups[-1]["closed"]:
+            groups[-1]["meta"] += part
+            # A message's response ends with the closing parenthesis of the FETCH item list
+            if part.rstrip().endswith(b")"):
+                groups[-1]["closed"] = True
+    return [(g["meta"], g["raw"]) for g in groups if g["raw"]]
@@ -1,6 +1,8 @@
 from ..utility.base_connector import SearchConnector
 from .outlook_tools import find_emails, open_email_by_id
-from .email_tools import find_emails as find_emails_imap
+from .email_tools import find_emails as find_emails_imap, find_emails_incremental
+from .mail_semantic import search_mail_semantic
+from .archive_import import merge_archive
 from ..utility.config import get_setting
 
 class OutlookConnector(SearchConnector):
@@ -10,22 +12,34 @@ class OutlookConnector(SearchConnector):
     def name(self):
         return "Outlook"
 
-    def search(self, query=None, sender=None, subject=None, body=None, limit=5, date_from=None, date_to=None, has_attachment=False, **kwargs):
+    def search(self, query=None, sender=None, subject=None, body=None, limit=5, date_from=None, date_to=None, has_attachment=False, mode=None, **kwargs):
+        # Semantic mode: only IMAP-synced mail is embedded; COM falls through to its own body search
+        if mode == "semantic":
+            results = search_mail_semantic(body or query or subject, provider="OUTLOOK", limit=limit, date_from=date_from, date_to=date_to)
+            if results:
+                return results
+            print("DEBUG: [OutlookConnector] Semantic mail index empty, falling back to keyword search")
+            
         # Determine if we should use IMAP or COM
         # (Already handled in app.py previously, but let's centralize it here)
         use_imap = bool(get_setting("OUTLOOK_PASS") or get_setting("OUTLOOK_PASSWORD"))
         
         if use_imap:
-            return find_emails_imap(
+            # Incremental mode needs IMAP UIDs; COM always runs a full search
+            if mode == "incremental" and (sender or subject or query or has_attachment):
+                return find_emails_incremental(sender_name=sender, subject_text=subject or query, limit=limit, provider="OUTLOOK", has_attachment=has_attachment)
+            results = find_emails_imap(
                 sender_name=sender,
                 subject_text=subject or query,
                 limit=limit,
                 date_from=date_from,
                 date_to=date_to,
-                provider="OUTLOOK"
+                provider="OUTLOOK",
+                has_attachment=has_attachment,
+                body_text=body
             )
         else:
-            return find_emails(
+            results = find_emails(
                 sender_name=sender,
                 subject_text=subject or query,
                 body_text=body,
@@ -34,6 +48,8 @@ class OutlookConnector(SearchConnector):
                 date_to=date_to,
                 has_attachment=has_attachment
             )
+        # Imported mbox/Maildir archives are searched with every account
+        return merge_archive(results, sender=sender, subject=subject or query, body=body, limit=limit, date_from=date_from, date_to=date_to, has_attachment=has_attachment)
 
     def open(self, item_id):
         # Outlook items can be opened via COM EntryID
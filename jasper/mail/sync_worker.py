@@ -0,0 +1,276 @@
+import re
+import ssl
+import socket
+import threading
+from datetime import datetime, timedelta
+from ..utility.config import get_credentials, get_bool_setting, get_int_setting
+from .email_tools import connect_imap
+from .mime_parse import iter_fetch_batches
+from .header_index import get_header_index
+from .contact_directory import note_senders
+from . import mail_cache, mail_semantic
+
+# Background IMAP IDLE sync: keeps the local header cache, snippet store, header index
+# and semantic mail index hot so interactive mail searches can be answered from local data.
+
+SYNC_MAILBOX = "INBOX"
+IDLE_TIMEOUT = 9 * 60  # Re-issue IDLE well before the 29 minute server timeout (RFC 2177)
+FETCH_BATCH = 500
+
+IDLE_RESPONSE_TIMEOUT = 30
+
+class IdleReader:
+    """
+    Line reader on the raw socket for the IDLE exchange, with a timeout per read.
+    select() on mail.sock cannot see lines already held in imaplib's buffered reader
+    (an EXISTS sent together with "+ idling" would wait for the next re-IDLE), and a
+    timeout on that reader leaves it unusable, so IDLE bypasses it. The previous command
+    has completed when IDLE starts, so the buffered reader holds nothing at that point.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = b""
+        self._timeout = sock.gettimeout()
+
+    def readline(self, timeout):
+        """The next line (with CRLF), or None if nothing complete arrived within timeout."""
+        while b"\n" not in self.buffer:
+            self.sock.settimeout(timeout)
+            try:
+                chunk = self.sock.recv(4096)
+            except (socket.timeout, ssl.SSLWantReadError):
+                return None
+            if not chunk:
+                raise ConnectionError("IMAP connection closed during IDLE")
+            self.buffer += chunk
+        line, _, self.buffer = self.buffer.partition(b"\n")
+        return line + b"\n"
+
+    def close(self):
+        self.sock.settimeout(self._timeout)
+
+class MailSyncWorker(threading.Thread):
+    """Holds an IDLE connection on INBOX for one provider and mirrors new mail locally."""
+
+    def __init__(self, provider):
+        super().__init__(name=f"mail-sync-{provider.lower()}", daemon=True)
+        self.provider = provider
+        self.days = get_int_setting("MAIL_SYNC_DAYS", 30)
+        self.snippets = get_int_setting("MAIL_SYNC_SNIPPETS", 100)
+        self.ready = threading.Event()
+        self.synced_since = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        backoff = 5
+        while not self._stop_event.is_set():
+            try:
+                self._session()
+                backoff = 5
+            except Exception as e:
+                if self._stop_event.is_set():
+                    break
+                print(f"DEBUG: [MailSync {self.provider}] Connection error: {e}. Retrying in {backoff}s")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 300)
+
+    def _session(self):
+        email_user, email_pass = get_credentials(provider=self.provider)
+        mail = connect_imap(email_user, email_pass, provider=self.provider)
+        if isinstance(mail, str):
+            raise ConnectionError(mail)
+        try:
+            # EXAMINE (readonly) so the worker never changes \Seen flags
+            status, _ = mail.select(SYNC_MAILBOX, readonly=True)
+            if status != "OK":
+                raise ConnectionError(f"Could not select {SYNC_MAILBOX}")
+            _, data = mail.response("UIDVALIDITY")
+            uidvalidity = int(data[0]) if data and data[0] else None
+
+            state = mail_cache.get_sync_state(self.provider, SYNC_MAILBOX)
+            if state.get("uidvalidity") and uidvalidity and state["uidvalidity"] != uidvalidity:
+                print(f"DEBUG: [MailSync {self.provider}] UIDVALIDITY changed, dropping cached {SYNC_MAILBOX}")
+                mail_cache.purge_mailbox(self.provider, SYNC_MAILBOX)
+                get_header_index(self.provider).remove_mailbox(SYNC_MAILBOX)
+                mail_semantic.remove_mailbox(self.provider, SYNC_MAILBOX)
+
+            self._backfill(mail, uidvalidity)
+            self.ready.set()
+            # Embedding is slow, so cached bodies are caught up only after the header cache is usable
+            indexed = mail_semantic.index_cached(self.provider)
+            if indexed:
+                print(f"DEBUG: [MailSync {self.provider}] Embedded {indexed} cached message(s)")
+
+            while not self._stop_event.is_set():
+                if self._idle(mail):
+                    self._fetch_new(mail)
+                    self._reconcile(mail)
+        finally:
+            try:
+                mail.logout()
+            except Exception:
+                pass
+
+    def _search(self, mail, *criteria):
+        status, data = mail.uid("search", None, *criteria)
+        if status != "OK":
+            raise ConnectionError(f"UID SEARCH failed: {status}")
+        return [int(u) for u in data[0].split() if u]
+
+    def _fetch(self, mail, uids, headers_only):
+        """Fetches uids in batches and writes them to the cache and header index."""
+        # BODY.PEEK keeps background fetches from marking mail as read
+        criteria = "(UID BODYSTRUCTURE RFC822.HEADER)" if headers_only else "(UID BODYSTRUCTURE BODY.PEEK[])"
+        index = get_header_index(self.provider)
+        for i in range(0, len(uids), FETCH_BATCH):
+            batch = uids[i:i + FETCH_BATCH]
+            status, msg_data = mail.uid("fetch", ",".join(str(u) for u in batch), criteria)
+            if status != "OK":
+                continue
+            # Each parsed chunk is stored while the next one is still being parsed
+            for records in iter_fetch_batches(msg_data, headers_only=headers_only, use_uid=True):
+                mail_cache.store_records(self.provider, SYNC_MAILBOX, records, with_bodies=not headers_only)
+                index.add(records, mailbox=SYNC_MAILBOX)
+                note_senders(self.provider, records)
+                if not headers_only:
+                    mail_semantic.index_records(self.provider, SYNC_MAILBOX, records)
+
+    def _backfill(self, mail, uidvalidity):
+        since = (datetime.now() - timedelta(days=self.days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        uids = self._search(mail, "SINCE", since.strftime("%d-%b-%Y"))
+        cached = mail_cache.cached_uids(self.provider, SYNC_MAILBOX)
+
+        missing = [u for u in uids if u not in cached]
+        if missing:
+            print(f"DEBUG: [MailSync {self.provider}] Backfilling {len(missing)} headers since {since.date()}")
+            self._fetch(mail, missing, headers_only=True)
+
+        # Snippets for the most recent messages so typical queries need no body fetch
+        recent = sorted(uids, reverse=True)[:self.snippets]
+        need_body = mail_cache.missing_bodies(self.provider, SYNC_MAILBOX, recent)
+        if need_body:
+            self._fetch(mail, need_body, headers_only=False)
+
+        self._drop_deleted(set(uids), since)
+        mail_cache.set_sync_state(
+            self.provider, SYNC_MAILBOX,
+            uidvalidity=uidvalidity,
+            synced_since=since.timestamp(),
+            highest_uid=max(uids) if uids else 0
+        )
+        self.synced_since = since
+
+    def _drop_deleted(self, server_uids, since):
+        if not server_uids:
+            return
+        # Only UIDs inside the server's range can have been expunged; older cached
+        # rows whose Date header disagrees with the internal date are left alone
+        lowest = min(server_uids)
+        keys = mail_cache.find_keys(self.provider, date_from=since, mailboxes=[SYNC_MAILBOX])
+        gone = [uid for _, uid in keys if int(uid) >= lowest and int(uid) not in server_uids]
+        if gone:
+            mail_cache.delete_uids(self.provider, SYNC_MAILBOX, gone)
+            index = get_header_index(self.provider)
+            for uid in gone:
+                index.remove((SYNC_MAILBOX, uid))
+            mail_semantic.remove_uids(self.provider, SYNC_MAILBOX, gone)
+
+    def _idle(self, mail):
+        """
+        Runs one IDLE cycle. Returns True when the server reported new or expunged mail.
+        imaplib has no IDLE support before Python 3.14, so the exchange is done by hand.
+        """
+        tag = mail._new_tag()
+        mail.send(tag + b" IDLE\r\n")
+        reader = IdleReader(mail.sock)
+        try:
+            line = reader.readline(IDLE_RESPONSE_TIMEOUT)
+            if line is None or not line.startswith(b"+"):
+                raise ConnectionError(f"Server refused IDLE: {line!r}")
+
+            changed = False
+            deadline = datetime.now() + timedelta(seconds=IDLE_TIMEOUT)
+            while not self._stop_event.is_set() and datetime.now() < deadline:
+                # Wait at most a second per read so stop() is honoured promptly
+                line = reader.readline(1.0)
+                if line is not None and re.match(rb"\* \d+ (EXISTS|EXPUNGE)", line):
+                    changed = True
+                    break
+
+            mail.send(b"DONE\r\n")
+            while True:
+                line = reader.readline(IDLE_RESPONSE_TIMEOUT)
+                if line is None:
+                    raise ConnectionError("No response to DONE while leaving IDLE")
+                if line.startswith(tag):
+                    break
+        finally:
+            reader.close()
+        mail.tagged_commands.pop(tag, None)
+        return changed
+
+    def _fetch_new(self, mail):
+        state = mail_cache.get_sync_state(self.provider, SYNC_MAILBOX)
+        highest = state.get("highest_uid") or 0
+        # "n:*" always matches the newest message, even if its UID is below n
+        new = [u for u in self._search(mail, "UID", f"{highest + 1}:*") if u > highest]
+        if not new:
+            return
+        print(f"DEBUG: [MailSync {self.provider}] {len(new)} new message(s)")
+        self._fetch(mail, new, headers_only=False)
+        mail_cache.set_sync_state(self.provider, SYNC_MAILBOX, highest_uid=max(new))
+
+    def _reconcile(self, mail):
+        if self.synced_since:
+            uids = self._search(mail, "SINCE", self.synced_since.strftime("%d-%b-%Y"))
+            self._drop_deleted(set(uids), self.synced_since)
+
+_workers = {}
+
+def configured_providers():
+    """Providers with IMAP credentials (Outlook only counts in IMAP mode)."""
+    providers = []
+    for provider in ("GMAIL", "OUTLOOK"):
+        email_user, email_pass = get_credentials(provider=provider)
+        if email_user and email_pass and "your-email" not in email_user:
+            providers.append(provider)
+    return providers
+
+def start_sync_workers():
+    """Starts one worker per configured provider when MAIL_SYNC_ENABLED is set."""
+    if not get_bool_setting("MAIL_SYNC_ENABLED", False):
+        return []
+    started = []
+    for provider in configured_providers():
+        if provider in _workers and _workers[provider].is_alive():
+            continue
+        # Builds (and warms) the index before the worker starts adding to it
+        get_header_index(provider)
+        worker = MailSyncWorker(provider)
+        worker.start()
+        _workers[provider] = worker
+        started.append(provider)
+    return started
+
+def stop_sync_workers():
+    for worker in _workers.values():
+        worker.stop()
+    for worker in _workers.values():
+        worker.join(timeout=5)
+    _workers.clear()
+
+def is_synced(provider, date_from=None, mailboxes=None):
+    """
+    True if the sync worker has mirrored the whole window starting at date_from
+    for every requested mailbox (the worker only follows INBOX).
+    """
+    worker = _workers.get(provider)
+    if not worker or not worker.ready.is_set() or not worker.synced_since or not date_from:
+        return False
+    if mailboxes and any(mb != SYNC_MAILBOX for mb in mailboxes):
+        return False
+    return date_from >= worker.synced_since
@@ -13,7 +13,7 @@ function escapeHTML(str) {
         .replace(/'/g, "&#039;");
 }
 
-function appendMessage(role, content, data = null) {
+function appendMessage(role, content, data = null, pendingSummaries = false) {
     const messageDiv = document.createElement('div');
     messageDiv.classList.add('message', role);
 
@@ -26,7 +26,7 @@ function appendMessage(role, content, data = null) {
     let html = `<div class="bubble">${parsedContent}`;
 
     if (data && data.length > 0) {
-        data.forEach(item => {
+        data.forEach((item, index) => {
             let actionLink = '';
 
             // Check if it's a file result
@@ -70,8 +70,8 @@ function appendMessage(role, content, data = null) {
                     <div class="email-card">
                         <div class="sender">From: ${item.sender}</div>
                         <div class="subject">${item.subject}</div>
-                        <div class="summary">
-                            ${(item.content || item.summary || 'No content snippet available.')}
+                        <div class="summary" data-index="${index}">
+                            ${(item.content || item.summary || (pendingSummaries ? 'Summarizing...' : 'No content snippet available.'))}
                         </div>
                         <div class="date">${item.received || 'Recently indexed'}</div>
                         ${actionLink}
@@ -85,6 +85,7 @@ function appendMessage(role, content, data = null) {
     messageDiv.innerHTML = html;
     chatWindow.appendChild(messageDiv);
     chatWindow.scrollTop = chatWindow.scrollHeight;
+    return messageDiv;
 }
 
 function showTyping() {
@@ -118,20 +119,50 @@ chatForm.addEventListener('submit', async (e) => {
     showTyping();
 
     try {
-        const response = await fetch('/query', {
+        // NDJSON stream: results are shown as soon as the search returns, summaries fill in later
+        const response = await fetch('/query/stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ query })
         });
 
-        const result = await response.json();
-        removeTyping();
-
-        if (result.type === 'results') {
-            appendMessage('assistant', result.content, result.data);
-        } else {
-            appendMessage('assistant', result.content);
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let resultsDiv = null;
+
+        const handleEvent = (event) => {
+            if (event.event === 'results') {
+                // Federated searches send an updated, re-ranked list as each source answers
+                removeTyping();
+                if (resultsDiv) resultsDiv.remove();
+                resultsDiv = appendMessage('assistant', event.content, event.data, event.pending_summaries);
+                showTyping();
+            } else if (event.event === 'summary' && resultsDiv) {
+                const el = resultsDiv.querySelector(`.summary[data-index="${event.index}"]`);
+                if (el) el.innerHTML = escapeHTML(event.summary);
+            } else if (event.event === 'done') {
+                removeTyping();
+                if (event.type === 'results') {
+                    // Final payload is authoritative (e.g. summaries that arrived out of order)
+                    if (resultsDiv) resultsDiv.remove();
+                    appendMessage('assistant', event.content, event.data);
+                } else {
+                    appendMessage('assistant', event.content || event.response || '');
+                }
+            }
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
         }
+        if (buffer.trim()) handleEvent(JSON.parse(buffer));
+        removeTyping();
     } catch (error) {
         removeTyping();
         appendMessage('assistant', 'Error connecting to backend: ' + error.message);
@@ -1,10 +1,31 @@
 from abc import ABC, abstractmethod
+from functools import wraps
+from .tracing import span
 
 class SearchConnector(ABC):
     """
     Abstract Base Class for all Jasper search providers (Gmail, Outlook, Files, etc.)
     This ensures a consistent interface across different data silos.
     """
+
+    def __init_subclass__(cls, **kwargs):
+        # Every connector's search is traced (connector, mode, result count, error)
+        super().__init_subclass__(**kwargs)
+        search = cls.__dict__.get("search")
+        if search is None:
+            return
+
+        @wraps(search)
+        def traced_search(self, *args, **kw):
+            with span("connector.search", connector=cls.__name__, mode=kw.get("mode"), limit=kw.get("limit")) as current:
+                results = search(self, *args, **kw)
+                if isinstance(results, list):
+                    current.set_attribute("result_count", len(results))
+                else:
+                    current.set_attribute("error", str(results))
+                return results
+
+        cls.search = traced_search
     
     @abstractmethod
     def search(self, query=None, **kwargs):
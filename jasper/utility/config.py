@@ -25,6 +25,18 @@ def get_log_file():
     """Returns the absolute path to debug.log."""
     return str(BASE_DIR / "debug.log")
 
+def get_mail_cache_file():
+    """Returns the absolute path to the local mail header/snippet cache (MAIL_CACHE_FILE overrides it)."""
+    return get_setting("MAIL_CACHE_FILE") or str(BASE_DIR / "mail_cache.db")
+
+def get_summary_cache_file():
+    """Returns the absolute path to the persistent LLM summary cache."""
+    return str(BASE_DIR / "summary_cache.db")
+
+def get_trace_file():
+    """Returns the absolute path to the local trace export (JSON lines)."""
+    return str(BASE_DIR / "traces.jsonl")
+
 def get_setting(name, default=None):
     """
     Retrieves a setting with the following priority:
@@ -51,6 +63,20 @@ def get_setting(name, default=None):
     except:
         return default
 
+def get_bool_setting(name, default=False):
+    """Retrieves a boolean setting (accepts true/false, 1/0, yes/no, on/off)."""
+    val = get_setting(name, default)
+    if isinstance(val, str):
+        return val.strip().lower() in ("1", "true", "yes", "on")
+    return bool(val)
+
+def get_int_setting(name, default=0):
+    """Retrieves an integer setting, falling back to default on bad values."""
+    try:
+        return int(get_setting(name, default))
+    except (TypeError, ValueError):
+        return default
+
 def get_credentials(provider="GMAIL"):
     """
     Retrieves credentials for the specified provider.
@@ -0,0 +1,160 @@
+import re
+import time
+from .config import get_int_setting
+from ..mail.mail_cache import parse_date_ts
+
+# Token-budgeted context for the aggregate summary prompt.
+# Each result gets a share of SUMMARY_PROMPT_TOKENS weighted by rank (relevance) and age
+# (recency). Quoted reply chains and paragraphs already included from another result are
+# dropped first. If even a minimal excerpt of every result does not fit, the caller
+# summarises the results in groups (split_groups) and then combines the group summaries.
+
+CHARS_PER_TOKEN = 4  # rough estimate for English/Croatian prose with the Gemma tokenizer
+RECENCY_HALF_LIFE_DAYS = 30
+UNKNOWN_DATE_RECENCY = 0.75
+
+def estimate_tokens(text):
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def prompt_budget():
+    """Token budget for the whole aggregate summary prompt (SUMMARY_PROMPT_TOKENS)."""
+    return get_int_setting("SUMMARY_PROMPT_TOKENS", 3000)
+
+def item_min_tokens():
+    """Smallest useful share per result (SUMMARY_ITEM_MIN_TOKENS): header plus a couple of sentences."""
+    return get_int_setting("SUMMARY_ITEM_MIN_TOKENS", 96)
+
+# Start of the quoted thread under a reply (Gmail/Apple "On ... wrote:", Outlook headers)
+_QUOTE_START_RE = re.compile(
+    r"^[ \t]*(?:On\b.{0,200}?\bwrote:|-{2,}\s*(?:Original|Forwarded) Message\s*-{2,}|From:[^\n]*\n[ \t]*(?:Sent|Date):)",
+    re.IGNORECASE | re.MULTILINE
+)
+_PARAGRAPH_SPLIT_RE = re.compile(r"\n\s*\n")
+# Shorter paragraphs ("Thanks,", "Best regards") are not worth de-duplicating
+_DEDUPE_MIN_CHARS = 40
+
+def strip_quoted(text):
+    """Drops the quoted thread of a reply ('>' lines and everything below the quote header)."""
+    match = _QUOTE_START_RE.search(text)
+    if match and text[:match.start()].strip():
+        text = text[:match.start()]
+    lines = [line for line in text.splitlines() if not line.lstrip().startswith(">")]
+    return "\n".join(lines).strip()
+
+def item_weight(rank, date, now=None):
+    """Relevance (search rank, best first) times recency (halves every RECENCY_HALF_LIFE_DAYS, floor 0.5)."""
+    relevance = 1.0 / (1.0 + rank / 5.0)
+    ts = parse_date_ts(date)
+    if ts is None:
+        recency = UNKNOWN_DATE_RECENCY
+    else:
+        age_days = max(0.0, ((now or time.time()) - ts) / 86400)
+        recency = 0.5 + 0.5 * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+    return relevance * recency
+
+def item_header(number, item):
+    source_type = "Email" if item.get("sender") else "File"
+    date = item.get("received") or item.get("date") or "Unknown date"
+    header = f"ITEM {number} ({source_type}):\n"
+    if source_type == "Email":
+        header += f"From: {item.get('sender')}\nSubject: {item.get('subject')}\n"
+    else:
+        header += f"Name: {item.get('name')}\nPath: {item.get('path')}\n"
+    return header + f"Date: {date}\n"
+
+def prepare_items(results):
+    """
+    One entry per result: {"number", "header", "body", "weight"}. Bodies have quoted threads
+    removed, and a paragraph already present in a higher-weighted result is dropped.
+    """
+    now = time.time()
+    entries = []
+    for i, item in enumerate(results):
+        content = item.get("body") or item.get("content") or item.get("summary") or "No content available."
+        if item.get("sender"):
+            content = strip_quoted(content) or content
+        entries.append({
+            "number": i + 1,
+            "header": item_header(i + 1, item),
+            "body": content,
+            "weight": item_weight(i, item.get("received") or item.get("date"), now),
+        })
+    seen = set()
+    for entry in sorted(entries, key=lambda e: e["weight"], reverse=True):
+        kept = []
+        for paragraph in _PARAGRAPH_SPLIT_RE.split(entry["body"]):
+            key = " ".join(paragraph.lower().split())
+            if len(key) >= _DEDUPE_MIN_CHARS:
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(paragraph.strip())
+        entry["body"] = "\n\n".join(p for p in kept if p) or "(Same content as another item.)"
+    return entries
+
+def _need(entry):
+    return estimate_tokens(entry["header"]) + estimate_tokens(entry["body"])
+
+def fits(entries, budget):
+    """True if every entry gets at least its minimal share (or all of it, if smaller)."""
+    floor = item_min_tokens()
+    return sum(min(_need(e), floor) for e in entries) <= budget
+
+def allocate(needs, weights, budget):
+    """
+    Water-filling: tokens are shared in proportion to weight; an entry that needs less than its
+    share gets exactly what it needs and the rest is re-shared among the others.
+    """
+    alloc = [0] * len(needs)
+    active = set(range(len(needs)))
+    remaining = budget
+    while active and remaining > 0:
+        total = sum(weights[i] for i in active) or 1.0
+        satisfied = [i for i in active if needs[i] <= remaining * weights[i] / total]
+        if not satisfied:
+            for i in active:
+                alloc[i] = int(remaining * weights[i] / total)
+            break
+        for i in satisfied:
+            alloc[i] = needs[i]
+            remaining -= needs[i]
+            active.discard(i)
+    return alloc
+
+def truncate_to_tokens(text, tokens):
+    limit = max(0, tokens) * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    if space > limit * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + " …"
+
+def pack(entries, budget):
+    """The context block for the prompt, within roughly `budget` tokens, in the original result order."""
+    floor = item_min_tokens()
+    needs = [_need(e) for e in entries]
+    # Everyone first gets their floor; the rest is shared by weight
+    base = [min(n, floor) for n in needs]
+    extra = allocate([n - b for n, b in zip(needs, base)], [e["weight"] for e in entries], max(0, budget - sum(base)))
+    parts = []
+    for entry, share in zip(entries, (b + x for b, x in zip(base, extra))):
+        body = truncate_to_tokens(entry["body"], share - estimate_tokens(entry["header"]))
+        parts.append(f"{entry['header']}Content: {body}\n")
+    return "\n".join(parts)
+
+def split_groups(entries, budget):
+    """Consecutive groups that each fit the budget (at least one entry per group)."""
+    floor = item_min_tokens()
+    groups, group, used = [], [], 0
+    for entry in entries:
+        cost = min(_need(entry), floor)
+        if group and used + cost > budget:
+            groups.append(group)
+            group, used = [], 0
+        group.append(entry)
+        used += cost
+    if group:
+        groups.append(group)
+    return groups
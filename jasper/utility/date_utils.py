@@ -1,9 +1,13 @@
 import re
 from datetime import datetime, timedelta
 
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+# "monday", "last friday": the most recent such day
+WEEKDAY_PATTERN = r"(?:(?:last|this)\s+)?(?:" + "|".join(WEEKDAYS) + r")"
+
 def parse_relative_date(text):
     """
-    Parses strings like "last 3 months", "last 2 weeks", "past 5 days".
+    Parses strings like "last 3 months", "last 2 weeks", "past 5 days", "today", "monday".
     Returns a datetime object representing the start date (cutoff), or None.
     """
     if not text:
@@ -40,6 +44,8 @@ def parse_relative_date(text):
     match_singular = re.search(r"(?:last|past|this|current|lat|pst)\s+(day|week|month|year|mont)", text)
     if not match_singular and "yesterday" in text:
         return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    if not match_singular and "today" in text:
+        return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
     if match_singular:
          unit = match_singular.group(1)
@@ -64,6 +70,15 @@ def parse_relative_date(text):
              
          return today - delta
 
+    # Weekday: the most recent one (today counts, except for "last monday" on a Monday)
+    match_weekday = re.search(r"\b(?:(last|this)\s+)?(" + "|".join(WEEKDAYS) + r")\b", text)
+    if match_weekday:
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        days_back = (today.weekday() - WEEKDAYS.index(match_weekday.group(2))) % 7
+        if days_back == 0 and match_weekday.group(1) == "last":
+            days_back = 7
+        return today - timedelta(days=days_back)
+
     return None
 
 def parse_absolute_date(text):
@@ -106,7 +121,7 @@ def extract_date_range(text):
     end_date = None
     
     # Date pattern: Absolute (DD.MM.YYYY or YYYY-MM-DD) or Relative (last 3 months)
-    date_pattern = r"((?:\d{1,2}\.\d{1,2}\.\d{4})|(?:\d{4}-\d{1,2}-\d{1,2})|(?:last|past|this|current|lat|pst)\s+(?:\d+\s+)?(?:day|week|month|year|mont)s?)"
+    date_pattern = r"((?:\d{1,2}\.\d{1,2}\.\d{4})|(?:\d{4}-\d{1,2}-\d{1,2})|(?:last|past|this|current|lat|pst)\s+(?:\d+\s+)?(?:day|week|month|year|mont)s?|today|yesterday|" + WEEKDAY_PATTERN + ")"
     
     # 1. Check for "at <DATE>" or "on <DATE>" (Exact day)
     exact_match = re.search(fr"(?:at|on)\s+{date_pattern}", text)
@@ -154,7 +169,7 @@ def clean_date_string(text):
     # Use the same detection logic to find and replace with empty string
     # We prioritize longest matches first
     
-    date_pattern = r"((?:\d{1,2}\.\d{1,2}\.\d{4})|(?:\d{4}-\d{1,2}-\d{1,2})|(?:last|past|this|current|lat|pst)\s+(?:\d+\s+)?(?:day|week|month|year|mont)s?)"
+    date_pattern = r"((?:\d{1,2}\.\d{1,2}\.\d{4})|(?:\d{4}-\d{1,2}-\d{1,2})|(?:last|past|this|current|lat|pst)\s+(?:\d+\s+)?(?:day|week|month|year|mont)s?|today|yesterday|" + WEEKDAY_PATTERN + ")"
     
     # Range check "from <DATE> to <DATE>"
     text = re.sub(fr"(?:from|since)\s+{date_pattern}\s+(?:to|until|before)\s+{date_pattern}", "", text, flags=re.IGNORECASE)
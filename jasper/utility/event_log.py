@@ -0,0 +1,92 @@
+import json
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from .config import get_setting, get_int_setting, get_log_file
+
+# Structured debug log (debug.log) written by a background thread.
+# Request handlers only put records on a bounded queue; a QueueListener formats them as
+# JSON lines and appends them to a size-rotated file (LOG_MAX_BYTES x LOG_BACKUP_COUNT).
+
+class JsonLineFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: records are dropped (and counted) when the writer falls behind."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_logger = None
+_handler = None
+_listener = None
+_lock = threading.Lock()
+
+def _parse_level(level):
+    if isinstance(level, int):
+        return level
+    value = getattr(logging, str(level).upper(), None)
+    return value if isinstance(value, int) else logging.INFO
+
+def get_logger():
+    global _logger, _handler, _listener
+    with _lock:
+        if _logger is None:
+            log_queue = queue.Queue(maxsize=get_int_setting("LOG_QUEUE_SIZE", 10000))
+            file_handler = RotatingFileHandler(
+                get_log_file(),
+                maxBytes=get_int_setting("LOG_MAX_BYTES", 5 * 1024 * 1024),
+                backupCount=get_int_setting("LOG_BACKUP_COUNT", 3),
+                encoding="utf-8",
+                delay=True
+            )
+            file_handler.setFormatter(JsonLineFormatter())
+            _listener = QueueListener(log_queue, file_handler)
+            _listener.start()
+            atexit.register(stop_logging)
+
+            _handler = DroppingQueueHandler(log_queue)
+            logger = logging.getLogger("jasper")
+            logger.setLevel(_parse_level(get_setting("LOG_LEVEL", "INFO")))
+            logger.addHandler(_handler)
+            logger.propagate = False
+            _logger = logger
+        return _logger
+
+def log_event(event, level=logging.INFO, **fields):
+    """Queues one JSON log line: {"ts", "level", "event", **fields}. Never touches the disk itself."""
+    logger = get_logger()
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+def set_log_level(level):
+    """Changes the level at runtime ("DEBUG", "INFO", ... or a logging constant)."""
+    get_logger().setLevel(_parse_level(level))
+
+def dropped_records():
+    return _handler.dropped if _handler else 0
+
+def stop_logging():
+    """Flushes queued records to disk and stops the writer thread."""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener:
+        listener.stop()
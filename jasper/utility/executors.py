@@ -0,0 +1,94 @@
+import time
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .config import get_int_setting
+from .metrics import STAGE_SECONDS, QUEUE_SECONDS, EXECUTOR_PENDING, EXECUTOR_ACTIVE, ERRORS
+from .tracing import span
+
+# Bounded thread pools for the blocking work behind /query (IMAP, COM, Chroma, Ollama).
+# One pool per connector type plus one for LLM calls, so a slow IMAP login or a long
+# summary only queues work of its own kind and the event loop stays responsive.
+
+# name -> (default max workers, needs COM)
+POOLS = {
+    "mail_gmail": (4, False),
+    "mail_outlook": (2, True),   # Outlook COM (win32com) objects are apartment-bound
+    "files": (2, True),          # Windows Search is queried through ADODB (COM)
+    "semantic": (2, False),
+    "llm": (2, False),           # Ollama serialises generation per model anyway
+    "cache": (2, False),         # SQLite reads/writes of the persistent summary cache
+}
+
+# Per-stage timeouts in seconds (override with TIMEOUT_<STAGE>)
+STAGE_TIMEOUTS = {
+    "intent": 20,
+    "search": 60,
+    "summary": 120,
+    "chat": 120,
+    "warmup": 300,  # a cold model load can take minutes on CPU
+    "shadow": 120,  # background intent re-checks queue behind all live work
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+def _com_initializer():
+    # Every thread that touches COM must join an apartment first
+    try:
+        import pythoncom
+        pythoncom.CoInitialize()
+    except ImportError:
+        pass
+
+def get_executor(name):
+    with _executors_lock:
+        if name not in _executors:
+            default_workers, needs_com = POOLS.get(name, (2, False))
+            _executors[name] = ThreadPoolExecutor(
+                max_workers=get_int_setting(f"{name.upper()}_WORKERS", default_workers),
+                thread_name_prefix=f"jasper-{name}",
+                initializer=_com_initializer if needs_com else None
+            )
+        return _executors[name]
+
+def stage_timeout(stage):
+    return get_int_setting(f"TIMEOUT_{stage.upper()}", STAGE_TIMEOUTS.get(stage, 60))
+
+async def run_blocking(pool, stage, func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) on the named pool and awaits it with the stage timeout.
+    Raises asyncio.TimeoutError when the stage overruns (the worker thread finishes on its own).
+    """
+    loop = asyncio.get_running_loop()
+    submitted = time.perf_counter()
+    EXECUTOR_PENDING.inc(pool=pool)
+
+    def call():
+        queued = time.perf_counter() - submitted
+        QUEUE_SECONDS.observe(queued, pool=pool)
+        EXECUTOR_PENDING.dec(pool=pool)
+        EXECUTOR_ACTIVE.inc(pool=pool)
+        try:
+            with span(f"{pool}.{stage}", pool=pool, stage=stage, queue_ms=round(queued * 1000, 2)):
+                return func(*args, **kwargs)
+        finally:
+            EXECUTOR_ACTIVE.dec(pool=pool)
+
+    # The worker runs in a copy of the caller's context, so its spans nest under the request
+    future = loop.run_in_executor(get_executor(pool), contextvars.copy_context().run, call)
+    try:
+        return await asyncio.wait_for(future, timeout=stage_timeout(stage))
+    except Exception as e:
+        ERRORS.inc(stage=stage, type=type(e).__name__)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - submitted, pool=pool, stage=stage)
+
+def shutdown_executors():
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from .config import get_int_setting
+from .executors import run_blocking
+from .metrics import ERRORS
+
+# "Search everything": one query fanned out to every connector at once.
+# Each source runs on its own pool with its own deadline; results are merged into one
+# list by reciprocal rank fusion, so mail, file-name and content hits compete on rank
+# rather than on their (incomparable) native scores.
+
+# source -> (pool, default deadline in seconds, weight)
+SOURCES = {
+    "mail_gmail": ("mail_gmail", 15, 1.0),
+    "mail_outlook": ("mail_outlook", 15, 1.0),
+    "files": ("files", 10, 1.0),
+    "semantic": ("semantic", 10, 1.0),
+}
+RRF_K = 60
+
+def source_deadline(source):
+    return get_int_setting(f"FEDERATED_DEADLINE_{source.upper()}", SOURCES[source][1])
+
+def source_kwargs(source, query, limit):
+    if source.startswith("mail_"):
+        # Content-style query against the semantic mail index, keyword search as fallback
+        return {"query": query, "body": query, "limit": limit, "mode": "semantic"}
+    return {"query": query, "limit": limit}
+
+def _item_key(item):
+    return item.get("message_id") or item.get("path") or id(item)
+
+def rank_results(by_source, limit):
+    """
+    Merges per-source result lists (best first) into one ranked list.
+    An item found by several sources (a file by name and by content) is listed once with the summed score.
+    """
+    merged = {}
+    for source, items in by_source.items():
+        weight = SOURCES.get(source, (None, 0, 1.0))[2]
+        for rank, item in enumerate(items):
+            score = weight / (RRF_K + rank + 1)
+            key = _item_key(item)
+            entry = merged.get(key)
+            if entry is None:
+                entry = dict(item)
+                entry["source"] = source
+                entry["sources"] = [source]
+                entry["rank_score"] = 0.0
+                if source.startswith("mail_") and not entry.get("provider"):
+                    entry["provider"] = source.split("_", 1)[1].upper()
+                merged[key] = entry
+            else:
+                entry["sources"].append(source)
+                # Keep the content snippet from whichever source has one
+                if not entry.get("content") and item.get("content"):
+                    entry["content"] = item["content"]
+            entry["rank_score"] = round(entry["rank_score"] + score, 6)
+    ranked = sorted(merged.values(), key=lambda e: e["rank_score"], reverse=True)
+    return ranked[:limit]
+
+async def federated_search(connectors, query, limit=10, on_update=None):
+    """
+    Queries every registered source concurrently. on_update(results, status) is awaited each time
+    a source answers, with the merged list so far. Returns (results, status) once every source has
+    answered or hit its deadline; status maps source -> "ok", "timeout" or an error.
+    """
+    by_source = {}
+    status = {}
+
+    async def query_source(source):
+        pool = SOURCES[source][0]
+        start = time.monotonic()
+        try:
+            results = await asyncio.wait_for(
+                run_blocking(pool, "search", connectors[source].search, **source_kwargs(source, query, limit)),
+                timeout=source_deadline(source)
+            )
+        except asyncio.TimeoutError:
+            print(f"DEBUG: [Federated] {source} missed its {source_deadline(source)}s deadline")
+            ERRORS.inc(stage=f"federated_{source}", type="TimeoutError")
+            status[source] = "timeout"
+            return
+        except Exception as e:
+            print(f"DEBUG: [Federated] {source} failed: {e}")
+            status[source] = f"error: {e}"
+            return
+        if not isinstance(results, list):
+            status[source] = f"error: {results}"
+            return
+        by_source[source] = results
+        status[source] = "ok"
+        print(f"DEBUG: [Federated] {source} answered with {len(results)} results in {time.monotonic() - start:.2f}s")
+        if on_update:
+            await on_update(rank_results(by_source, limit), dict(status))
+
+    await asyncio.gather(*(query_source(source) for source in SOURCES if source in connectors))
+    return rank_results(by_source, limit), status
@@ -7,6 +7,8 @@ import json
 from datetime import datetime
 import argparse
 from .config import get_db_path, get_status_file
+from .metrics import CHROMA_SECONDS
+from .tracing import span
 
 # CONFIGURATION
 DB_PATH = get_db_path()
@@ -76,7 +78,8 @@ def index_file(file_path):
         if not content.strip(): return
 
         # Delete old chunks
-        collection.delete(where={"source": str(path_obj.absolute())})
+        with CHROMA_SECONDS.time(collection=COLLECTION_NAME, op="delete"), span("chroma.delete", collection=COLLECTION_NAME):
+            collection.delete(where={"source": str(path_obj.absolute())})
         
         # Chunk and Add
         chunks = chunk_text(content)
@@ -90,11 +93,12 @@ def index_file(file_path):
             "hash": f_hash
         } for _ in range(len(chunks))]
         
-        collection.add(
-            ids=ids,
-            documents=chunks,
-            metadatas=metadatas
-        )
+        with CHROMA_SECONDS.time(collection=COLLECTION_NAME, op="add"), span("chroma.add", collection=COLLECTION_NAME, chunks=len(chunks)):
+            collection.add(
+                ids=ids,
+                documents=chunks,
+                metadatas=metadatas
+            )
         safe_name = path_obj.name.encode('ascii', 'ignore').decode('ascii')
         print(f"Indexed {len(chunks)} chunks from: {safe_name}")
         
@@ -0,0 +1,98 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from .config import get_int_setting
+from .metrics import CACHE_REQUESTS
+
+# LRU/TTL cache of intent-model output keyed on normalised user input + model version.
+# The model runs at temperature 0, so the same question always parses the same way.
+# Only the model's JSON is cached: sender/subject cleanup and relative dates
+# ("last week") are re-resolved against the current time on every hit.
+
+# Leading filler that never changes the parse ("show me emails from X" == "emails from X")
+_FILLER_RE = re.compile(r"^(?:(?:please|pls|can you|could you|jasper|show me|show|get me|get|find me|find|list|fetch)\b[\s,]*)+")
+
+def normalize_query(text):
+    text = " ".join(text.lower().split())
+    text = text.strip(" ?!.,")
+    return _FILLER_RE.sub("", text).strip()
+
+class IntentCache:
+    def __init__(self, max_size=512, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (raw_content, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, user_input, model_version):
+        return (model_version, normalize_query(user_input))
+
+    def get(self, user_input, model_version):
+        key = self._key(user_input, model_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache="intent", result="hit")
+                return entry[0]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            CACHE_REQUESTS.inc(cache="intent", result="miss")
+            return None
+
+    def put(self, user_input, model_version, raw_content):
+        key = self._key(user_input, model_version)
+        with self._lock:
+            self._entries[key] = (raw_content, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+intent_cache = IntentCache(
+    max_size=get_int_setting("INTENT_CACHE_SIZE", 512),
+    ttl=get_int_setting("INTENT_CACHE_TTL", 3600)
+)
+
+_model_versions = {}  # model -> (version, checked_at)
+_VERSION_CHECK_INTERVAL = 300
+
+def model_version(model_name):
+    """
+    The installed model's digest, so a re-created Modelfile invalidates cached parses.
+    Looked up at most every few minutes; "unknown" if Ollama cannot be asked.
+    """
+    cached = _model_versions.get(model_name)
+    if cached and time.monotonic() - cached[1] < _VERSION_CHECK_INTERVAL:
+        return cached[0]
+    digest = "unknown"
+    try:
+        import ollama
+        for m in ollama.list().get("models", []):
+            name = m.get("model") or m.get("name") or ""
+            if name == model_name or name.split(":")[0] == model_name:
+                digest = m.get("digest") or digest
+                break
+    except Exception as e:
+        print(f"DEBUG: Could not read model version for {model_name}: {e}")
+    version = f"{model_name}@{digest}"
+    _model_versions[model_name] = (version, time.monotonic())
+    return version
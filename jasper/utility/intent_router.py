@@ -0,0 +1,201 @@
+import re
+import random
+import threading
+from .config import get_setting
+from .date_utils import WEEKDAY_PATTERN
+from .metrics import CACHE_REQUESTS
+
+# Deterministic fast path in front of the intent model.
+# Unambiguous queries ("emails from Sonja last week", "find file budget.xlsx") are parsed by
+# compiled rules into the same {"intent", "params"} shape the model returns, so /query
+# can skip the LLM round trip. Anything the rules are not sure about goes to the model.
+
+CONFIDENT = 0.9
+
+# Date phrases extract_date_range understands, with an optional "since"/"before"/"until"/"on"
+DATE_PATTERN = (
+    r"(?:(?:since|before|until|on)\s+)?"
+    rf"(?:(?:last|past|this|current)\s+(?:\d+\s+)?(?:day|week|month|year)s?|today|yesterday|{WEEKDAY_PATTERN})"
+)
+# "in the last 3 weeks", "within the past month": the lead-in stays out of the captures
+DATE_LEAD = r"(?:(?:in|within|during|over)\s+(?:the\s+)?)?"
+
+def _provider_pattern(group):
+    return rf"(?:\s+(?:in|on|from)\s+(?:my\s+)?(?P<{group}>gmail|outlook)(?:\s+account)?)?"
+
+VERB_PATTERN = r"(?:(?P<verb>show|find|get|search|list|fetch|summarize|summarise)\s+(?:me\s+)?(?:for\s+)?)?(?:(?:all|my|the|latest|recent)\s+)*"
+MAIL_NOUN = r"(?:e-?mails?|mails?|messages?)"
+TAIL = r"\s*[?.!]*\s*$"
+
+MAIL_FROM_RE = re.compile(
+    rf"^{VERB_PATTERN}{MAIL_NOUN}{_provider_pattern('provider')}\s+from\s+(?P<sender>[^\s'\"]+(?:\s+[^\s'\"]+){{0,2}}?)"
+    rf"(?:\s+{DATE_LEAD}(?P<date>{DATE_PATTERN}))?{_provider_pattern('provider2')}{TAIL}",
+    re.IGNORECASE
+)
+MAIL_SUBJECT_RE = re.compile(
+    rf"^{VERB_PATTERN}{MAIL_NOUN}{_provider_pattern('provider')}\s+(?:with\s+)?subject\s+(?P<q>['\"]?)(?P<subject>.+?)(?P=q)"
+    rf"(?:\s+{DATE_LEAD}(?P<date>{DATE_PATTERN}))?{TAIL}",
+    re.IGNORECASE
+)
+# Content queries ("the email about the boat deposit") search mail bodies: "body" sends them
+# to the semantic mail index, with a server-side body search as fallback
+MAIL_ABOUT_RE = re.compile(
+    rf"^{VERB_PATTERN}{MAIL_NOUN}{_provider_pattern('provider')}\s+(?:about|mentioning|containing|regarding|that\s+mentions?)\s+"
+    rf"(?P<q>['\"]?)(?P<body>.+?)(?P=q)(?:\s+{DATE_LEAD}(?P<date>{DATE_PATTERN}))?{_provider_pattern('provider2')}{TAIL}",
+    re.IGNORECASE
+)
+FILES_RE = re.compile(
+    rf"^(?:find|search\s+for|search|locate|show|open)\s+(?:me\s+)?(?:the\s+|a\s+|my\s+)?(?P<kind>files?|folders?|documents?|directory)\s+"
+    rf"(?:named\s+|called\s+)?(?P<q>['\"]?)(?P<query>.+?)(?P=q)(?:\s+(?:modified\s+|from\s+)?{DATE_LEAD}(?P<date>{DATE_PATTERN}))?{TAIL}",
+    re.IGNORECASE
+)
+# "search everything for X" / "find X everywhere" fan out to every connector
+EVERYTHING_RE = re.compile(
+    rf"^(?:(?:search|look\s+in|find\s+in)\s+(?:everything|everywhere|all\s+sources)\s+for\s+(?P<q1>.+?)"
+    rf"|(?:search\s+for|search|find|look\s+for)\s+(?P<q2>.+?)\s+everywhere){TAIL}",
+    re.IGNORECASE
+)
+CHAT_RE = re.compile(r"\b(?:weather|stock|joke|news|market)\b", re.IGNORECASE)
+
+# Words that make a query ambiguous for the rules (content search, attachments, mixed intents)
+AMBIGUOUS_RE = re.compile(
+    r"\b(?:about|containing|contain|contains|content|inside|attachment|attached|subject|and|or|not|without|file|folder|since|before|after|until)\b",
+    re.IGNORECASE
+)
+# Sender captures that are really a date or provider ("emails from last week", "mails from gmail")
+NOT_A_SENDER_RE = re.compile(rf"^(?:{DATE_PATTERN}|last|past|this|gmail|outlook|my|the)\b", re.IGNORECASE)
+# File queries left with nothing but a connecting word ("find files from last week")
+NOT_A_QUERY_RE = re.compile(r"^(?:from|in|within|during|over|the|modified|since|before|until|on)$", re.IGNORECASE)
+MAIL_OR_FILE_RE = re.compile(r"\b(?:mail|email|e-mail|gmail|outlook|sender|file|folder|document)s?\b", re.IGNORECASE)
+SUMMARIZE_RE = re.compile(r"\b(?:summarize|summarise|summary|overview|briefly|explain|sažmi|pregled)\b", re.IGNORECASE)
+
+def _mail_params(match, user_input):
+    groups = match.groupdict()
+    params = {"summarize": bool(SUMMARIZE_RE.search(user_input))}
+    provider = groups.get("provider") or groups.get("provider2")
+    if provider:
+        params["provider"] = provider.upper()
+    if groups.get("date"):
+        params["date_filter"] = groups["date"]
+    return params
+
+def route(user_input):
+    """
+    Returns (data, confidence). data has the model's shape ({"intent": ..., "params": {...}})
+    or is None when no rule applies. Only results with confidence >= CONFIDENT should skip the model.
+    """
+    text = " ".join(user_input.split())
+    if not text:
+        return None, 0.0
+
+    m = EVERYTHING_RE.match(text)
+    if m:
+        query = m.group("q1") or m.group("q2")
+        return {"intent": "all", "params": {"query": query, "summarize": bool(SUMMARIZE_RE.search(text))}}, CONFIDENT
+
+    m = MAIL_FROM_RE.match(text)
+    if m:
+        sender = m.group("sender")
+        if NOT_A_SENDER_RE.match(sender):
+            return None, 0.0
+        params = _mail_params(m, text)
+        params["sender"] = sender
+        # "emails from Sonja about the boat" or "... with attachment" need the model
+        confidence = 0.5 if AMBIGUOUS_RE.search(sender) else CONFIDENT
+        return {"intent": "mail", "params": params}, confidence
+
+    m = MAIL_SUBJECT_RE.match(text)
+    if m:
+        params = _mail_params(m, text)
+        params["subject"] = m.group("subject")
+        return {"intent": "mail", "params": params}, CONFIDENT
+
+    m = MAIL_ABOUT_RE.match(text)
+    if m:
+        body = m.group("body")
+        params = _mail_params(m, text)
+        params["body"] = body
+        # "emails about X from Sonja" mixes a sender in: leave it to the model
+        confidence = 0.5 if re.search(r"\b(?:from|subject|attachment|attached)\b", body, re.IGNORECASE) else CONFIDENT
+        return {"intent": "mail", "params": params}, confidence
+
+    m = FILES_RE.match(text)
+    if m:
+        query = m.group("query")
+        params = {"query": query, "summarize": bool(SUMMARIZE_RE.search(text))}
+        if m.group("date"):
+            params["date_filter"] = m.group("date")
+        if m.group("kind").lower().startswith(("folder", "directory")):
+            params["kind"] = "folder"
+        # "find files about X" is a content (semantic) search, mail words mean a mixed request
+        if NOT_A_QUERY_RE.match(query) or AMBIGUOUS_RE.search(query) or re.search(r"\b(?:mail|email|gmail|outlook)\b", query, re.IGNORECASE):
+            return {"intent": "files", "params": params}, 0.5
+        return {"intent": "files", "params": params}, CONFIDENT
+
+    if CHAT_RE.search(text) and not MAIL_OR_FILE_RE.search(text):
+        return {"intent": "chat", "params": {}}, CONFIDENT
+
+    return None, 0.0
+
+class RouterStats:
+    """Hit rate of the fast path and how often it agrees with the model."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routed = 0          # answered by the rules, model skipped
+        self.fallbacks = 0       # sent to the model
+        self.compared = 0        # rule result checked against the model
+        self.agreed = 0
+
+    def record_route(self, routed):
+        CACHE_REQUESTS.inc(cache="intent_router", result="hit" if routed else "miss")
+        with self._lock:
+            if routed:
+                self.routed += 1
+            else:
+                self.fallbacks += 1
+
+    def record_comparison(self, rule_data, model_data):
+        agreed = intents_agree(rule_data, model_data)
+        with self._lock:
+            self.compared += 1
+            if agreed:
+                self.agreed += 1
+        return agreed
+
+    def snapshot(self):
+        with self._lock:
+            total = self.routed + self.fallbacks
+            return {
+                "routed": self.routed,
+                "fallbacks": self.fallbacks,
+                "hit_rate": round(self.routed / total, 4) if total else 0.0,
+                "compared": self.compared,
+                "agreed": self.agreed,
+                "agreement": round(self.agreed / self.compared, 4) if self.compared else None,
+            }
+
+def intents_agree(rule_data, model_data):
+    """Same intent and, for mail, the same sender/subject (case-insensitive)."""
+    if not rule_data or not isinstance(model_data, dict):
+        return False
+    if rule_data.get("intent") != model_data.get("intent"):
+        return False
+    if rule_data["intent"] == "mail":
+        model_params = model_data.get("params") or {}
+        for field in ("sender", "subject"):
+            ours = (rule_data["params"].get(field) or "").strip().lower()
+            theirs = (model_params.get(field) or "").strip().lower()
+            if ours != theirs:
+                return False
+    return True
+
+stats = RouterStats()
+
+def shadow_sample():
+    """True for the share of routed queries (ROUTER_SHADOW_RATE) that are re-checked by the model."""
+    try:
+        rate = float(get_setting("ROUTER_SHADOW_RATE", 0.1))
+    except (TypeError, ValueError):
+        rate = 0.1
+    return random.random() < rate
@@ -0,0 +1,145 @@
+import re
+import json
+from .config import get_int_setting
+from .metrics import Counter, Gauge
+
+# Structured output for the intent model. The generate call passes INTENT_SCHEMA as
+# Ollama's `format`, so decoding is constrained to {"intent", "params"} and a short
+# num_predict budget. parse_intent_output() still accepts fenced, escaped or truncated
+# JSON, so the slower fallback to Gemma3 chat only runs when nothing usable came back.
+
+INTENTS = ["mail", "files", "semantic", "chat", "all"]
+
+INTENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "enum": INTENTS},
+        # Every key app.py reads from params; additionalProperties keeps the model free to add
+        # one that a newer handler understands
+        "params": {
+            "type": "object",
+            "properties": {
+                "sender": {"type": "string"},
+                "subject": {"type": "string"},
+                "body": {"type": "string"},
+                "content": {"type": "string"},
+                "date_filter": {"type": "string"},
+                "provider": {"type": "string", "enum": ["GMAIL", "OUTLOOK"]},
+                "has_attachment": {"type": "boolean"},
+                "query": {"type": "string"},
+                "name": {"type": "string"},
+                "kind": {"type": "string"},
+                "folder": {"type": "string"},
+                "limit": {"type": "integer"},
+                "message": {"type": "string"},
+                "summarize": {"type": "boolean"},
+            },
+            "additionalProperties": True,
+        },
+    },
+    "required": ["intent", "params"],
+}
+
+INTENT_OUTPUTS = Counter("jasper_intent_outputs_total", "Intent model answers by parse result (valid, repaired, retried, invalid).", ["result"])
+
+def _retry_ratio():
+    values = {key[0]: count for key, count in INTENT_OUTPUTS.values().items()}
+    # Every model call ends as valid, repaired or invalid; "retried" counts the second attempts
+    answered = values.get("valid", 0) + values.get("repaired", 0) + values.get("invalid", 0)
+    return {(): round(values.get("retried", 0) / answered, 4)} if answered else {}
+
+INTENT_RETRY_RATIO = Gauge("jasper_intent_retry_ratio", "Share of intent parses that needed a second model call, since start.", callback=_retry_ratio)
+
+def intent_num_predict():
+    """Token budget for one intent answer (INTENT_NUM_PREDICT); the longest valid answer is ~50 tokens."""
+    return get_int_setting("INTENT_NUM_PREDICT", 96)
+
+_FENCE_RE = re.compile(r"```(?:\w+)?\s*(.*?)(?:```|$)", re.DOTALL)
+_CLOSERS = {"{": "}", "[": "]"}
+
+def _candidates(text):
+    """
+    Scans text from its first "{" and yields JSON strings to try: the text itself, then
+    (if it ends mid-object) cuts at each point where a value had just ended, with the
+    open brackets closed. Latest cut first, so as much of the answer as possible is kept.
+    """
+    start = text.find("{")
+    if start < 0:
+        return
+    stack = []
+    cuts = []  # (end index, open brackets at that point)
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                cuts.append((i + 1, list(stack)))
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(ch)
+            cuts.append((i + 1, list(stack)))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            cuts.append((i + 1, list(stack)))
+            if not stack:
+                # Complete object; anything after it (a stop word, prose) is ignored
+                yield text[start:i + 1]
+                return
+        elif ch.isalnum():
+            cuts.append((i + 1, list(stack)))
+    for end, open_brackets in reversed(cuts):
+        head = text[start:end].rstrip().rstrip(",")
+        yield head + "".join(_CLOSERS[b] for b in reversed(open_brackets))
+
+def _normalize(data):
+    if not isinstance(data, dict) or data.get("intent") not in INTENTS:
+        return None
+    params = data.get("params")
+    params = dict(params) if isinstance(params, dict) else {}
+    for flag in ("summarize", "has_attachment"):
+        if isinstance(params.get(flag), str):
+            params[flag] = params[flag].strip().lower() == "true"
+    limit = params.pop("limit", None)
+    if isinstance(limit, str) and limit.strip().isdigit():
+        limit = int(limit)
+    # A limit the handlers cannot use ("ten", -3, null) is dropped so their defaults apply
+    if isinstance(limit, (int, float)) and not isinstance(limit, bool) and limit >= 1:
+        params["limit"] = int(limit)
+    return {"intent": data["intent"], "params": params}
+
+def parse_intent_output(raw):
+    """
+    Tolerant parse of the intent model's answer.
+    Returns (data, repaired): data is {"intent", "params"} or None; repaired is True when the
+    answer needed more than json.loads (code fences, "\\_" escapes, trailing text, truncation).
+    """
+    raw = (raw or "").strip()
+    if not raw:
+        return None, False
+    try:
+        data = _normalize(json.loads(raw))
+        if data is not None:
+            return data, False
+    except ValueError:
+        pass
+    text = raw
+    match = _FENCE_RE.search(text)
+    if match:
+        text = match.group(1)
+    text = text.replace("\\_", "_")
+    for candidate in _candidates(text):
+        try:
+            data = _normalize(json.loads(candidate))
+        except ValueError:
+            continue
+        if data is not None:
+            return data, True
+    return None, False
@@ -0,0 +1,87 @@
+import asyncio
+from .config import get_setting, get_int_setting
+from .executors import stage_timeout
+from .llm_scheduler import get_scheduler, reset_scheduler
+from .metrics import STAGE_SECONDS, ERRORS
+from .model_warmup import keep_alive, note_model_use
+from .tracing import span, set_llm_attributes
+
+# One shared ollama.AsyncClient for every model call in the server.
+# Its httpx pool keeps connections to Ollama alive between requests, calls are plain
+# coroutines (cancelling the task aborts the HTTP request, so Ollama stops generating),
+# and every request waits for a slot from the priority scheduler (llm_scheduler).
+
+_client = None
+_client_loop = None
+
+def get_client():
+    """The shared client, created on first use in the running event loop."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        import httpx
+        import ollama
+        concurrency = get_int_setting("LLM_CONCURRENCY", 2)
+        _client = ollama.AsyncClient(
+            host=get_setting("OLLAMA_HOST") or None,
+            limits=httpx.Limits(max_connections=concurrency + 2, max_keepalive_connections=concurrency + 2)
+        )
+        _client_loop = loop
+        reset_scheduler()
+    return _client
+
+async def _call(kind, stage, model, prompt_chars, request):
+    client = get_client()
+    if stage != "warmup":
+        note_model_use(model)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def scheduled():
+        async with get_scheduler().slot(model, stage):
+            with span(f"ollama.{kind}", model=model, stage=stage, prompt_chars=prompt_chars) as current:
+                response = await request(client)
+                set_llm_attributes(current, response)
+                return response
+
+    try:
+        # The stage timeout covers the wait for a slot too, not only the model call
+        return await asyncio.wait_for(scheduled(), timeout=stage_timeout(stage))
+    except Exception as e:
+        ERRORS.inc(stage=stage, type=type(e).__name__)
+        raise
+    finally:
+        STAGE_SECONDS.observe(loop.time() - start, pool="ollama", stage=stage)
+
+async def generate(model, prompt, stage="summary", **kwargs):
+    """ollama generate through the shared client; raises asyncio.TimeoutError past the stage timeout (queueing included)."""
+    kwargs.setdefault("keep_alive", keep_alive())
+    return await _call("generate", stage, model, len(prompt or ""),
+                       lambda client: client.generate(model=model, prompt=prompt, **kwargs))
+
+async def chat(model, messages, stage="chat", **kwargs):
+    """ollama chat through the shared client; raises asyncio.TimeoutError past the stage timeout (queueing included)."""
+    kwargs.setdefault("keep_alive", keep_alive())
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return await _call("chat", stage, model, prompt_chars,
+                       lambda client: client.chat(model=model, messages=messages, **kwargs))
+
+async def close_client():
+    global _client
+    client, _client = _client, None
+    reset_scheduler()
+    if client is None:
+        return
+    # ollama.AsyncClient has no public close (as of 0.6); use one if a later release adds it,
+    # otherwise close the underlying httpx client if it is where we expect it
+    close = getattr(client, "aclose", None) or getattr(client, "close", None)
+    if close is None:
+        close = getattr(getattr(client, "_client", None), "aclose", None)
+    if close is None:
+        return
+    try:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
+    except Exception as e:
+        print(f"DEBUG: Closing the Ollama client failed: {e}")
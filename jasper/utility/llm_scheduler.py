@@ -0,0 +1,150 @@
+import asyncio
+import itertools
+import time
+from .config import get_int_setting
+from .metrics import Counter, Gauge, Histogram
+
+# Ollama on one machine serves requests largely one at a time and swaps models between
+# "jasper" and "gemma3". Every Ollama call takes a slot from this scheduler first:
+# - priority classes: intent > chat > summary > warmup > shadow, so a new query's intent
+#   parse never queues behind another query's per-item summaries, and background
+#   router/model comparisons only run when nothing else is waiting;
+# - within a class, requests for the model that was dispatched last go first (up to
+#   LLM_MODEL_BATCH in a row while another model waits), so queued work is batched per
+#   model instead of interleaved loads;
+# - a request whose task is cancelled (client disconnected) leaves the queue without
+#   ever reaching Ollama.
+
+PRIORITIES = {"intent": 0, "chat": 1, "summary": 2, "warmup": 3, "shadow": 4}
+DEFAULT_PRIORITY = 2
+
+LLM_QUEUE_SECONDS = Histogram("jasper_llm_queue_seconds", "Time an Ollama request waited for a scheduler slot.", ["model", "stage"])
+LLM_MODEL_SWITCHES = Counter("jasper_llm_model_switches_total", "Dispatches to a different model than the previous one.", ["model"])
+LLM_CANCELLED = Counter("jasper_llm_cancelled_total", "Queued Ollama requests dropped because their caller went away.", ["stage"])
+
+def priority_of(stage):
+    return PRIORITIES.get(stage, DEFAULT_PRIORITY)
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "model", "stage", "future", "queued_at")
+
+    def __init__(self, priority, seq, model, stage, future):
+        self.priority = priority
+        self.seq = seq
+        self.model = model
+        self.stage = stage
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+class LlmScheduler:
+    """Priority, model-batching admission in front of Ollama. Use `async with scheduler.slot(model, stage):`."""
+
+    def __init__(self, slots, batch=4):
+        self.slots = max(1, slots)
+        self.batch = max(1, batch)
+        self._active = 0
+        self._waiting = []
+        self._seq = itertools.count()
+        self._model = None   # model of the last dispatch
+        self._run = 0        # consecutive dispatches to self._model
+
+    def _pick(self):
+        top = min(w.priority for w in self._waiting)
+        candidates = [w for w in self._waiting if w.priority == top]
+        oldest = min(candidates, key=lambda w: w.seq)
+        same_model = [w for w in candidates if w.model == self._model]
+        # Keep batching the current model unless another model has waited through a full batch
+        if same_model and (oldest.model == self._model or self._run < self.batch):
+            return min(same_model, key=lambda w: w.seq)
+        return oldest
+
+    def _note_dispatch(self, model):
+        if model == self._model:
+            self._run += 1
+        else:
+            if self._model is not None:
+                LLM_MODEL_SWITCHES.inc(model=model)
+            self._model = model
+            self._run = 1
+
+    def _dispatch(self):
+        while self._active < self.slots and self._waiting:
+            waiter = self._pick()
+            self._waiting.remove(waiter)
+            if waiter.future.done():
+                continue
+            self._active += 1
+            self._note_dispatch(waiter.model)
+            waiter.future.set_result(None)
+
+    async def acquire(self, model, stage):
+        if self._active < self.slots and not self._waiting:
+            self._active += 1
+            self._note_dispatch(model)
+            LLM_QUEUE_SECONDS.observe(0.0, model=model, stage=stage)
+            return
+        waiter = _Waiter(priority_of(stage), next(self._seq), model, stage, asyncio.get_running_loop().create_future())
+        self._waiting.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted and cancelled in the same loop iteration: hand the slot on
+                self.release()
+            else:
+                if waiter in self._waiting:
+                    self._waiting.remove(waiter)
+                LLM_CANCELLED.inc(stage=stage)
+            raise
+        finally:
+            LLM_QUEUE_SECONDS.observe(time.perf_counter() - waiter.queued_at, model=model, stage=stage)
+
+    def release(self):
+        self._active -= 1
+        self._dispatch()
+
+    def slot(self, model, stage):
+        return _Slot(self, model, stage)
+
+    def snapshot(self):
+        waiting = {}
+        for w in self._waiting:
+            waiting[w.stage] = waiting.get(w.stage, 0) + 1
+        return {"slots": self.slots, "active": self._active, "waiting": waiting, "current_model": self._model}
+
+class _Slot:
+    def __init__(self, scheduler, model, stage):
+        self.scheduler = scheduler
+        self.model = model
+        self.stage = stage
+
+    async def __aenter__(self):
+        await self.scheduler.acquire(self.model, self.stage)
+
+    async def __aexit__(self, *exc):
+        self.scheduler.release()
+
+_scheduler = None
+
+def get_scheduler():
+    """The process-wide scheduler (LLM_CONCURRENCY slots, LLM_MODEL_BATCH)."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LlmScheduler(get_int_setting("LLM_CONCURRENCY", 2), get_int_setting("LLM_MODEL_BATCH", 4))
+    return _scheduler
+
+def reset_scheduler():
+    """Drops the scheduler (its futures belong to the event loop that is shutting down)."""
+    global _scheduler
+    _scheduler = None
+
+def snapshot():
+    return _scheduler.snapshot() if _scheduler else {"slots": get_int_setting("LLM_CONCURRENCY", 2), "active": 0, "waiting": {}, "current_model": None}
+
+def _queue_depth():
+    depth = {(stage,): 0 for stage in PRIORITIES}
+    for stage, count in snapshot()["waiting"].items():
+        depth[(stage,)] = count
+    return depth
+
+LLM_QUEUE_DEPTH = Gauge("jasper_llm_queue_depth", "Ollama requests waiting for a scheduler slot, by stage.", ["stage"], callback=_queue_depth)
@@ -0,0 +1,163 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Minimal Prometheus-style metrics (text exposition format 0.0.4) served at /metrics.
+# Hand-rolled so the request path costs a dict lookup and a lock, with no client library.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry = []
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def samples(self):
+        return []
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        """Snapshot {label tuple: count}, for gauges derived from counters."""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        values = self.values()
+        return [("", _format_labels(self.labelnames, key), value) for key, value in sorted(values.items())]
+
+class Gauge(Metric):
+    """Set explicitly, or computed at scrape time by callback() -> {label tuple: value}."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(self.labelnames, labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        if self._callback:
+            try:
+                values.update({tuple(str(v) for v in key): value for key, value in self._callback().items()})
+            except Exception as e:
+                print(f"DEBUG: Metric callback for {self.name} failed: {e}")
+        return [("", _format_labels(self.labelnames, key), value) for key, value in sorted(values.items())]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = [0] * len(self.buckets) + [0.0, 0]
+                self._values[key] = entry
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(entry) for key, entry in self._values.items()}
+        samples = []
+        for key, entry in sorted(values.items()):
+            for bound, count in zip(self.buckets, entry):
+                samples.append(("_bucket", _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))]), count))
+            samples.append(("_bucket", _format_labels(self.labelnames, key, [("le", "+Inf")]), entry[-1]))
+            samples.append(("_sum", _format_labels(self.labelnames, key), round(entry[-2], 6)))
+            samples.append(("_count", _format_labels(self.labelnames, key), entry[-1]))
+        return samples
+
+def render_metrics():
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+# Shared metrics, instrumented across the pipeline
+REQUEST_SECONDS = Histogram("jasper_request_seconds", "Total /query handling time by response type.", ["endpoint", "type"])
+STAGE_SECONDS = Histogram("jasper_stage_seconds", "Blocking work per pool and stage (intent, search, summary, chat), including queue time.", ["pool", "stage"])
+QUEUE_SECONDS = Histogram("jasper_executor_queue_seconds", "Time work waited for a free worker thread.", ["pool"])
+EXECUTOR_PENDING = Gauge("jasper_executor_pending", "Work items waiting for a worker thread.", ["pool"])
+EXECUTOR_ACTIVE = Gauge("jasper_executor_active", "Work items currently running.", ["pool"])
+IMAP_SECONDS = Histogram("jasper_imap_seconds", "IMAP round trips by operation.", ["provider", "op"])
+IMAP_FETCHED_BYTES = Counter("jasper_imap_fetched_bytes_total", "Bytes received in IMAP FETCH responses.", ["provider"])
+CHROMA_SECONDS = Histogram("jasper_chroma_seconds", "Chroma collection calls.", ["collection", "op"])
+EMBEDDING_SECONDS = Histogram("jasper_embedding_seconds", "Embedding computation for indexed documents.", ["collection"])
+CACHE_REQUESTS = Counter("jasper_cache_requests_total", "Cache lookups by result.", ["cache", "result"])
+
+def _cache_hit_ratios():
+    totals, hits = {}, {}
+    for (cache, result), count in CACHE_REQUESTS.values().items():
+        totals[cache] = totals.get(cache, 0) + count
+        if result == "hit":
+            hits[cache] = hits.get(cache, 0) + count
+    return {(cache,): round(hits.get(cache, 0) / total, 4) for cache, total in totals.items() if total}
+
+CACHE_HIT_RATIO = Gauge("jasper_cache_hit_ratio", "Share of cache lookups that hit, since start.", ["cache"], callback=_cache_hit_ratios)
+ERRORS = Counter("jasper_errors_total", "Errors by stage and type.", ["stage", "type"])
@@ -0,0 +1,106 @@
+import time
+import asyncio
+import threading
+from .config import get_setting, get_int_setting, get_bool_setting
+from .metrics import Gauge, Histogram
+
+# Ollama loads models on first use, so the first query after a restart (or a long idle
+# period) used to spend its intent timeout loading "jasper" and then load "gemma3" for the
+# chat fallback as well. The models are pre-loaded at start-up with a long keep_alive and
+# touched periodically while the server is idle.
+
+MODEL_LOAD_SECONDS = Histogram("jasper_model_load_seconds", "Ollama warm-up call duration (model load when cold).", ["model"],
+                               buckets=(0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300))
+
+_lock = threading.Lock()
+_state = {}      # model -> {"loaded", "cold_load_seconds", "last_warmup_seconds", "warmed_at", "error"}
+_last_used = {}  # model -> monotonic time of the last real request
+
+def warmup_models():
+    """Models kept warm (WARMUP_MODELS, comma separated)."""
+    value = get_setting("WARMUP_MODELS", "jasper,gemma3")
+    if isinstance(value, str):
+        value = value.split(",")
+    return [m.strip() for m in value if m and m.strip()]
+
+def keep_alive():
+    """keep_alive passed to Ollama on every call, so requests do not shorten the warm window."""
+    return get_setting("OLLAMA_KEEP_ALIVE", "30m")
+
+def note_model_use(model):
+    _last_used[model] = time.monotonic()
+
+async def _loaded_names():
+    from .llm_client import get_client
+    names = set()
+    response = await get_client().ps()
+    for m in response.get("models", []):
+        name = m.get("model") or m.get("name") or ""
+        names.add(name)
+        names.add(name.split(":")[0])
+    return names
+
+async def warm_model(model):
+    """Loads (or keeps loaded) one model with an empty prompt. Returns the call duration."""
+    from . import llm_client
+    start = time.perf_counter()
+    try:
+        await llm_client.generate(model, "", stage="warmup")
+    except Exception as e:
+        with _lock:
+            _state[model] = {**_state.get(model, {}), "loaded": False, "error": str(e)}
+        print(f"DEBUG: Warm-up of model '{model}' failed: {e}")
+        return None
+    duration = time.perf_counter() - start
+    MODEL_LOAD_SECONDS.observe(duration, model=model)
+    with _lock:
+        previous = _state.get(model, {})
+        # A warm-up of an unloaded model is a real load; keep that figure until the next one
+        cold_load = round(duration, 3) if not previous.get("loaded") else previous.get("cold_load_seconds")
+        _state[model] = {"loaded": True, "cold_load_seconds": cold_load, "last_warmup_seconds": round(duration, 3),
+                         "warmed_at": time.time(), "error": None}
+    print(f"DEBUG: Model '{model}' warm ({duration:.2f}s)")
+    return duration
+
+async def refresh_state():
+    """Re-reads which models Ollama currently has in memory."""
+    try:
+        loaded = await _loaded_names()
+    except Exception as e:
+        print(f"DEBUG: Could not list loaded models: {e}")
+        return
+    with _lock:
+        for model in warmup_models():
+            entry = _state.setdefault(model, {"loaded": False})
+            entry["loaded"] = model in loaded
+
+def snapshot():
+    with _lock:
+        return {model: dict(_state.get(model, {"loaded": False})) for model in warmup_models()}
+
+def _loaded_gauge():
+    return {(model,): int(bool(entry.get("loaded"))) for model, entry in snapshot().items()}
+
+MODEL_LOADED = Gauge("jasper_model_loaded", "1 if the model was in Ollama's memory at the last check.", ["model"], callback=_loaded_gauge)
+
+async def keep_models_warm():
+    """
+    Background task: warms every model once, then every MODEL_KEEPALIVE_INTERVAL seconds
+    re-warms models that were unloaded or not used by a request during the interval.
+    """
+    interval = get_int_setting("MODEL_KEEPALIVE_INTERVAL", 240)
+    for model in warmup_models():
+        await warm_model(model)
+    while True:
+        await asyncio.sleep(interval)
+        await refresh_state()
+        for model, entry in snapshot().items():
+            idle = time.monotonic() - _last_used.get(model, 0) >= interval
+            if not entry.get("loaded") or idle:
+                await warm_model(model)
+
+def start_warmup():
+    """Starts the keep-warm task (WARMUP_ENABLED); returns it or None."""
+    if not get_bool_setting("WARMUP_ENABLED", True):
+        return None
+    return asyncio.create_task(keep_models_warm())
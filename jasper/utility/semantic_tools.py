@@ -2,6 +2,8 @@ import chromadb
 from chromadb.utils import embedding_functions
 import os
 from .config import get_db_path
+from .metrics import CHROMA_SECONDS
+from .tracing import span
 
 # CONFIGURATION
 DB_PATH = get_db_path()
@@ -30,11 +32,13 @@ def search_semantic(query, limit=5, folder=None):
             where_filter = {"parent": {"$in": [folder, folder.lower(), folder.capitalize()]}}
             print(f"DEBUG: Applying Folder Filter -> {folder} (Check cases: {folder}, {folder.lower()}, {folder.capitalize()})")
 
-        results = collection.query(
-            query_texts=[query],
-            n_results=limit * 4, # Fetch more to allow for file-level deduplication
-            where=where_filter
-        )
+        with CHROMA_SECONDS.time(collection=COLLECTION_NAME, op="query"), span("chroma.query", collection=COLLECTION_NAME, n_results=limit * 4) as current:
+            results = collection.query(
+                query_texts=[query],
+                n_results=limit * 4, # Fetch more to allow for file-level deduplication
+                where=where_filter
+            )
+            current.set_attribute("result_count", len(results["documents"][0]) if results.get("documents") else 0)
         
         formatted_results = []
         seen_filenames = set()
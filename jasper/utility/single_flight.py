@@ -0,0 +1,68 @@
+import asyncio
+from .metrics import Counter
+
+# Request coalescing: concurrent calls with the same key (a double-submit, several tabs polling
+# the same query) attach to one in-flight computation instead of each running the full
+# LLM + IMAP + summary pipeline. The computation's progress events are replayed to late joiners
+# and fanned out to everyone attached. It is cancelled only when every caller has gone away.
+
+QUERY_COALESCED = Counter("jasper_query_coalesced_total", "Queries that started a computation (leader) or attached to one in flight (joined).", ["result"])
+
+class _Flight:
+    def __init__(self):
+        self.events = []
+        self.listeners = []
+        self.callers = 0
+        self.task = None
+
+    async def emit(self, event):
+        self.events.append(event)
+        for listener in list(self.listeners):
+            await listener(event)
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+
+    def in_flight(self):
+        return len(self._flights)
+
+    async def run(self, key, compute, emit=None):
+        """
+        Returns compute(emit)'s result, sharing one running call per key.
+        compute is called with an emit coroutine function; events it emits reach every
+        caller's own emit (including events emitted before that caller attached).
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(compute(flight.emit))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            QUERY_COALESCED.inc(result="leader")
+        else:
+            print(f"DEBUG: Joining in-flight query {key!r}")
+            QUERY_COALESCED.inc(result="joined")
+
+        flight.callers += 1
+        try:
+            if emit:
+                # Catch up on what was already emitted; no await between the last check and subscribing
+                sent = 0
+                while sent < len(flight.events):
+                    await emit(flight.events[sent])
+                    sent += 1
+                flight.listeners.append(emit)
+            # Shielded: one caller going away must not cancel the others' result
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.callers -= 1
+            if emit in flight.listeners:
+                flight.listeners.remove(emit)
+            if flight.callers == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,76 @@
+import sqlite3
+import threading
+import time
+from .config import get_summary_cache_file
+from .metrics import CACHE_REQUESTS
+
+# Persistent cache of LLM summaries.
+# Keys combine what the summary was made from (Message-ID, or file path + content hash)
+# with the model version and prompt version, so changing either regenerates it.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    created_at REAL
+);
+"""
+
+_write_lock = threading.RLock()
+_schema_ready = False
+
+def _connect():
+    global _schema_ready
+    conn = sqlite3.connect(get_summary_cache_file(), timeout=30)
+    if not _schema_ready:
+        with _write_lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            _schema_ready = True
+    return conn
+
+def summary_key(kind, source_id, model, prompt_version):
+    """e.g. summary_key("mail", "<abc@x>", "jasper@sha256:..", 1)"""
+    return f"{kind}:{source_id}|{model}|v{prompt_version}"
+
+def get_summaries(keys):
+    """Returns {key: summary} for the cached keys."""
+    keys = [k for k in keys if k]
+    found = {}
+    if not keys:
+        return found
+    try:
+        conn = _connect()
+        try:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for key, summary in conn.execute(f"SELECT key, summary FROM summaries WHERE key IN ({marks})", chunk):
+                    found[key] = summary
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"DEBUG: Summary cache read failed: {e}")
+    CACHE_REQUESTS.inc(len(found), cache="summary", result="hit")
+    CACHE_REQUESTS.inc(len(keys) - len(found), cache="summary", result="miss")
+    return found
+
+def get_summary(key):
+    return get_summaries([key]).get(key)
+
+def put_summary(key, summary):
+    if not key or not summary:
+        return
+    try:
+        with _write_lock:
+            conn = _connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO summaries (key, summary, created_at) VALUES (?, ?, ?)",
+                    (key, summary, time.time())
+                )
+                conn.commit()
+            finally:
+                conn.close()
+    except sqlite3.Error as e:
+        print(f"DEBUG: Summary cache write failed: {e}")
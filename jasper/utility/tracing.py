@@ -0,0 +1,133 @@
+import json
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from .config import get_setting, get_bool_setting, get_trace_file
+
+# OpenTelemetry spans across the query pipeline, exported locally (no collector needed).
+# TRACING_ENABLED turns it on. TRACE_EXPORTER=file (default) appends one JSON span per line
+# to traces.jsonl; TRACE_EXPORTER=console prints them. Disabled, or without the SDK,
+# span() is a no-op.
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+_tracer = None
+_provider = None
+_initialized = False
+_lock = threading.Lock()
+
+def _attribute(value):
+    # OTel attributes are primitives (or lists of them)
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+def span_record(span):
+    """Compact, one-line form of a finished span."""
+    parent = span.parent
+    return {
+        "trace_id": format(span.context.trace_id, "032x"),
+        "span_id": format(span.context.span_id, "016x"),
+        "parent_id": format(parent.span_id, "016x") if parent else None,
+        "name": span.name,
+        "start": datetime.fromtimestamp(span.start_time / 1e9).isoformat(timespec="microseconds"),
+        "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+        "events": [{"name": e.name, "attributes": dict(e.attributes or {})} for e in span.events],
+    }
+
+def _build_exporter():
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class JsonLinesSpanExporter(SpanExporter):
+        def __init__(self, path):
+            self.path = path
+            self._lock = threading.Lock()
+
+        def export(self, spans):
+            try:
+                lines = "".join(json.dumps(span_record(s), ensure_ascii=False, default=str) + "\n" for s in spans)
+                with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+                return SpanExportResult.SUCCESS
+            except Exception as e:
+                print(f"DEBUG: Trace export failed: {e}")
+                return SpanExportResult.FAILURE
+
+        def shutdown(self):
+            pass
+
+    if str(get_setting("TRACE_EXPORTER", "file")).lower() == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter(formatter=lambda s: json.dumps(span_record(s), default=str) + "\n")
+    return JsonLinesSpanExporter(get_setting("TRACE_FILE") or get_trace_file())
+
+def get_tracer():
+    """The Jasper tracer, or None when tracing is off or the SDK is missing."""
+    global _tracer, _provider, _initialized
+    if _initialized:
+        return _tracer
+    with _lock:
+        if not _initialized:
+            if get_bool_setting("TRACING_ENABLED", False):
+                try:
+                    from opentelemetry.sdk.resources import Resource
+                    from opentelemetry.sdk.trace import TracerProvider
+                    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+                    _provider = TracerProvider(resource=Resource.create({"service.name": "jasper"}))
+                    # Spans are written by the batch processor's thread, off the request path
+                    _provider.add_span_processor(BatchSpanProcessor(_build_exporter()))
+                    _tracer = _provider.get_tracer("jasper")
+                    print("DEBUG: Tracing enabled")
+                except ImportError as e:
+                    print(f"DEBUG: Tracing disabled, OpenTelemetry SDK not available: {e}")
+            _initialized = True
+    return _tracer
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Child span of the current one (contextvars, so it follows asyncio tasks and run_blocking).
+    Yields the span for set_attribute(); exceptions are recorded and re-raised.
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        yield NOOP_SPAN
+        return
+    attributes = {k: _attribute(v) for k, v in attributes.items() if v is not None}
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+def set_llm_attributes(current, response):
+    """Token counts and server-side timings from an Ollama response."""
+    for key in ("prompt_eval_count", "eval_count"):
+        value = response.get(key)
+        if value is not None:
+            current.set_attribute(f"llm.{key}", value)
+    for key in ("total_duration", "load_duration"):
+        value = response.get(key)
+        if value is not None:
+            current.set_attribute(f"llm.{key}_ms", round(value / 1e6, 2))
+
+def current_span():
+    """The active span (to add attributes from deeper in a function), or a no-op."""
+    if get_tracer() is None:
+        return NOOP_SPAN
+    from opentelemetry import trace
+    return trace.get_current_span()
+
+def shutdown_tracing():
+    """Flushes buffered spans."""
+    if _provider is not None:
+        _provider.shutdown()
@@ -0,0 +1,54 @@
+import sys
+import os
+import time
+import tempfile
+
+# Ensure jasper is in path
+sys.path.append(os.getcwd())
+
+# Offline mail benchmark: builds a synthetic mbox, imports it through the same cache/index
+# code the IMAP path uses and times local searches. No mail account needed.
+# Runs against a throwaway cache (MAIL_CACHE_FILE), never the real mail_cache.db.
+# Usage: python tests/bench_mail_archive.py [message_count]
+
+PROVIDER = "BENCH"
+SENDERS = ["Sonja Šumandl <sonja@example.com>", "Anja Novak <anja@example.com>",
+           "Medium Daily Digest <noreply@medium.com>", "Crozilla <notifications@crozilla.com>"]
+QUERIES = [("sumandl", None), ("anja", "digest"), (None, "digest"), ("nobody", None)]
+
+def write_mbox(path, n):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            sender = SENDERS[i % len(SENDERS)]
+            subject = ["Ljeto u Zavali", "Daily Digest", "Nove nekretnine", "Račun za struju"][i % 4]
+            f.write(
+                f"From bench@example.com Mon Jan 12 10:00:00 2026\n"
+                f"From: {sender}\nSubject: {subject} #{i}\n"
+                f"Date: Mon, 12 Jan 2026 10:{i % 60:02d}:00 +0000\n"
+                f"Message-ID: <bench{i}@example.com>\n"
+                "Content-Type: text/plain; charset=utf-8\n\n"
+                f"Pozdrav, ovo je poruka broj {i}.\n>From the archive.\n\n"
+            )
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["MAIL_CACHE_FILE"] = os.path.join(tmp, "bench_mail_cache.db")
+        from jasper.mail.archive_import import import_archive, search_archive
+
+        path = os.path.join(tmp, "bench.mbox")
+        write_mbox(path, count)
+        print(f">>> Importing {count} messages ({os.path.getsize(path) / 1e6:.1f} MB)")
+        start = time.perf_counter()
+        imported, _ = import_archive(path, provider=PROVIDER, restart=True)
+        print(f"Import: {imported} messages in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        imported, skipped = import_archive(path, provider=PROVIDER)
+        print(f"Resume (nothing new): {skipped} skipped in {time.perf_counter() - start:.2f}s")
+
+        print(f"\n{'sender':>10} | {'subject':>8} | {'hits':>4} | time")
+        for sender, subject in QUERIES:
+            start = time.perf_counter()
+            results = search_archive(sender, subject, limit=5, provider=PROVIDER)
+            print(f"{sender or '-':>10} | {subject or '-':>8} | {len(results):>4} | {(time.perf_counter() - start) * 1000:.1f}ms")
@@ -0,0 +1,83 @@
+import sys
+import os
+import time
+
+# Ensure jasper is in path
+sys.path.append(os.getcwd())
+
+from jasper.mail import mime_parse
+from jasper.mail.mime_parse import parse_message, get_parse_pool, _parse_chunk, CHUNK_SIZE
+
+# Benchmark: in-process MIME parsing vs. the worker pool used by search_emails.
+# The first size where the pool wins is a good value for MIME_PARSE_POOL_THRESHOLD.
+
+SIZES = [50, 100, 250, 500, 1000, 2000, 4000]
+
+def make_message(i, headers_only):
+    headers = (
+        f"From: =?utf-8?q?Sonja_=C5=A0umandl?= <sonja{i}@example.com>\r\n"
+        f"Subject: =?utf-8?b?TGpldG8gdSBaYXZhbGk=?= #{i}\r\n"
+        f"Date: Mon, 12 Jan 2026 10:{i % 60:02d}:00 +0000\r\n"
+        f"Message-ID: <msg{i}@example.com>\r\n"
+        "MIME-Version: 1.0\r\n"
+        'Content-Type: multipart/mixed; boundary="b1"\r\n\r\n'
+    )
+    if headers_only:
+        return headers.encode()
+    body = (
+        "--b1\r\nContent-Type: text/plain; charset=utf-8\r\nContent-Transfer-Encoding: quoted-printable\r\n\r\n"
+        + ("Pozdrav, ovo je tekst poruke za ljeto u Zavali. " * 40) + "\r\n"
+        "--b1\r\nContent-Type: application/pdf; name=\"plan.pdf\"\r\nContent-Transfer-Encoding: base64\r\n\r\n"
+        + ("JVBERi0xLjQKJcfsj6IKNSAwIG9iago8PC9MZW5ndGggNiAwIFI+PgpzdHJlYW0K\r\n" * 60)
+        + "--b1--\r\n"
+    )
+    return (headers + body).encode()
+
+def make_parts(n, headers_only):
+    parts = []
+    for i in range(n):
+        raw = make_message(i, headers_only)
+        parts.append((f"{i + 1} (UID {1000 + i} RFC822 {{{len(raw)}}}".encode(), raw))
+    return parts
+
+def bench_inline(parts, headers_only):
+    start = time.perf_counter()
+    for meta, raw in parts:
+        parse_message(meta, raw, headers_only, True)
+    return time.perf_counter() - start
+
+def bench_pool(parts, headers_only):
+    pool = get_parse_pool()
+    start = time.perf_counter()
+    chunks = [parts[i:i + CHUNK_SIZE] for i in range(0, len(parts), CHUNK_SIZE)]
+    futures = [pool.submit(_parse_chunk, chunk, headers_only, True) for chunk in chunks]
+    for future in futures:
+        future.result()
+    return time.perf_counter() - start
+
+def run(headers_only):
+    label = "HEADERS" if headers_only else "FULL MESSAGES"
+    print(f"\n>>> {label} (workers={mime_parse._pool_workers()}, chunk={CHUNK_SIZE})")
+    print(f"{'count':>6} | {'in-process':>10} | {'pool':>10} | winner")
+    winners = []
+    for n in SIZES:
+        parts = make_parts(n, headers_only)
+        t_inline = bench_inline(parts, headers_only)
+        t_pool = bench_pool(parts, headers_only)
+        winner = "pool" if t_pool < t_inline else "in-process"
+        winners.append((n, winner))
+        print(f"{n:>6} | {t_inline * 1000:>8.1f}ms | {t_pool * 1000:>8.1f}ms | {winner}")
+    # Smallest size from which the pool wins every larger batch too
+    crossover = None
+    for n, winner in reversed(winners):
+        if winner != "pool":
+            break
+        crossover = n
+    print(f"Crossover: {crossover if crossover else 'pool never faster on this machine'}")
+
+if __name__ == "__main__":
+    # Warm the pool so process start-up is not billed to the first size
+    get_parse_pool().submit(_parse_chunk, [], True, True).result()
+    run(headers_only=True)
+    run(headers_only=False)
+    mime_parse.shutdown_parse_pool()
@@ -0,0 +1,44 @@
+import pytest
+
+from jasper.mail import archive_import, header_index, mail_cache
+
+MBOX = (
+    "From a@example.com Mon Jan 12 10:00:00 2026\n"
+    "From: Sonja Sumandl <sonja@example.com>\nSubject: Ljeto u Zavali\n"
+    "Date: Mon, 12 Jan 2026 10:00:00 +0000\nMessage-ID: <a1@example.com>\n\n"
+    "Vidimo se u Zavali.\n\n"
+    "From b@example.com Tue Jan 13 10:00:00 2026\n"
+    "From: Anja Novak <anja@example.com>\nSubject: Racun\n"
+    "Date: Tue, 13 Jan 2026 10:00:00 +0000\nMessage-ID: <b2@example.com>\n\n"
+    ">From the accountant.\n\n"
+)
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setenv("MAIL_CACHE_FILE", str(tmp_path / "mail_cache.db"))
+    monkeypatch.setenv("MAIL_SEMANTIC_INDEX", "false")
+    monkeypatch.setattr(mail_cache, "_schema_ready", False)
+    monkeypatch.setattr(header_index, "_indexes", {})
+    path = tmp_path / "old.mbox"
+    path.write_text(MBOX, encoding="utf-8")
+    return path
+
+def test_import_leaves_the_header_index_to_warm_lazily(archive):
+    assert archive_import.import_archive(archive) == (2, 0)
+    assert header_index._indexes == {}
+    assert archive_import.import_archive(archive) == (0, 2)
+
+    results = archive_import.search_archive(sender="sumandl")
+    assert [r["message_id"] for r in results] == ["a1@example.com"]
+    assert results[0]["body"].startswith("Vidimo se")
+    # The index keeps headers only; bodies stay in the cache
+    index = header_index._indexes[archive_import.ARCHIVE_PROVIDER]
+    assert "body" not in index.get(("old", "1"))
+
+def test_merge_archive_dedupes_and_keeps_newest_first(archive):
+    archive_import.import_archive(archive)
+    live = [{"id": "7", "message_id": "a1@example.com", "received": "Mon, 12 Jan 2026 10:00:00 +0000", "sender": "Sonja Sumandl <sonja@example.com>"}]
+    merged = archive_import.merge_archive(live, sender="a", limit=5)
+    assert [(r["id"], r["message_id"]) for r in merged] == [("2", "b2@example.com"), ("7", "a1@example.com")]
+    assert archive_import.merge_archive("Error: login failed", sender="a") == "Error: login failed"
+    assert archive_import.merge_archive(live, body="zavala", limit=5) == live
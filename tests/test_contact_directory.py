@@ -0,0 +1,39 @@
+from jasper.mail.contact_directory import MATCH_EXACT, MATCH_FUZZY, ContactDirectory
+from jasper.mail.email_tools import sender_criteria
+
+def _directory():
+    directory = ContactDirectory()
+    directory.add([
+        {"sender": "Sonja Šumandl <sonja.sumandl123@gmail.com>", "message_id": "a1", "received": "Mon, 12 Jan 2026 10:00:00 +0000"},
+        {"sender": "Sonja Šumandl <sonja.sumandl123@gmail.com>", "message_id": "a2", "received": "Tue, 13 Jan 2026 10:00:00 +0000"},
+        {"sender": "Sonja Horvat <sonja@firma.hr>", "message_id": "b1", "received": "Mon, 12 Jan 2026 10:00:00 +0000"},
+        {"sender": "Medium Daily Digest <noreply@medium.com>", "message_id": "c1", "received": "Mon, 12 Jan 2026 10:00:00 +0000"},
+    ])
+    return directory
+
+def test_resolve_uses_exact_and_address_matches():
+    directory = _directory()
+    assert directory.resolve("Šumandl") == ["sonja.sumandl123@gmail.com"]
+    assert directory.resolve("sumandl123") == ["sonja.sumandl123@gmail.com"]
+    assert directory.resolve("firma") == ["sonja@firma.hr"]
+    # Both Sonjas match exactly; the more frequent sender is listed first
+    assert directory.resolve("sonja") == ["sonja.sumandl123@gmail.com", "sonja@firma.hr"]
+
+def test_resolve_ignores_prefix_and_typo_matches():
+    directory = _directory()
+    assert directory.resolve("Šumandel") == []
+    assert directory.resolve("horv") == []
+    assert directory.resolve("so") == []
+
+def test_lookup_still_suggests_typos():
+    directory = _directory()
+    matches = directory.lookup("Šumandel")
+    assert [m["address"] for m in matches] == ["sonja.sumandl123@gmail.com"]
+    assert matches[0]["score"] == MATCH_FUZZY
+    assert directory.lookup("sonja horvat")[0]["score"] == MATCH_EXACT
+    assert directory.lookup("digst")[0]["address"] == "noreply@medium.com"
+
+def test_sender_criteria_keeps_the_free_text_term():
+    assert sender_criteria("sonja sumandl", ["sonja.sumandl123@gmail.com"]) == [
+        "OR", "FROM", "sonja.sumandl123@gmail.com", "(FROM", "sonja", "FROM", "sumandl)"]
+    assert sender_criteria("anja", []) == ["FROM", "anja"]
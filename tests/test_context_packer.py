@@ -0,0 +1,38 @@
+from jasper.utility.context_packer import allocate, estimate_tokens, item_weight, pack, prepare_items, split_groups, strip_quoted
+
+def test_allocate_gives_small_needs_everything_and_reshares_the_rest():
+    # Item 0 needs less than its share; the remaining 90 tokens are split 2:1
+    assert allocate([10, 200, 200], [1.0, 2.0, 1.0], 100) == [10, 60, 30]
+
+def test_allocate_when_everything_fits():
+    assert allocate([10, 20], [1.0, 1.0], 100) == [10, 20]
+    assert allocate([10, 20], [1.0, 1.0], 0) == [0, 0]
+
+def test_strip_quoted_drops_the_reply_chain():
+    text = "Sounds good, see you Friday.\n\nOn Mon, 12 Jan 2026 Sonja wrote:\n> Are we still on?\n> Sonja"
+    assert strip_quoted(text) == "Sounds good, see you Friday."
+
+def test_prepare_items_dedupes_paragraphs_across_results():
+    shared = "The boat rental deposit of 200 EUR is due by the end of the month."
+    results = [
+        {"sender": "a@example.com", "subject": "Boat", "body": f"Hi,\n\n{shared}"},
+        {"sender": "b@example.com", "subject": "Re: Boat", "body": shared},
+    ]
+    first, second = prepare_items(results)
+    assert shared in first["body"]
+    assert second["body"] == "(Same content as another item.)"
+
+def test_pack_stays_within_budget(monkeypatch):
+    monkeypatch.setenv("SUMMARY_ITEM_MIN_TOKENS", "20")
+    results = [{"name": f"f{i}.txt", "path": f"C:/f{i}.txt", "content": "word " * 400} for i in range(4)]
+    entries = prepare_items(results)
+    context = pack(entries, 200)
+    assert estimate_tokens(context) <= 200 * 1.15
+    assert [len(g) for g in split_groups(entries, 40)] == [2, 2]
+
+def test_item_weight_reads_rfc2822_and_iso_dates():
+    now = 1_800_000_000 + 60 * 86400  # two half-lives after 15 Jan 2027 08:00 UTC
+    rfc = item_weight(0, "Fri, 15 Jan 2027 08:00:00 +0000", now=now)
+    iso = item_weight(0, "2027-01-15T08:00:00+00:00", now=now)
+    assert rfc == iso == 0.625
+    assert item_weight(0, "sometime", now=now) == item_weight(0, None, now=now)
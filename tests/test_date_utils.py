@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+
+from jasper.utility.date_utils import clean_date_string, extract_date_range
+
+def _days_back(weekday):
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=(today.weekday() - weekday) % 7)
+
+def test_weekday_ranges():
+    assert extract_date_range("since monday") == (_days_back(0), None)
+    assert extract_date_range("on friday") == (_days_back(4), _days_back(4))
+    assert extract_date_range("before sunday") == (None, _days_back(6))
+    # "last monday" is never today
+    last_monday = extract_date_range("last monday")[0]
+    assert last_monday.weekday() == 0
+    assert timedelta(days=1) <= _days_back(datetime.now().weekday()) - last_monday <= timedelta(days=7)
+
+def test_clean_date_string_strips_weekday_clauses():
+    assert clean_date_string("sonja since monday") == "sonja"
+
+def test_today_and_yesterday():
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    assert extract_date_range("today") == (today, None)
+    assert extract_date_range("on today") == (today, today)
+    assert extract_date_range("before yesterday") == (None, today - timedelta(days=1))
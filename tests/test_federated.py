@@ -0,0 +1,22 @@
+from jasper.utility.federated import RRF_K, rank_results
+
+def test_rank_results_fuses_sources_by_rank():
+    by_source = {
+        "files": [{"path": "C:/docs/budget.xlsx", "name": "budget.xlsx"}, {"path": "C:/docs/notes.txt"}],
+        "semantic": [{"path": "C:/docs/notes.txt", "content": "budget notes"}],
+        "mail_gmail": [{"message_id": "a1@example.com", "subject": "Budget"}],
+    }
+    ranked = rank_results(by_source, limit=10)
+    # Found by name and by content: listed once, scores summed, so it outranks single-source hits
+    assert ranked[0]["path"] == "C:/docs/notes.txt"
+    assert ranked[0]["sources"] == ["files", "semantic"]
+    assert ranked[0]["content"] == "budget notes"
+    assert ranked[0]["rank_score"] == round(1 / (RRF_K + 2) + 1 / (RRF_K + 1), 6)
+    assert len(ranked) == 3
+
+def test_rank_results_tags_mail_provider_and_applies_limit():
+    by_source = {"mail_outlook": [{"message_id": f"m{i}"} for i in range(5)]}
+    ranked = rank_results(by_source, limit=2)
+    assert [r["message_id"] for r in ranked] == ["m0", "m1"]
+    assert ranked[0]["provider"] == "OUTLOOK"
+    assert ranked[0]["source"] == "mail_outlook"
@@ -0,0 +1,53 @@
+import pytest
+
+from jasper.mail import email_tools, header_index, mail_cache
+
+class FakeServer:
+    """search_emails stand-in over one mailbox of UIDs, honouring UID ranges, SINCE and oldest_first."""
+
+    def __init__(self, uids):
+        self.uids = uids
+        self.calls = []
+
+    def search_emails(self, criteria_parts, limit=5, provider="GMAIL", use_uid=False, mailbox="INBOX", oldest_first=False, **kwargs):
+        self.calls.append(list(criteria_parts))
+        matched = list(self.uids)
+        if "UID" in criteria_parts:
+            low = int(criteria_parts[criteria_parts.index("UID") + 1].split(":")[0])
+            # RFC 3501: "n:*" matches the highest UID even when it is below n
+            matched = [u for u in matched if u >= low] or matched[-1:]
+        matched = matched[:limit] if oldest_first else matched[::-1][:limit]
+        return [{
+            "id": str(u), "mailbox": mailbox, "subject": f"Update {u}", "sender": "Anja <anja@example.com>",
+            "received": f"Mon, 12 Jan 2026 10:{u:02d}:00 +0000", "message_id": f"m{u}@example.com", "body": "",
+        } for u in matched]
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setenv("MAIL_CACHE_FILE", str(tmp_path / "mail_cache.db"))
+    monkeypatch.setenv("MAIL_SEMANTIC_INDEX", "false")
+    monkeypatch.setattr(mail_cache, "_schema_ready", False)
+    monkeypatch.setattr(header_index, "_indexes", {})
+    monkeypatch.setattr(email_tools, "get_mailboxes", lambda provider="GMAIL": ["INBOX"])
+    fake = FakeServer([1, 2, 3])
+    monkeypatch.setattr(email_tools, "search_emails", fake.search_emails)
+    return fake
+
+def _poll(limit=2):
+    return email_tools.find_emails_incremental(sender_name="anja", limit=limit, provider="OUTLOOK")
+
+def test_first_run_is_bounded_by_a_since_window(server):
+    results = _poll()
+    assert "SINCE" in server.calls[0] and "UID" not in server.calls[0]
+    assert [r["id"] for r in results] == ["3", "2"]
+    assert mail_cache.get_query_state("OUTLOOK", email_tools.incremental_query_key("anja"))["INBOX"]["highest_uid"] == 3
+
+def test_matches_beyond_the_limit_come_with_the_next_poll(server):
+    _poll()
+    server.uids += [4, 5, 6]
+    first = [r["id"] for r in _poll() if r["is_new"]]
+    second = [r["id"] for r in _poll() if r["is_new"]]
+    assert server.calls[1][-2:] == ["UID", "4:*"]
+    assert sorted(first + second) == ["4", "5", "6"]
+    # Nothing new: "n:*" returns the newest message again, which is not reported as new
+    assert [r for r in _poll() if r["is_new"]] == []
@@ -0,0 +1,64 @@
+from jasper.utility.date_utils import extract_date_range
+from jasper.utility.intent_router import CONFIDENT, route
+
+def test_mail_from_sender_and_date():
+    data, confidence = route("emails from Sonja last week")
+    assert confidence == CONFIDENT
+    assert data == {"intent": "mail", "params": {"summarize": False, "date_filter": "last week", "sender": "Sonja"}}
+
+def test_mail_subject_with_provider():
+    data, confidence = route("find emails in gmail with subject 'ljeto zavala'")
+    assert confidence == CONFIDENT
+    assert data["params"]["subject"] == "ljeto zavala"
+    assert data["params"]["provider"] == "GMAIL"
+
+def test_mail_about_searches_bodies():
+    data, confidence = route("find the email about the boat rental deposit")
+    assert confidence == CONFIDENT
+    assert data["intent"] == "mail"
+    assert data["params"]["body"] == "the boat rental deposit"
+    assert "sender" not in data["params"] and "subject" not in data["params"]
+
+def test_mail_about_with_sender_goes_to_model():
+    data, confidence = route("find emails about the invoice from Ivan")
+    assert data["params"]["body"] == "the invoice from Ivan"
+    assert confidence < CONFIDENT
+
+def test_mail_about_date_and_summarize():
+    data, confidence = route("summarize emails mentioning 'budget' last 3 days")
+    assert confidence == CONFIDENT
+    assert data["params"] == {"summarize": True, "date_filter": "last 3 days", "body": "budget"}
+
+def test_unmatched_input_goes_to_model():
+    assert route("what did we decide about the roof?") == (None, 0.0)
+
+def test_date_clause_is_not_part_of_the_sender():
+    data, confidence = route("emails from sonja since monday")
+    assert confidence == CONFIDENT
+    assert data["params"]["sender"] == "sonja"
+    assert data["params"]["date_filter"] == "since monday"
+    data, _ = route("show mails from Sonja Sumandl before friday")
+    assert data["params"]["sender"] == "Sonja Sumandl"
+
+def test_dates_the_rules_cannot_place_go_to_the_model():
+    assert route("emails from anja since 3 days ago")[1] < CONFIDENT
+    assert route("emails from last week") == (None, 0.0)
+
+def test_routed_date_filters_resolve():
+    for text in ("emails from Ivan today", "emails from Ivan yesterday", "emails from Ivan since monday"):
+        data, _ = route(text)
+        assert extract_date_range(data["params"]["date_filter"]) != (None, None)
+
+def test_date_lead_in_is_not_part_of_the_sender():
+    data, confidence = route("emails from Sonja in the last 3 weeks")
+    assert confidence == CONFIDENT
+    assert data["params"]["sender"] == "Sonja"
+    assert data["params"]["date_filter"] == "last 3 weeks"
+
+def test_file_query_of_only_a_connecting_word_goes_to_the_model():
+    data, confidence = route("find files from last week")
+    assert data["params"]["date_filter"] == "last week"
+    assert confidence < CONFIDENT
+    data, confidence = route("find files budget modified in the last month")
+    assert confidence == CONFIDENT
+    assert data["params"]["query"] == "budget"
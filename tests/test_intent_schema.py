@@ -0,0 +1,36 @@
+import json
+
+from jasper.utility.intent_schema import INTENT_SCHEMA, parse_intent_output
+
+def test_schema_lists_every_param_the_handlers_read():
+    params = INTENT_SCHEMA["properties"]["params"]
+    assert {"body", "content", "limit", "kind", "name"} <= set(params["properties"])
+    assert params["additionalProperties"] is True
+
+def test_params_round_trip():
+    answer = {"intent": "files", "params": {
+        "body": "boat deposit", "content": "invoice", "limit": 3, "kind": "folder", "name": "Projekt_IPA",
+        "sender": "Sonja", "summarize": False,
+    }}
+    data, repaired = parse_intent_output(json.dumps(answer))
+    assert (data, repaired) == (answer, False)
+
+def test_tolerant_parse_repairs_fences_escapes_and_truncation():
+    data, repaired = parse_intent_output('```json\n{"intent": "mail", "params": {"sender": "ivan", "date\\_filter": "last week"}}\n```')
+    assert repaired and data["params"] == {"sender": "ivan", "date_filter": "last week"}
+
+    data, repaired = parse_intent_output('{"intent": "mail", "params": {"body": "boat rental", "summarize": "true", "limit": "7", "subj')
+    assert repaired
+    assert data == {"intent": "mail", "params": {"body": "boat rental", "summarize": True, "limit": 7}}
+
+def test_unusable_answers():
+    assert parse_intent_output("") == (None, False)
+    assert parse_intent_output('{"intent": "weather", "params": {}}') == (None, False)
+    assert parse_intent_output("Sure! Here are your emails.") == (None, False)
+
+def test_unusable_limits_are_dropped():
+    for limit in ('"ten"', '"-3"', "-3", "0", "null", "true"):
+        data, _ = parse_intent_output('{"intent": "mail", "params": {"sender": "Ivan", "limit": %s}}' % limit)
+        assert data == {"intent": "mail", "params": {"sender": "Ivan"}}
+    data, _ = parse_intent_output('{"intent": "files", "params": {"limit": 4.0}}')
+    assert data["params"] == {"limit": 4}
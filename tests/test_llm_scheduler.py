@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from jasper.utility import llm_client, llm_scheduler
+from jasper.utility.llm_scheduler import LlmScheduler
+
+def test_waiters_are_served_by_priority_then_model_batch():
+    async def scenario():
+        scheduler = LlmScheduler(slots=1, batch=4)
+        order = []
+        await scheduler.acquire("jasper", "summary")  # occupies the only slot
+
+        async def request(model, stage):
+            await scheduler.acquire(model, stage)
+            order.append((model, stage))
+            scheduler.release()
+
+        tasks = [asyncio.create_task(request(m, s)) for m, s in [
+            ("jasper", "shadow"), ("gemma3", "summary"), ("jasper", "summary"), ("jasper", "intent"),
+        ]]
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == [
+        ("jasper", "intent"), ("jasper", "summary"), ("gemma3", "summary"), ("jasper", "shadow"),
+    ]
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = LlmScheduler(slots=1)
+        await scheduler.acquire("jasper", "intent")
+        waiter = asyncio.create_task(scheduler.acquire("jasper", "summary"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        scheduler.release()
+        return scheduler.snapshot()
+
+    assert asyncio.run(scenario())["waiting"] == {}
+
+def test_stage_timeout_covers_the_wait_for_a_slot(monkeypatch):
+    monkeypatch.setenv("TIMEOUT_SHADOW", "1")
+
+    async def scenario():
+        llm_client.get_client()
+        scheduler = llm_scheduler.get_scheduler()
+        for _ in range(scheduler.slots):
+            await scheduler.acquire("jasper", "intent")
+        calls = []
+
+        async def request(client):
+            calls.append(client)
+
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await llm_client._call("generate", "shadow", "jasper", 0, request)
+            return calls, scheduler.snapshot()
+        finally:
+            await llm_client.close_client()
+
+    calls, snapshot = asyncio.run(scenario())
+    assert calls == []
+    assert snapshot["waiting"] == {}
@@ -0,0 +1,62 @@
+from jasper.mail.mime_parse import group_fetch_response, iter_parsed_batches, parse_bodystructure, parse_fetch_response
+
+HEADER = b"From: Sonja <sonja@example.com>\r\nSubject: Ljeto\r\nDate: Mon, 12 Jan 2026 10:00:00 +0000\r\nMessage-ID: <a1@example.com>\r\n\r\n"
+
+PDF_STRUCTURE = (
+    b'(("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 120 4 NIL NIL NIL)'
+    b'("APPLICATION" "PDF" ("NAME" "racun.pdf") NIL NIL "BASE64" 53412 NIL ("ATTACHMENT" ("FILENAME" "racun.pdf")) NIL) "MIXED")'
+)
+
+def test_group_fetch_response_one_pair_per_message():
+    msg_data = [
+        (b"1 (UID 101 BODYSTRUCTURE " + PDF_STRUCTURE + b" RFC822.HEADER {%d}" % len(HEADER), HEADER),
+        b")",
+        (b"2 (UID 102 RFC822.HEADER {%d}" % len(HEADER), HEADER),
+        b" FLAGS (\\Seen))",
+    ]
+    groups = group_fetch_response(msg_data)
+    assert [raw for _, raw in groups] == [HEADER, HEADER]
+    assert b"UID 101" in groups[0][0] and b"BODYSTRUCTURE" in groups[0][0]
+    assert b"RFC822.HEADER" not in groups[0][0]
+    assert b"FLAGS" in groups[1][0]
+
+def test_group_fetch_response_inlines_literals_inside_bodystructure():
+    # A filename sent as a literal splits the response before the message literal
+    msg_data = [
+        (b'1 (UID 7 BODYSTRUCTURE (("APPLICATION" "PDF" ("NAME" {9}', b"a \"b\".pdf"),
+        (b') NIL NIL "BASE64" 10 NIL ("ATTACHMENT" NIL) NIL) "MIXED") RFC822.HEADER {%d}' % len(HEADER), HEADER),
+        b")",
+    ]
+    (meta, raw), = group_fetch_response(msg_data)
+    assert raw == HEADER
+    assert parse_bodystructure(meta.decode()) == [{"name": 'a "b".pdf', "mime_type": "application/pdf", "size": 10}]
+
+def test_parse_bodystructure_attachment_and_inline_text():
+    meta = "1 (UID 101 BODYSTRUCTURE " + PDF_STRUCTURE.decode() + ")"
+    assert parse_bodystructure(meta) == [{"name": "racun.pdf", "mime_type": "application/pdf", "size": 53412}]
+
+def test_parse_bodystructure_plain_message_has_no_attachments():
+    meta = '1 (UID 5 BODYSTRUCTURE ("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 42 2 NIL NIL NIL))'
+    assert parse_bodystructure(meta) == []
+
+def test_parse_bodystructure_rfc2231_filename():
+    meta = ('1 (BODYSTRUCTURE (("TEXT" "PLAIN" NIL NIL NIL "7BIT" 1 1) '
+            '("APPLICATION" "OCTET-STREAM" NIL NIL NIL "BASE64" 300 NIL ("ATTACHMENT" ("FILENAME*" "utf-8\'\'ra%C4%8Dun.txt")) NIL) "MIXED"))')
+    assert parse_bodystructure(meta)[0]["name"] == "račun.txt"
+
+def test_parse_bodystructure_missing_or_broken():
+    assert parse_bodystructure("1 (UID 5 RFC822.HEADER)") is None
+    assert parse_bodystructure('1 (BODYSTRUCTURE ("TEXT" "PLAIN"') is None
+
+def test_parse_fetch_response_records():
+    msg_data = [(b"1 (UID 101 BODYSTRUCTURE " + PDF_STRUCTURE + b" RFC822.HEADER {%d}" % len(HEADER), HEADER), b")"]
+    record, = parse_fetch_response(msg_data, headers_only=True, use_uid=True)
+    assert record["id"] == "101"
+    assert record["subject"] == "Ljeto"
+    assert record["message_id"] == "a1@example.com"
+    assert record["has_attachment"] is True
+
+def test_iter_parsed_batches_keeps_order():
+    parts = [(b"%d (UID %d)" % (uid, uid), HEADER) for uid in range(1, 6)]
+    batches = list(iter_parsed_batches(parts, headers_only=True, use_uid=True, size=2))
+    assert [[r["id"] for r in batch] for batch in batches] == [["1", "2"], ["3", "4"], ["5"]]
@@ -0,0 +1,64 @@
+import asyncio
+
+from jasper.utility.single_flight import SingleFlight
+
+def test_concurrent_callers_share_one_computation_and_its_events():
+    async def scenario():
+        flight = SingleFlight()
+        runs = []
+        release = asyncio.Event()
+
+        async def compute(emit):
+            runs.append(1)
+            await emit("results")
+            await release.wait()
+            await emit("summary")
+            return "done"
+
+        seen = {"first": [], "second": []}
+
+        async def caller(name):
+            async def emit(event):
+                seen[name].append(event)
+            return await flight.run("q", compute, emit)
+
+        first = asyncio.create_task(caller("first"))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(caller("second"))
+        await asyncio.sleep(0.01)
+        assert flight.in_flight() == 1
+        release.set()
+        results = await asyncio.gather(first, second)
+        return runs, results, seen, flight.in_flight()
+
+    runs, results, seen, in_flight = asyncio.run(scenario())
+    assert runs == [1]
+    assert results == ["done", "done"]
+    # The late joiner is replayed what was emitted before it attached
+    assert seen == {"first": ["results", "summary"], "second": ["results", "summary"]}
+    assert in_flight == 0
+
+def test_computation_is_cancelled_only_when_every_caller_leaves():
+    async def scenario():
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def compute(emit):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        first = asyncio.create_task(flight.run("q", compute))
+        second = asyncio.create_task(flight.run("q", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        still_running = not cancelled.is_set()
+        second.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        return still_running, cancelled.is_set(), flight.in_flight()
+
+    assert asyncio.run(scenario()) == (True, True, 0)
@@ -0,0 +1,40 @@
+import socket
+import threading
+from jasper.mail.sync_worker import IdleReader, MailSyncWorker
+
+class FakeIdleServer:
+    """Stands in for an IMAP4_SSL connection; answers IDLE and DONE on a socket pair."""
+
+    def __init__(self, idle_reply):
+        self.sock, self.server = socket.socketpair()
+        self.idle_reply = idle_reply
+        self.tagged_commands = {}
+
+    def _new_tag(self):
+        return b"A1"
+
+    def send(self, data):
+        if data.endswith(b" IDLE\r\n"):
+            self.server.sendall(self.idle_reply)
+        elif data == b"DONE\r\n":
+            self.server.sendall(b"A1 OK IDLE terminated\r\n")
+
+def idle_once(mail):
+    worker = MailSyncWorker.__new__(MailSyncWorker)
+    worker._stop_event = threading.Event()
+    return worker._idle(mail)
+
+def test_exists_sent_with_continuation_is_seen():
+    # Both lines arrive in one packet; the EXISTS must not wait for the next re-IDLE
+    mail = FakeIdleServer(b"+ idling\r\n* 5 EXISTS\r\n")
+    assert idle_once(mail) is True
+    assert mail.sock.gettimeout() is None
+
+def test_reader_keeps_partial_lines_across_timeouts():
+    a, b = socket.socketpair()
+    reader = IdleReader(a)
+    b.sendall(b"* 7 EXP")
+    assert reader.readline(0.05) is None
+    b.sendall(b"UNGE\r\n")
+    assert reader.readline(0.05) == b"* 7 EXPUNGE\r\n"
+    reader.close()